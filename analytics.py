@@ -0,0 +1,169 @@
+"""
+Analisi delle risposte per domanda.
+
+Da un'istantanea colonnare delle valutazioni (punteggio, indici, data e
+opzione scelta per ogni domanda) calcola con NumPy frequenze delle opzioni,
+correlazione di ogni opzione con punteggio finale e indici, e variazione
+delle scelte per finestre temporali. Il risultato resta in cache finché i
+dati non cambiano (nuovi inserimenti, cancellazioni, punteggi modificati).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from . import question_sets
+from .database import get_answers_snapshot, get_data_version
+from .scoring import INDEX_NAMES
+
+METRICS = ("final_score",) + INDEX_NAMES
+
+# Finestre temporali predefinite per la variazione delle risposte
+DRIFT_WINDOW_DAYS = 30
+DRIFT_WINDOWS = 6
+
+# Risultati in cache per parametri diversi (LRU: ogni voce è un'analisi completa)
+ANALYTICS_CACHE_SIZE = 8
+
+_cache = OrderedDict()  # (window_days, windows) -> ((versione dei dati, versione delle domande), risultato)
+_lock = threading.Lock()
+
+def _rounded(values: np.ndarray, digits: int = 3) -> list:
+    """Lista JSON-serializzabile (None al posto di NaN)."""
+    return [round(float(v), digits) if np.isfinite(v) else None for v in values]
+
+def _correlations(codes: np.ndarray, counts: np.ndarray, metrics: np.ndarray) -> np.ndarray:
+    """
+    Correlazione di Pearson tra l'indicatore di ogni opzione e ogni metrica: (opzioni, metriche).
+
+    Con y centrata, la covarianza di un indicatore è la somma di y sulle righe
+    che hanno scelto l'opzione: basta una bincount per metrica, senza one-hot.
+    """
+    n = len(codes)
+    y = metrics - metrics.mean(axis=0)
+    group_sums = np.stack([np.bincount(codes, weights=column, minlength=len(counts)) for column in y.T], axis=1)
+    x_norm = np.sqrt(counts * (1 - counts / n))
+    y_norm = np.sqrt((y * y).sum(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return group_sums / np.outer(x_norm, y_norm)
+
+def _question_analytics(question: dict, groups: list, ids: np.ndarray, metrics: np.ndarray,
+                        days: np.ndarray, window_edges: np.ndarray) -> dict:
+    keys = list(question["options"])
+    # Valori fuori dalle opzioni previste (es. opzioni rimosse) in coda
+    keys += sorted(key for key, _ in groups if key not in question["options"])
+    code_of = {key: code for code, key in enumerate(keys)}
+    answered = [np.fromstring(id_list, dtype=np.int64, sep=",") for _, id_list in groups]
+    positions = np.searchsorted(ids, np.concatenate(answered)) if answered else np.zeros(0, dtype=np.intp)
+    codes = np.concatenate([np.full(len(group_ids), code_of[key], dtype=np.intp)
+                            for (key, _), group_ids in zip(groups, answered)]) if answered else positions
+
+    n_options = len(keys)
+    counts = np.bincount(codes, minlength=n_options)
+    responses = int(counts.sum())
+    shares = counts / responses if responses else np.zeros(n_options)
+
+    if responses > 1:
+        correlations = _correlations(codes, counts, metrics[positions])
+    else:
+        correlations = np.full((n_options, len(METRICS)), np.nan)
+
+    # Quote per finestra temporale (finestre vuote: quote a zero)
+    window_of = np.searchsorted(window_edges, days[positions], side="right") - 1
+    in_range = (window_of >= 0) & (window_of < len(window_edges) - 1)
+    n_windows = len(window_edges) - 1
+    window_counts = np.bincount(window_of[in_range] * n_options + codes[in_range],
+                                minlength=n_windows * n_options).reshape(n_windows, n_options).astype(float)
+    window_totals = window_counts.sum(axis=1)
+    window_shares = np.divide(window_counts, window_totals[:, None],
+                              out=np.zeros_like(window_counts), where=window_totals[:, None] > 0)
+    # Variazione: distanza di variazione totale tra l'ultima finestra e le precedenti
+    change = None
+    if len(window_totals) > 1 and window_totals[-1] and window_totals[:-1].sum():
+        previous = window_counts[:-1].sum(axis=0) / window_totals[:-1].sum()
+        change = round(float(np.abs(window_shares[-1] - previous).sum() / 2), 3)
+
+    options = []
+    for code, key in enumerate(keys):
+        option = question["options"].get(key, {})
+        options.append({
+            "key": key,
+            "label": option.get("label", key),
+            "count": int(counts[code]),
+            "share": round(float(shares[code]), 4),
+            "correlations": dict(zip(METRICS, _rounded(correlations[code]))),
+        })
+    return {
+        "id": question["id"],
+        "text": question["text"],
+        "responses": responses,
+        "options": options,
+        "drift": {
+            "change": change,
+            "windows": [
+                {
+                    "responses": int(window_totals[w]),
+                    "shares": dict(zip(keys, _rounded(window_shares[w], 4))),
+                }
+                for w in range(len(window_totals))
+            ],
+        },
+    }
+
+def compute_question_analytics(window_days: int = DRIFT_WINDOW_DAYS, windows: int = DRIFT_WINDOWS,
+                               questions: list = None) -> dict:
+    """Analisi di tutte le domande (default: insieme attivo) sull'istantanea corrente dei dati."""
+    if questions is None:
+        questions = question_sets.current().questions
+    snapshot = get_answers_snapshot([question["id"] for question in questions])
+    columns = np.array(snapshot["evaluations"], dtype=float).reshape(-1, 2 + len(METRICS))
+    ids = columns[:, 0].astype(np.int64)
+    days = columns[:, 1]
+    metrics = np.nan_to_num(columns[:, 2:])
+
+    # Finestre che terminano con la valutazione più recente
+    end = (np.nanmax(days) if len(days) else 0.0) + 1e-6
+    window_edges = end - window_days * np.arange(windows, -1, -1)
+
+    results = [
+        _question_analytics(question, snapshot["answers"][question["id"]], ids, metrics, days, window_edges)
+        for question in questions
+    ]
+    for question in results:
+        for position, window in enumerate(question["drift"]["windows"]):
+            window["start"] = _date(window_edges[position])
+            window["end"] = _date(window_edges[position + 1])
+    return {
+        "total": int(len(ids)),
+        "window_days": window_days,
+        "metrics": list(METRICS),
+        "questions": results,
+    }
+
+def _date(julian_day: float) -> str:
+    """Data YYYY-MM-DD da un giorno giuliano."""
+    return time.strftime("%Y-%m-%d", time.gmtime((julian_day - 2440587.5) * 86400))
+
+def get_question_analytics(window_days: int = DRIFT_WINDOW_DAYS, windows: int = DRIFT_WINDOWS) -> dict:
+    """
+    Come compute_question_analytics, ma ricalcolato solo se i dati o le domande sono cambiati.
+
+    In cache restano i risultati delle ultime ANALYTICS_CACHE_SIZE combinazioni di parametri.
+    """
+    question_set = question_sets.current()
+    key = (window_days, windows)
+    version = (get_data_version(), question_set.version)
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == version:
+            _cache.move_to_end(key)
+            return cached[1]
+    result = compute_question_analytics(window_days, windows, question_set.questions)
+    result["generated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    with _lock:
+        _cache[key] = (version, result)
+        _cache.move_to_end(key)
+        while len(_cache) > ANALYTICS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
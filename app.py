@@ -1,10 +1,33 @@
 import os
 import json
+import sys
+import time
+from datetime import datetime
 from functools import wraps
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from .questions import QUESTIONS, OPEN_QUESTIONS
-from .database import init_db, save_evaluation, get_evaluation, get_all_evaluations, get_statistics
-from .interpretation import generate_interpretation, generate_final_report
+import click
+from flask import (
+    Flask, Response, g, render_template, request, jsonify, session, redirect, url_for, stream_with_context
+)
+from markupsafe import Markup
+from . import question_sets
+from .database import (
+    init_db, store_question_set, deactivate_question_sets, list_question_sets, get_evaluation, get_evaluation_status, list_evaluations, get_statistics,
+    claim_evaluation_report, release_evaluation_report, update_evaluation_texts, rebuild_statistics, backfill_answers,
+    get_answer_distribution, search_evaluations
+)
+from .interpretation import (
+    LLM_DEADLINE, fill_missing_texts, generate_final_report, generate_texts, stream_final_report,
+    submit_interpretation
+)
+from .export import EXPORT_FORMATS, export_evaluations
+from .group_commit import save_evaluation
+from .importer import IMPORT_BATCH_SIZE, import_evaluations
+from .rescoring import RESCORE_CHUNK_SIZE, rescore_evaluations
+from .jobs import schedule_report_job, start_recovery, submit_report_job
+from . import llm_guard
+from .llm_cache import cache as llm_cache
+from .score_ranking import distribution as score_distribution
+from .analytics import DRIFT_WINDOW_DAYS, DRIFT_WINDOWS, get_question_analytics
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "liba2004-secret-key-change-in-production")
@@ -24,243 +47,44 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def calculate_score(answers: dict) -> dict:
-    """
-    Calcola il punteggio totale e la valutazione completa secondo le regole specificate.
-    """
-    points_breakdown = []
-    total_points = 0
-    max_possible_points = 0
-    
-    # Mappatura per calcolare gli indici
-    trust_questions = ["trust_future"]  # La più importante, interpretativa
-    vision_questions = ["mare_montagna", "where_live", "vacation_type"]  # Stile di vita e visione
-    emotional_maturity_questions = ["attractive_woman", "wife_job", "how_die"]  # Maturità e valori
-    ambition_questions = ["rich_priority", "representative_phrase", "money_relationship"]  # Ambizione e costruzione
-    
-    trust_points = 0
-    vision_points = 0
-    emotional_maturity_points = 0
-    ambition_points = 0
-    
-    trust_max = 0
-    vision_max = 0
-    emotional_maturity_max = 0
-    ambition_max = 0
-    
-    # Valuta ogni domanda
-    for question in QUESTIONS:
-        q_id = question["id"]
-        answer_value = answers.get(q_id)
-        
-        if not answer_value:
-            continue
-        
-        multiplier = question.get("importance_multiplier", 1.0)
-        question_points = 0
-        reason = ""
-        
-        if question["type"] == "correct_answer":
-            correct = question["correct_answer"]
-            if answer_value == correct:
-                question_points = 8
-                reason = "Risposta corretta"
-            else:
-                # Controlla se indica incompatibilità forte
-                option = question["options"].get(answer_value, {})
-                base_points = option.get("points", 0)
-                if base_points < 0:
-                    question_points = -4
-                    reason = "Incompatibilità forte rilevata"
-                else:
-                    question_points = 0
-                    reason = "Risposta non corretta"
-        
-        elif question["type"] == "interpretive":
-            option = question["options"].get(answer_value, {})
-            question_points = option.get("points", 0)
-            if question_points > 0:
-                reason = "Valutazione psicologica positiva"
-            elif question_points < 0:
-                reason = "Valutazione psicologica negativa"
-            else:
-                reason = "Valutazione neutra"
-        
-        # Applica moltiplicatore
-        final_points = question_points * multiplier
-        total_points += final_points
-        
-        # Calcola max possibile per questa domanda
-        max_for_question = max([opt.get("points", 0) * multiplier for opt in question["options"].values()])
-        max_possible_points += max_for_question
-        
-        # Aggiorna indici
-        if q_id in trust_questions:
-            trust_points += final_points
-            trust_max += max_for_question
-        if q_id in vision_questions:
-            vision_points += final_points
-            vision_max += max_for_question
-        if q_id in emotional_maturity_questions:
-            emotional_maturity_points += final_points
-            emotional_maturity_max += max_for_question
-        if q_id in ambition_questions:
-            ambition_points += final_points
-            ambition_max += max_for_question
-        
-        # Trova il label della risposta
-        answer_label = question["options"].get(answer_value, {}).get("label", answer_value)
-        
-        points_breakdown.append({
-            "question": question["text"],
-            "answer": answer_label,
-            "points": round(final_points, 1),
-            "reason": reason
-        })
-    
-    # Calcola final_score (0-100)
-    if max_possible_points > 0:
-        final_score = max(0, min(100, int((total_points / max_possible_points) * 100)))
-    else:
-        final_score = 0
-    
-    # Calcola indici (0-10)
-    trust_index = round((trust_points / trust_max * 10) if trust_max > 0 else 0, 1)
-    vision_index = round((vision_points / vision_max * 10) if vision_max > 0 else 0, 1)
-    emotional_maturity_index = round((emotional_maturity_points / emotional_maturity_max * 10) if emotional_maturity_max > 0 else 0, 1)
-    ambition_alignment_index = round((ambition_points / ambition_max * 10) if ambition_max > 0 else 0, 1)
-    
-    # Determina compatibility_level
-    if final_score >= 80:
-        compatibility_level = "wife material"
-    elif final_score >= 60:
-        compatibility_level = "compatibile"
-    elif final_score >= 40:
-        compatibility_level = "potenziale"
-    else:
-        compatibility_level = "non compatibile"
-    
-    # Genera verdict (ironico ma intelligente)
-    if final_score >= 85:
-        verdict = "Wife material. Allineamento solido, costruire insieme è possibile."
-    elif final_score >= 70:
-        verdict = "Compatibile sul piano mentale, ma non ancora pronta per reggere il ritmo."
-    elif final_score >= 55:
-        verdict = "Potenziale presente, ma serve chiarimento su alcuni punti critici."
-    elif final_score >= 40:
-        verdict = "Compatibilità limitata. Differenze significative su valori chiave."
-    else:
-        verdict = "Incompatibilità strutturale. Visioni troppo distanti per costruire insieme."
-    
-    # Analizza risposte aperte per red flags e strengths
-    strengths = []
-    concerns = []
-    red_flags = []
-    
-    # Analisi basata sui punteggi
-    if trust_index >= 8:
-        strengths.append("Fiducia solida nel futuro e nelle capacità")
-    elif trust_index < 5:
-        concerns.append("Fiducia limitata o assente")
-        if trust_index < 3:
-            red_flags.append("Mancanza di fiducia nel futuro")
-    
-    if vision_index >= 8:
-        strengths.append("Visione chiara e a lungo termine")
-    elif vision_index < 5:
-        concerns.append("Visione a lungo termine poco chiara")
-    
-    if emotional_maturity_index >= 8:
-        strengths.append("Maturità emotiva e gestione costruttiva dei conflitti")
-    elif emotional_maturity_index < 5:
-        concerns.append("Maturità emotiva da sviluppare")
-        if emotional_maturity_index < 3:
-            red_flags.append("Gestione emotiva problematica")
-    
-    if ambition_alignment_index >= 8:
-        strengths.append("Allineamento su ambizione e progetti futuri")
-    elif ambition_alignment_index < 5:
-        concerns.append("Differenze significative su ambizione e progetti")
-        if ambition_alignment_index < 3:
-            red_flags.append("Incompatibilità su ambizione e visione futura")
-    
-    # Analisi specifiche dalle risposte
-    if answers.get("trust_future") == "1_2_anni":
-        strengths.append("Fiducia totale nel futuro: valore fondamentale")
-    elif answers.get("trust_future") == "ci_sono_nato":
-        red_flags.append("Possibile interesse strumentale: risposta 'ci sono nato/a'")
-    
-    if answers.get("attractive_woman") == "intelligente_carattere":
-        strengths.append("Valorizza intelligenza e carattere: allineamento sui valori")
-    
-    if answers.get("wife_job") == "direttrice":
-        strengths.append("Visione ambiziosa per la coppia: direttrice")
-    
-    if answers.get("money_relationship") == "investo":
-        strengths.append("Approccio costruttivo al denaro: investe")
-    elif answers.get("money_relationship") == "mignotte_cocaina":
-        red_flags.append("Rapporto problematico con il denaro")
-    
-    if answers.get("rich_priority") == "aumentare_livello":
-        strengths.append("Priorità su crescita e livello, non su apparenza")
-    
-    if answers.get("representative_phrase") == "costruisco_fatica":
-        strengths.append("Mentalità costruttiva: 'costruisco anche se costa fatica'")
-    
-    # Analizza risposte aperte (se presenti)
-    why_us = answers.get("why_us", "").strip()
-    non_negotiables = answers.get("non_negotiables", "").strip()
-    
-    if why_us:
-        if len(why_us) < 20:
-            concerns.append("Risposta 'Perché funzioneremmo' troppo breve o superficiale")
-        elif "soldi" in why_us.lower() or "ricco" in why_us.lower() or "denaro" in why_us.lower():
-            red_flags.append("Possibile interesse strumentale rilevato nelle risposte aperte")
-        elif "futuro" in why_us.lower() or "crescita" in why_us.lower() or "costruire" in why_us.lower():
-            strengths.append("Visione costruttiva espressa nelle risposte")
-    
-    if non_negotiables:
-        if "gelosia" in non_negotiables.lower() or "controllo" in non_negotiables.lower():
-            concerns.append("Possibili dinamiche di controllo")
-    
-    # Genera final_message (elegante e tagliente)
-    if final_score >= 85:
-        final_message = "Allineamento solido. La costruzione insieme è possibile."
-    elif final_score >= 70:
-        final_message = "Buona base mentale. Serve maturità e rispetto reciproco per reggere il ritmo."
-    elif final_score >= 55:
-        final_message = "Potenziale presente, ma le differenze richiedono chiarimento e crescita."
-    elif final_score >= 40:
-        final_message = "Compatibilità limitata. Le visioni divergono su punti fondamentali."
-    else:
-        final_message = "Incompatibilità strutturale. Visioni troppo distanti per costruire insieme."
-    
-    return {
-        "final_score": final_score,
-        "verdict": verdict,
-        "compatibility_level": compatibility_level,
-        "points_breakdown": points_breakdown,
-        "strengths": strengths if strengths else ["Nessun punto di forza significativo rilevato"],
-        "concerns": concerns if concerns else ["Nessuna criticità significativa rilevata"],
-        "red_flags": red_flags if red_flags else [],
-        "trust_index": trust_index,
-        "vision_index": vision_index,
-        "emotional_maturity_index": emotional_maturity_index,
-        "ambition_alignment_index": ambition_alignment_index,
-        "final_message": final_message
-    }
+@app.before_request
+def start_background_jobs():
+    """Recupero dei testi non completati, avviato alla prima richiesta servita da ogni worker."""
+    start_recovery()
+
+@app.before_request
+def load_question_set():
+    """Insieme di domande della richiesta: resta lo stesso anche se nel frattempo ne arriva uno nuovo."""
+    g.question_set = question_sets.current()
 
 @app.get("/")
 def home():
     return render_template("index.html")
 
+# Durata della cache del browser per /api/questions (poi rivalida con l'ETag)
+QUESTIONS_MAX_AGE = int(os.getenv("QUESTIONS_MAX_AGE", "3600"))  # secondi
+
+def _questions_response(payload: dict) -> Response:
+    """Risposta con ETag, Cache-Control e versione compressa se il client la accetta."""
+    encoding = "gzip" if "gzip" in request.accept_encodings else "identity"
+    body, etag = payload[encoding]
+    headers = {
+        "Cache-Control": f"public, max-age={QUESTIONS_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+    if request.if_none_match.contains(etag):
+        response = Response(status=304, headers=headers)
+    else:
+        response = Response(body, mimetype="application/json", headers=headers)
+        if encoding == "gzip":
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    return response
+
 @app.get("/api/questions")
 def get_questions():
-    """Endpoint per ottenere le domande strutturate"""
-    return jsonify({
-        "questions": QUESTIONS,
-        "open_questions": OPEN_QUESTIONS
-    })
+    """Endpoint per ottenere le domande strutturate (solo testi ed etichette)"""
+    return _questions_response(g.question_set.payload)
 
 @app.post("/api/score")
 def score():
@@ -272,41 +96,177 @@ def score():
     
     try:
         # Calcola il punteggio
-        result = calculate_score(data["answers"])
+        result = g.question_set.scorer.score(data["answers"])
+        # Posizione rispetto alle valutazioni già presenti (istogramma in memoria)
+        ranking = score_distribution.rank(result["final_score"], result["compatibility_level"])
         
-        # Genera interpretazione avanzata
-        interpretation = generate_interpretation(result, data["answers"])
+        if data.get("async") or data.get("stream"):
+            # Modalità asincrona: salva subito, i testi vengono generati in background
+            # (oppure in streaming da /api/evaluations/<id>/report/stream)
+            eval_id = save_evaluation(
+                {"name": data.get("name", ""), "answers": data["answers"], **result,
+                 "scoring_version": g.question_set.version},
+                report_status="pending"
+            )
+            score_distribution.observe(result["final_score"], result["compatibility_level"])
+            if data.get("stream"):
+                # Se il browser non apre lo stream (scheda chiusa, proxy, client API) ci pensa un job
+                schedule_report_job(eval_id, dict(result), data["answers"])
+            else:
+                submit_report_job(eval_id, dict(result), data["answers"])
+            
+            result["interpretation"] = None
+            result["final_report"] = None
+            result["evaluation_id"] = eval_id
+            result["report_status"] = "pending"
+            result["ranking"] = ranking
+            return jsonify(result), 202
         
-        # Genera resoconto finale
-        final_report = generate_final_report(result, data["answers"])
+        # Genera interpretazione avanzata e resoconto finale in parallelo
+        interpretation, final_report, llm_timings = generate_texts(result, data["answers"])
         
         # Prepara i dati per il salvataggio
         evaluation_data = {
             "name": data.get("name", ""),
             "answers": data["answers"],
-            **result
+            **result,
+            "scoring_version": g.question_set.version
         }
         
         # Salva nel database
         eval_id = save_evaluation(evaluation_data, interpretation, final_report)
+        score_distribution.observe(result["final_score"], result["compatibility_level"])
         
         # Aggiungi interpretazione, resoconto finale e ID al risultato
         result["interpretation"] = interpretation
         result["final_report"] = final_report
         result["evaluation_id"] = eval_id
+        result["report_status"] = "ready"
+        result["llm_timings"] = llm_timings
+        result["ranking"] = ranking
         
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": "Errore durante la valutazione", "details": str(e)}), 500
 
+# Risposte massime per richiesta a /api/score/batch
+MAX_BATCH = int(os.getenv("MAX_BATCH", "1000"))
+
+@app.post("/api/score/batch")
+def score_batch():
+    """
+    Valuta molte risposte in un'unica richiesta (al massimo MAX_BATCH).
+
+    Di default calcola solo punteggi, indici e livello in forma vettoriale;
+    con "generate_text" e/o "save" (solo per l'admin loggato) ogni risposta
+    passa dal percorso completo.
+    """
+    data = request.get_json(force=True)
+
+    # Validazione
+    submissions = data.get("submissions") if isinstance(data, dict) else None
+    if not isinstance(submissions, list) or not all(
+        isinstance(item, dict) and isinstance(item.get("answers"), dict) for item in submissions
+    ):
+        return jsonify({"error": "Payload non valido"}), 400
+    if len(submissions) > MAX_BATCH:
+        return jsonify({"error": f"Troppe risposte: massimo {MAX_BATCH} per richiesta"}), 400
+
+    generate_text = bool(data.get("generate_text", False))
+    save = bool(data.get("save", False))
+    # Testi (chiamate OpenAI) e salvataggi in blocco solo per l'admin
+    if (generate_text or save) and not session.get("admin_logged_in"):
+        return jsonify({"error": "\"generate_text\" e \"save\" richiedono l'accesso admin"}), 403
+
+    scorer = g.question_set.scorer
+    try:
+        if not generate_text and not save:
+            results = scorer.score_batch([item["answers"] for item in submissions])
+            return jsonify({"results": results, "count": len(results)})
+
+        results = []
+        for item in submissions:
+            result = scorer.score(item["answers"])
+            interpretation = final_report = None
+            if generate_text:
+                interpretation, final_report, _ = generate_texts(result, item["answers"])
+            if save:
+                evaluation_data = {
+                    "name": item.get("name", ""),
+                    "answers": item["answers"],
+                    **result,
+                    "scoring_version": scorer.version
+                }
+                result["evaluation_id"] = save_evaluation(evaluation_data, interpretation, final_report)
+            result["interpretation"] = interpretation
+            result["final_report"] = final_report
+            results.append(result)
+        return jsonify({"results": results, "count": len(results)})
+    except Exception as e:
+        return jsonify({"error": "Errore durante la valutazione", "details": str(e)}), 500
+
+# Righe per pagina nelle liste paginate
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def _list_filters(args) -> dict:
+    """Filtri e cursore di list_evaluations dalla query string (ValueError se non validi)."""
+    def optional_int(name):
+        value = args.get(name, "").strip()
+        return int(value) if value else None
+
+    def optional_date(name):
+        value = args.get(name, "").strip()
+        if value:
+            datetime.strptime(value, "%Y-%m-%d")
+        return value or None
+
+    return {
+        "cursor": args.get("cursor") or None,
+        "level": args.get("level") or None,
+        "min_score": optional_int("min_score"),
+        "max_score": optional_int("max_score"),
+        "date_from": optional_date("date_from"),
+        "date_to": optional_date("date_to"),
+    }
+
 @app.get("/api/evaluations")
 def get_evaluations():
-    """Endpoint per recuperare tutte le valutazioni salvate."""
+    """
+    Endpoint per le valutazioni salvate, più recenti prima.
+    
+    Query string: limit, cursor (next_cursor della pagina precedente), level,
+    min_score, max_score, date_from, date_to (YYYY-MM-DD).
+    """
     try:
-        evaluations = get_all_evaluations()
-        return jsonify({"evaluations": evaluations})
+        limit = min(max(int(request.args.get("limit", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        page = list_evaluations(limit=limit, **_list_filters(request.args))
+    except ValueError as e:
+        return jsonify({"error": "Parametri non validi", "details": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Errore nel recupero delle valutazioni", "details": str(e)}), 500
+    return jsonify(page)
+
+@app.get("/api/evaluations/search")
+@admin_required
+def search_evaluations_api():
+    """
+    Ricerca testuale su risposte aperte, interpretazione e resoconto finale.
+    
+    Query string: q (parole da cercare), limit, cursor. I risultati sono ordinati
+    per rilevanza; "snippet" è HTML con i termini trovati tra <mark>.
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Parametro q mancante"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        page = search_evaluations(query, limit=limit, cursor=request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": "Parametri non validi", "details": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Errore nella ricerca", "details": str(e)}), 500
+    return jsonify(page)
 
 @app.get("/api/evaluations/<int:eval_id>")
 def get_evaluation_detail(eval_id):
@@ -319,6 +279,96 @@ def get_evaluation_detail(eval_id):
     except Exception as e:
         return jsonify({"error": "Errore nel recupero della valutazione", "details": str(e)}), 500
 
+@app.get("/api/evaluations/<int:eval_id>/status")
+def get_evaluation_status_detail(eval_id):
+    """Endpoint di polling per lo stato dei testi di una valutazione asincrona."""
+    try:
+        status = get_evaluation_status(eval_id)
+        if not status:
+            return jsonify({"error": "Valutazione non trovata"}), 404
+        return jsonify(status)
+    except Exception as e:
+        return jsonify({"error": "Errore nel recupero della valutazione", "details": str(e)}), 500
+
+def _sse(event: str, data: dict) -> str:
+    """Formatta un evento Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/api/evaluations/<int:eval_id>/report/stream")
+def stream_report(eval_id):
+    """
+    Genera il resoconto finale in streaming (Server-Sent Events).
+    
+    Eventi: "delta" per ogni frammento del resoconto, "reset" se lo stream si
+    interrompe (i frammenti ricevuti vanno scartati, segue il resoconto
+    completo), "interpretation" con l'interpretazione completa, "done" alla fine. Se i testi sono già pronti
+    vengono inviati subito; se un'altra richiesta li sta generando si riceve "busy".
+    """
+    evaluation = get_evaluation(eval_id)
+    if not evaluation:
+        return jsonify({"error": "Valutazione non trovata"}), 404
+    
+    def replay():
+        status = get_evaluation_status(eval_id)
+        if status["report_status"] == "streaming":
+            yield _sse("busy", {"report_status": "streaming"})
+            return
+        if status["final_report"]:
+            yield _sse("delta", {"text": status["final_report"]})
+        yield _sse("interpretation", {"text": status["interpretation"]})
+        yield _sse("done", {"report_status": status["report_status"]})
+    
+    def generate():
+        completed = False
+        interpretation_future = submit_interpretation(evaluation, evaluation["answers"])
+        try:
+            started = time.monotonic()
+            parts = []
+            try:
+                for delta in stream_final_report(evaluation, evaluation["answers"], timeout=LLM_DEADLINE):
+                    parts.append(delta)
+                    yield _sse("delta", {"text": delta})
+            except Exception:
+                # Stream interrotto: il testo parziale non è un resoconto, il client lo scarta
+                if parts:
+                    yield _sse("reset", {})
+                parts = []
+                remaining = LLM_DEADLINE - (time.monotonic() - started)
+                final_report = generate_final_report(evaluation, evaluation["answers"], timeout=remaining) \
+                    if remaining > 0 else None
+                if final_report:
+                    parts.append(final_report)
+                    yield _sse("delta", {"text": final_report})
+            
+            try:
+                interpretation = interpretation_future.result(timeout=LLM_DEADLINE)
+            except Exception:
+                interpretation = None
+            
+            interpretation, final_report, filled = fill_missing_texts(
+                evaluation, evaluation["answers"], interpretation, "".join(parts).strip() or None
+            )
+            if "final_report" in filled:
+                yield _sse("delta", {"text": final_report})
+            
+            # Salva prima di chiudere lo stream, anche se il client si disconnette alla fine
+            update_evaluation_texts(eval_id, interpretation, final_report, "ready")
+            completed = True
+            yield _sse("interpretation", {"text": interpretation})
+            yield _sse("done", {"report_status": "ready"})
+        finally:
+            if not completed:
+                # Client disconnesso o errore: completa la valutazione in background
+                release_evaluation_report(eval_id)
+                submit_report_job(eval_id, evaluation, evaluation["answers"])
+    
+    stream = generate() if claim_evaluation_report(eval_id) else replay()
+    return Response(
+        stream_with_context(stream),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/statistics")
 def statistics():
     """Endpoint per recuperare statistiche aggregate."""
@@ -328,6 +378,30 @@ def statistics():
     except Exception as e:
         return jsonify({"error": "Errore nel recupero delle statistiche", "details": str(e)}), 500
 
+@app.get("/api/analytics/questions")
+@admin_required
+def question_analytics():
+    """
+    Analisi per domanda: frequenze delle opzioni, correlazioni con punteggio e
+    indici, variazione delle scelte per finestre temporali.
+    
+    Query string: window_days (durata di una finestra), windows (numero di finestre).
+    """
+    try:
+        window_days = min(max(int(request.args.get("window_days", DRIFT_WINDOW_DAYS)), 1), 365)
+        windows = min(max(int(request.args.get("windows", DRIFT_WINDOWS)), 1), 52)
+    except ValueError as e:
+        return jsonify({"error": "Parametri non validi", "details": str(e)}), 400
+    try:
+        return jsonify(get_question_analytics(window_days, windows))
+    except Exception as e:
+        return jsonify({"error": "Errore nel calcolo delle analisi", "details": str(e)}), 500
+
+@app.get("/api/llm/status")
+def llm_status():
+    """Endpoint di monitoraggio della generazione testi (circuit breaker, coda, cache)."""
+    return jsonify({**llm_guard.stats(), "cache": llm_cache.stats()})
+
 # ========== ADMIN ROUTES ==========
 
 @app.get("/admin")
@@ -352,16 +426,64 @@ def admin_logout():
     session.pop("admin_logged_in", None)
     return redirect(url_for("admin_login"))
 
+def _dashboard_page(args) -> dict:
+    """Pagina della dashboard: risultati della ricerca se c'è q, altrimenti lista filtrata."""
+    query = args.get("q", "").strip()
+    if query:
+        page = search_evaluations(query, limit=PAGE_SIZE, cursor=args.get("cursor"))
+        for evaluation in page["evaluations"]:
+            evaluation["snippet"] = Markup(evaluation["snippet"])
+        return page
+    return list_evaluations(limit=PAGE_SIZE, **_list_filters(args))
+
 @app.get("/admin/dashboard")
 @admin_required
 def admin_dashboard():
-    """Dashboard admin con tutte le valutazioni."""
+    """Dashboard admin: statistiche e prima pagina delle valutazioni (filtrate o cercate)."""
+    filters = {name: request.args.get(name, "") for name in
+               ("q", "level", "min_score", "max_score", "date_from", "date_to")}
     try:
-        evaluations = get_all_evaluations(limit=1000)
+        page = _dashboard_page(request.args)
         stats = get_statistics()
-        return render_template("admin_dashboard.html", evaluations=evaluations, stats=stats)
+        return render_template("admin_dashboard.html", evaluations=page["evaluations"],
+                               next_cursor=page["next_cursor"], filters=filters, stats=stats)
     except Exception as e:
-        return render_template("admin_dashboard.html", error=str(e), evaluations=[], stats={})
+        return render_template("admin_dashboard.html", error=str(e), evaluations=[],
+                               next_cursor=None, filters=filters, stats={})
+
+@app.get("/admin/dashboard/rows")
+@admin_required
+def admin_dashboard_rows():
+    """Pagina successiva della dashboard: righe della tabella, cursore nell'header X-Next-Cursor."""
+    try:
+        page = _dashboard_page(request.args)
+    except ValueError as e:
+        return str(e), 400
+    response = Response(render_template("admin_evaluation_rows.html", evaluations=page["evaluations"]))
+    response.headers["X-Next-Cursor"] = page["next_cursor"] or ""
+    return response
+
+@app.get("/admin/export")
+@admin_required
+def admin_export():
+    """
+    Esporta tutte le valutazioni (con i filtri della dashboard) in streaming.
+
+    Query string: format ("ndjson" o "csv"), level, min_score, max_score, date_from, date_to.
+    """
+    export_format = request.args.get("format", "ndjson")
+    try:
+        filters = _list_filters(request.args)
+        filters.pop("cursor")
+        chunks = export_evaluations(export_format, **filters)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    filename = f"valutazioni-{datetime.now():%Y%m%d-%H%M%S}.{export_format}"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/admin/evaluation/<int:eval_id>")
 @admin_required
@@ -375,5 +497,139 @@ def admin_evaluation_detail(eval_id):
     except Exception as e:
         return render_template("admin_error.html", message=f"Errore: {str(e)}"), 500
 
+@app.get("/admin/analytics")
+@admin_required
+def admin_analytics():
+    """Distribuzione delle risposte, punteggio medio e correlazione per opzione, domanda per domanda."""
+    try:
+        distribution = get_answer_distribution()
+        analytics = {item["id"]: item for item in get_question_analytics()["questions"]}
+    except Exception as e:
+        return render_template("admin_error.html", message=f"Errore: {str(e)}"), 500
+
+    questions = []
+    for question in g.question_set.questions:
+        counts = distribution.get(question["id"], {})
+        question_analytics = analytics.get(question["id"], {"options": [], "drift": {"change": None}})
+        correlations = {item["key"]: item["correlations"]["final_score"] for item in question_analytics["options"]}
+        total = sum(item["count"] for item in counts.values())
+        options = [
+            {"key": key, "label": option.get("label", key), **counts.get(key, {"count": 0, "avg_score": None})}
+            for key, option in question["options"].items()
+        ]
+        # Valori non previsti (es. opzioni rimosse) in fondo
+        options += [{"key": key, "label": key, **item} for key, item in counts.items()
+                    if key not in question["options"]]
+        for option in options:
+            option["share"] = option["count"] / total * 100 if total else 0
+            option["correlation"] = correlations.get(option["key"])
+        questions.append({"id": question["id"], "text": question["text"], "total": total, "options": options,
+                          "drift": question_analytics["drift"]["change"]})
+    return render_template("admin_analytics.html", questions=questions)
+
+# ========== COMANDI CLI (flask --app quits.app <comando>) ==========
+
+@app.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Verifica e ricostruisce le statistiche materializzate."""
+    result = rebuild_statistics()
+    materialized, recomputed = result["materialized"], result["recomputed"]
+    differences = [key for key in recomputed if materialized[key] != recomputed[key]]
+    for key in differences:
+        print(f"{key}: materializzato {materialized[key]}, ricalcolato {recomputed[key]}")
+    if result["histogram_mismatches"]:
+        print(f"Istogramma: {result['histogram_mismatches']} bucket non corrispondenti")
+    if not differences and not result["histogram_mismatches"]:
+        print(f"Statistiche coerenti ({recomputed['total']} valutazioni)")
+    else:
+        print("Statistiche ricostruite")
+
+@app.cli.command("backfill-answers")
+def backfill_answers_command():
+    """Popola la tabella evaluation_answers per le valutazioni già salvate."""
+    processed = backfill_answers()
+    print(f"Risposte normalizzate per {processed} valutazioni")
+
+@app.cli.command("export-evaluations")
+@click.option("--format", "export_format", type=click.Choice(list(EXPORT_FORMATS)), default="ndjson")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), help="File di destinazione (default: stdout)")
+@click.option("--level", help="Livello di compatibilità")
+@click.option("--min-score", type=int)
+@click.option("--max-score", type=int)
+@click.option("--date-from", type=click.DateTime(["%Y-%m-%d"]))
+@click.option("--date-to", type=click.DateTime(["%Y-%m-%d"]))
+def export_evaluations_command(export_format, output, level, min_score, max_score, date_from, date_to):
+    """Esporta le valutazioni in NDJSON o CSV (in streaming, memoria costante)."""
+    chunks = export_evaluations(
+        export_format, level=level, min_score=min_score, max_score=max_score,
+        date_from=f"{date_from:%Y-%m-%d}" if date_from else None,
+        date_to=f"{date_to:%Y-%m-%d}" if date_to else None,
+    )
+    out = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
+
+@app.cli.command("import-evaluations")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", type=int, default=IMPORT_BATCH_SIZE, show_default=True, help="Righe per transazione")
+@click.option("--skip-llm", is_flag=True, help="Non generare i testi per le righe che non li hanno")
+@click.option("--restart", is_flag=True, help="Ignora l'avanzamento salvato e riparte dall'inizio")
+def import_evaluations_command(path, batch_size, skip_llm, restart):
+    """Importa valutazioni da un file NDJSON (rivalutate con calculate_score)."""
+    try:
+        import_evaluations(path, batch_size=batch_size, skip_llm=skip_llm, restart=restart)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+@app.cli.command("rescore")
+@click.option("--workers", type=int, default=0, show_default=True,
+              help="Processi di calcolo (0 = nel processo corrente, di solito il più veloce)")
+@click.option("--chunk-size", type=int, default=RESCORE_CHUNK_SIZE, show_default=True, help="Valutazioni per transazione")
+@click.option("--all", "force", is_flag=True, help="Rivaluta anche le valutazioni già alla versione attuale")
+def rescore_command(workers, chunk_size, force):
+    """Ricalcola punteggi, indici e livelli salvati con le domande e le regole attuali."""
+    rescore_evaluations(workers=workers, chunk_size=chunk_size, force=force)
+
+@app.cli.group("question-set")
+def question_set_command():
+    """Insiemi di domande versionati (ricaricati dai worker senza riavvio)."""
+
+@question_set_command.command("activate")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+def question_set_activate_command(path):
+    """Valida un insieme di domande (JSON), lo salva e lo rende attivo."""
+    with open(path, encoding="utf-8") as f:
+        definition = json.load(f)
+    try:
+        question_set = question_sets.QuestionSet(definition)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    store_question_set(question_set.version, question_set.label,
+                       json.dumps(question_set.definition(), ensure_ascii=False))
+    print(f"Insieme di domande {question_set.version} attivo "
+          f"(i worker lo caricano entro {question_sets.QUESTION_SET_RELOAD:g} s)")
+
+@question_set_command.command("deactivate")
+def question_set_deactivate_command():
+    """Torna alle domande di questions.py."""
+    deactivate_question_sets()
+    print("Nessun insieme di domande attivo: valgono le domande di questions.py")
+
+@question_set_command.command("list")
+def question_set_list_command():
+    """Elenca gli insiemi di domande salvati."""
+    for item in list_question_sets():
+        marker = "*" if item["active"] else " "
+        print(f"{marker} {item['version']}  {item['created_at']}  {item['label'] or ''}")
+
+@question_set_command.command("dump")
+def question_set_dump_command():
+    """Stampa in JSON l'insieme di domande attivo (punto di partenza per una nuova versione)."""
+    print(json.dumps(question_sets.current().definition(), ensure_ascii=False, indent=2))
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
@@ -0,0 +1,1239 @@
+"""
+Benchmark e verifiche di equivalenza per i percorsi critici dell'applicazione.
+
+Uso (dalla directory che contiene il pacchetto):
+    python -m <pacchetto>.benchmark score [--samples N] [--iterations N]
+    python -m <pacchetto>.benchmark batch [--size N]
+    python -m <pacchetto>.benchmark llm [--latency S]
+    python -m <pacchetto>.benchmark stream [--latency S] [--token-delay S]
+    python -m <pacchetto>.benchmark cache [--size N] [--latency S]
+    python -m <pacchetto>.benchmark combined [--latency S]
+    python -m <pacchetto>.benchmark guard
+    python -m <pacchetto>.benchmark local [--size N]
+    python -m <pacchetto>.benchmark db [--threads N] [--seconds S]
+    python -m <pacchetto>.benchmark groupcommit [--threads N ...] [--writes N] [--synchronous MODE]
+    python -m <pacchetto>.benchmark stats [--rows N]
+    python -m <pacchetto>.benchmark analytics [--rows N]
+    python -m <pacchetto>.benchmark export [--rows N]
+    python -m <pacchetto>.benchmark import [--rows N] [--batch-size N]
+    python -m <pacchetto>.benchmark rescore [--rows N] [--workers N]
+    python -m <pacchetto>.benchmark questionsets [--versions N ...]
+    python -m <pacchetto>.benchmark open [--words N] [--keywords N]
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import (
+    analytics, database, export, group_commit, importer, interpretation, llm_guard, question_sets, rescoring,
+    scoring, text_rules
+)
+from .questions import QUESTIONS
+from .scoring import INDEX_NAMES, calculate_score, calculate_scores_batch
+
+
+def legacy_calculate_score(answers: dict) -> dict:
+    """
+    Implementazione originale (non compilata) di calculate_score, usata come riferimento.
+    """
+    points_breakdown = []
+    total_points = 0
+    max_possible_points = 0
+    
+    # Mappatura per calcolare gli indici
+    trust_questions = ["trust_future"]  # La più importante, interpretativa
+    vision_questions = ["mare_montagna", "where_live", "vacation_type"]  # Stile di vita e visione
+    emotional_maturity_questions = ["attractive_woman", "wife_job", "how_die"]  # Maturità e valori
+    ambition_questions = ["rich_priority", "representative_phrase", "money_relationship"]  # Ambizione e costruzione
+    
+    trust_points = 0
+    vision_points = 0
+    emotional_maturity_points = 0
+    ambition_points = 0
+    
+    trust_max = 0
+    vision_max = 0
+    emotional_maturity_max = 0
+    ambition_max = 0
+    
+    # Valuta ogni domanda
+    for question in QUESTIONS:
+        q_id = question["id"]
+        answer_value = answers.get(q_id)
+        
+        if not answer_value:
+            continue
+        
+        multiplier = question.get("importance_multiplier", 1.0)
+        question_points = 0
+        reason = ""
+        
+        if question["type"] == "correct_answer":
+            correct = question["correct_answer"]
+            if answer_value == correct:
+                question_points = 8
+                reason = "Risposta corretta"
+            else:
+                # Controlla se indica incompatibilità forte
+                option = question["options"].get(answer_value, {})
+                base_points = option.get("points", 0)
+                if base_points < 0:
+                    question_points = -4
+                    reason = "Incompatibilità forte rilevata"
+                else:
+                    question_points = 0
+                    reason = "Risposta non corretta"
+        
+        elif question["type"] == "interpretive":
+            option = question["options"].get(answer_value, {})
+            question_points = option.get("points", 0)
+            if question_points > 0:
+                reason = "Valutazione psicologica positiva"
+            elif question_points < 0:
+                reason = "Valutazione psicologica negativa"
+            else:
+                reason = "Valutazione neutra"
+        
+        # Applica moltiplicatore
+        final_points = question_points * multiplier
+        total_points += final_points
+        
+        # Calcola max possibile per questa domanda
+        max_for_question = max([opt.get("points", 0) * multiplier for opt in question["options"].values()])
+        max_possible_points += max_for_question
+        
+        # Aggiorna indici
+        if q_id in trust_questions:
+            trust_points += final_points
+            trust_max += max_for_question
+        if q_id in vision_questions:
+            vision_points += final_points
+            vision_max += max_for_question
+        if q_id in emotional_maturity_questions:
+            emotional_maturity_points += final_points
+            emotional_maturity_max += max_for_question
+        if q_id in ambition_questions:
+            ambition_points += final_points
+            ambition_max += max_for_question
+        
+        # Trova il label della risposta
+        answer_label = question["options"].get(answer_value, {}).get("label", answer_value)
+        
+        points_breakdown.append({
+            "question": question["text"],
+            "answer": answer_label,
+            "points": round(final_points, 1),
+            "reason": reason
+        })
+    
+    # Calcola final_score (0-100)
+    if max_possible_points > 0:
+        final_score = max(0, min(100, int((total_points / max_possible_points) * 100)))
+    else:
+        final_score = 0
+    
+    # Calcola indici (0-10)
+    trust_index = round((trust_points / trust_max * 10) if trust_max > 0 else 0, 1)
+    vision_index = round((vision_points / vision_max * 10) if vision_max > 0 else 0, 1)
+    emotional_maturity_index = round((emotional_maturity_points / emotional_maturity_max * 10) if emotional_maturity_max > 0 else 0, 1)
+    ambition_alignment_index = round((ambition_points / ambition_max * 10) if ambition_max > 0 else 0, 1)
+    
+    # Determina compatibility_level
+    if final_score >= 80:
+        compatibility_level = "wife material"
+    elif final_score >= 60:
+        compatibility_level = "compatibile"
+    elif final_score >= 40:
+        compatibility_level = "potenziale"
+    else:
+        compatibility_level = "non compatibile"
+    
+    # Genera verdict (ironico ma intelligente)
+    if final_score >= 85:
+        verdict = "Wife material. Allineamento solido, costruire insieme è possibile."
+    elif final_score >= 70:
+        verdict = "Compatibile sul piano mentale, ma non ancora pronta per reggere il ritmo."
+    elif final_score >= 55:
+        verdict = "Potenziale presente, ma serve chiarimento su alcuni punti critici."
+    elif final_score >= 40:
+        verdict = "Compatibilità limitata. Differenze significative su valori chiave."
+    else:
+        verdict = "Incompatibilità strutturale. Visioni troppo distanti per costruire insieme."
+    
+    # Analizza risposte aperte per red flags e strengths
+    strengths = []
+    concerns = []
+    red_flags = []
+    
+    # Analisi basata sui punteggi
+    if trust_index >= 8:
+        strengths.append("Fiducia solida nel futuro e nelle capacità")
+    elif trust_index < 5:
+        concerns.append("Fiducia limitata o assente")
+        if trust_index < 3:
+            red_flags.append("Mancanza di fiducia nel futuro")
+    
+    if vision_index >= 8:
+        strengths.append("Visione chiara e a lungo termine")
+    elif vision_index < 5:
+        concerns.append("Visione a lungo termine poco chiara")
+    
+    if emotional_maturity_index >= 8:
+        strengths.append("Maturità emotiva e gestione costruttiva dei conflitti")
+    elif emotional_maturity_index < 5:
+        concerns.append("Maturità emotiva da sviluppare")
+        if emotional_maturity_index < 3:
+            red_flags.append("Gestione emotiva problematica")
+    
+    if ambition_alignment_index >= 8:
+        strengths.append("Allineamento su ambizione e progetti futuri")
+    elif ambition_alignment_index < 5:
+        concerns.append("Differenze significative su ambizione e progetti")
+        if ambition_alignment_index < 3:
+            red_flags.append("Incompatibilità su ambizione e visione futura")
+    
+    # Analisi specifiche dalle risposte
+    if answers.get("trust_future") == "1_2_anni":
+        strengths.append("Fiducia totale nel futuro: valore fondamentale")
+    elif answers.get("trust_future") == "ci_sono_nato":
+        red_flags.append("Possibile interesse strumentale: risposta 'ci sono nato/a'")
+    
+    if answers.get("attractive_woman") == "intelligente_carattere":
+        strengths.append("Valorizza intelligenza e carattere: allineamento sui valori")
+    
+    if answers.get("wife_job") == "direttrice":
+        strengths.append("Visione ambiziosa per la coppia: direttrice")
+    
+    if answers.get("money_relationship") == "investo":
+        strengths.append("Approccio costruttivo al denaro: investe")
+    elif answers.get("money_relationship") == "mignotte_cocaina":
+        red_flags.append("Rapporto problematico con il denaro")
+    
+    if answers.get("rich_priority") == "aumentare_livello":
+        strengths.append("Priorità su crescita e livello, non su apparenza")
+    
+    if answers.get("representative_phrase") == "costruisco_fatica":
+        strengths.append("Mentalità costruttiva: 'costruisco anche se costa fatica'")
+    
+    # Analizza risposte aperte (se presenti)
+    why_us = answers.get("why_us", "").strip()
+    non_negotiables = answers.get("non_negotiables", "").strip()
+    
+    if why_us:
+        if len(why_us) < 20:
+            concerns.append("Risposta 'Perché funzioneremmo' troppo breve o superficiale")
+        elif "soldi" in why_us.lower() or "ricco" in why_us.lower() or "denaro" in why_us.lower():
+            red_flags.append("Possibile interesse strumentale rilevato nelle risposte aperte")
+        elif "futuro" in why_us.lower() or "crescita" in why_us.lower() or "costruire" in why_us.lower():
+            strengths.append("Visione costruttiva espressa nelle risposte")
+    
+    if non_negotiables:
+        if "gelosia" in non_negotiables.lower() or "controllo" in non_negotiables.lower():
+            concerns.append("Possibili dinamiche di controllo")
+    
+    # Genera final_message (elegante e tagliente)
+    if final_score >= 85:
+        final_message = "Allineamento solido. La costruzione insieme è possibile."
+    elif final_score >= 70:
+        final_message = "Buona base mentale. Serve maturità e rispetto reciproco per reggere il ritmo."
+    elif final_score >= 55:
+        final_message = "Potenziale presente, ma le differenze richiedono chiarimento e crescita."
+    elif final_score >= 40:
+        final_message = "Compatibilità limitata. Le visioni divergono su punti fondamentali."
+    else:
+        final_message = "Incompatibilità strutturale. Visioni troppo distanti per costruire insieme."
+    
+    return {
+        "final_score": final_score,
+        "verdict": verdict,
+        "compatibility_level": compatibility_level,
+        "points_breakdown": points_breakdown,
+        "strengths": strengths if strengths else ["Nessun punto di forza significativo rilevato"],
+        "concerns": concerns if concerns else ["Nessuna criticità significativa rilevata"],
+        "red_flags": red_flags if red_flags else [],
+        "trust_index": trust_index,
+        "vision_index": vision_index,
+        "emotional_maturity_index": emotional_maturity_index,
+        "ambition_alignment_index": ambition_alignment_index,
+        "final_message": final_message
+    }
+
+def _answer_choices(question: dict) -> list:
+    """Valori possibili per una domanda: opzioni, risposta assente e valore sconosciuto."""
+    return list(question["options"]) + [None, "valore_sconosciuto"]
+
+
+def _random_answers(rng: random.Random) -> dict:
+    answers = {}
+    for question in QUESTIONS:
+        value = rng.choice(_answer_choices(question))
+        if value is not None:
+            answers[question["id"]] = value
+    answers["why_us"] = rng.choice(["", "Breve", "Perché vogliamo costruire un futuro insieme, davvero"])
+    answers["non_negotiables"] = rng.choice(["", "Niente gelosia", "Rispetto e autonomia"])
+    return answers
+
+
+def _time_per_call(func, samples: list, iterations: int) -> float:
+    """Tempo medio per chiamata in microsecondi."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for answers in samples:
+            func(answers)
+    return (time.perf_counter() - start) / (iterations * len(samples)) * 1e6
+
+
+def _best_of(func, repeat: int = 5) -> float:
+    """Tempo migliore (secondi) su `repeat` esecuzioni di func()."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_scoring_equivalence(samples: int = 20000, seed: int = 0) -> int:
+    """
+    Confronta calculate_score con l'implementazione originale.
+
+    Copre in modo esaustivo ogni opzione di ogni domanda (anche assente o
+    sconosciuta) e tutte le coppie di domande, più `samples` combinazioni casuali.
+    Ritorna il numero di casi verificati.
+    """
+    cases = []
+    for question in QUESTIONS:
+        for value in _answer_choices(question):
+            cases.append({question["id"]: value} if value is not None else {})
+    for first, second in itertools.combinations(QUESTIONS, 2):
+        for a, b in itertools.product(_answer_choices(first), _answer_choices(second)):
+            cases.append({k: v for k, v in ((first["id"], a), (second["id"], b)) if v is not None})
+    rng = random.Random(seed)
+    cases.extend(_random_answers(rng) for _ in range(samples))
+
+    for answers in cases:
+        expected = legacy_calculate_score(answers)
+        actual = calculate_score(answers)
+        if expected != actual:
+            raise AssertionError(f"Risultato diverso per {answers}:\n{expected}\n{actual}")
+    return len(cases)
+
+
+def bench_score(args):
+    checked = check_scoring_equivalence(args.samples)
+    print(f"Equivalenza verificata su {checked} combinazioni di risposte")
+
+    rng = random.Random(1)
+    samples = [_random_answers(rng) for _ in range(1000)]
+    legacy_us = _time_per_call(legacy_calculate_score, samples, args.iterations)
+    compiled_us = _time_per_call(calculate_score, samples, args.iterations)
+    print(f"calculate_score originale: {legacy_us:8.2f} µs/chiamata")
+    print(f"calculate_score compilato: {compiled_us:8.2f} µs/chiamata ({legacy_us / compiled_us:.2f}x)")
+
+
+def bench_batch(args):
+    rng = random.Random(2)
+    samples = [_random_answers(rng) for _ in range(args.size)]
+
+    start = time.perf_counter()
+    singles = [calculate_score(answers) for answers in samples]
+    single_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = calculate_scores_batch(samples)
+    batch_s = time.perf_counter() - start
+
+    fields = ("final_score", "compatibility_level") + INDEX_NAMES
+    mismatches = sum(
+        1 for full, row in zip(singles, batch)
+        if any(full[field] != row[field] for field in fields)
+    )
+    print(f"Risposte valutate: {args.size}, differenze rispetto a calculate_score: {mismatches}")
+    print(f"calculate_score in ciclo:  {args.size / single_s:12,.0f} valutazioni/s")
+    print(f"calculate_scores_batch:    {args.size / batch_s:12,.0f} valutazioni/s ({single_s / batch_s:.1f}x)")
+
+
+class FakeOpenAIServer:
+    """
+    Server locale compatibile con l'endpoint chat completions di OpenAI.
+
+    Risponde dopo `latency` secondi con un testo fisso; serve a misurare il
+    comportamento dell'applicazione senza chiamate esterne. Con `stream=True`
+    invia una parola ogni `token_delay` secondi, come lo streaming di OpenAI.
+    """
+
+    TEXT = "Valutazione generata dal server di test. " * 20
+
+    def __init__(self, latency: float = 0.5, token_delay: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                server.requests += 1
+                time.sleep(server.latency)
+                if random.random() < server.error_rate:
+                    self.error()
+                    return
+                if body.get("stream"):
+                    self.stream(body)
+                    return
+                time.sleep(server.token_delay * len(server.TEXT.split()))
+                payload = json.dumps(server.completion(body)).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Il client ha già rinunciato (timeout)
+
+            def error(self):
+                payload = json.dumps({"error": {"message": "Errore simulato", "type": "server_error"}}).encode()
+                try:
+                    self.send_response(500)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def stream(self, body):
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for word in server.TEXT.split():
+                        self.wfile.write(f"data: {json.dumps(server.chunk(body, word + ' '))}\n\n".encode())
+                        self.wfile.flush()
+                        time.sleep(server.token_delay)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def chunk(self, body: dict, text: str) -> dict:
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+        }
+
+    def completion(self, body: dict) -> dict:
+        prompt_tokens = sum(len(message["content"].split()) for message in body["messages"])
+        content = self.TEXT
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps({"interpretation": self.TEXT, "final_report": self.TEXT}, ensure_ascii=False)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content.split()),
+                "total_tokens": prompt_tokens + len(content.split()),
+            },
+        }
+
+    def client(self):
+        from openai import OpenAI
+        return OpenAI(api_key="fake", base_url=self.base_url, max_retries=0)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def bench_llm(args):
+    answers = _random_answers(random.Random(3))
+    result = calculate_score(answers)
+
+    # Si misurano le chiamate, non la cache (vedi il benchmark "cache")
+    interpretation.LLM_CACHE_ENABLED = False
+    original_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAIServer(latency=args.latency) as server:
+        database.DB_PATH = os.path.join(tmp, "llm.db")
+        database.init_db()
+        interpretation._client = server.client()
+
+        start = time.perf_counter()
+        interpretation.generate_interpretation(result, answers)
+        interpretation.generate_final_report(result, answers)
+        serial_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        texts = interpretation.generate_texts(result, answers)
+        concurrent_s = time.perf_counter() - start
+
+        print(f"Latenza simulata per chiamata: {args.latency:.2f}s")
+        print(f"Chiamate in serie:     {serial_s:.3f}s")
+        print(f"Chiamate in parallelo: {concurrent_s:.3f}s ({serial_s / concurrent_s:.2f}x)")
+        print(f"Tempi per chiamata: {texts[2]}")
+        assert server.requests == 4, f"{server.requests} richieste al server invece di 4"
+        assert serial_s >= 2 * args.latency, "le chiamate in serie non hanno raggiunto il server"
+        assert args.latency <= concurrent_s < 1.5 * args.latency, "le chiamate non sono in parallelo"
+
+        deadline = args.latency / 2
+        start = time.perf_counter()
+        texts = interpretation.generate_texts(result, answers, deadline=deadline)
+        deadline_s = time.perf_counter() - start
+        print(f"Con scadenza {deadline:.2f}s: {deadline_s:.3f}s, tempi {texts[2]}")
+        assert deadline_s < deadline + 0.1, "la scadenza non è stata rispettata"
+        assert texts[2]["interpretation"]["timed_out"] and texts[2]["final_report"]["timed_out"]
+    database.close_connections()
+    database.DB_PATH = original_path
+
+
+def bench_stream(args):
+    """Tempo al primo byte del resoconto: risposta completa vs streaming SSE."""
+    answers = _random_answers(random.Random(4))
+    result = calculate_score(answers)
+
+    # Si misura lo streaming, non la cache: ogni resoconto arriva dal server
+    interpretation.LLM_CACHE_ENABLED = False
+    original_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "stream.db")
+        database.init_db()
+        from .app import app
+
+        with FakeOpenAIServer(latency=args.latency, token_delay=args.token_delay) as server:
+            interpretation._client = server.client()
+
+            start = time.perf_counter()
+            interpretation.generate_final_report(result, answers)
+            blocking_s = time.perf_counter() - start
+
+            eval_id = database.save_evaluation({"name": "benchmark", "answers": answers, **result},
+                                               report_status="pending")
+            client = app.test_client()
+            start = time.perf_counter()
+            response = client.get(f"/api/evaluations/{eval_id}/report/stream", buffered=False)
+            first_byte_s = None
+            for chunk in response.response:
+                if first_byte_s is None and b"event: delta" in chunk:
+                    first_byte_s = time.perf_counter() - start
+            stream_s = time.perf_counter() - start
+            response.close()
+            status = database.get_evaluation_status(eval_id)
+        database.close_connections()
+    database.DB_PATH = original_path
+
+    print(f"Latenza simulata {args.latency:.2f}s, {args.token_delay * 1000:.0f} ms per parola")
+    print(f"Resoconto senza streaming: primo byte dopo {blocking_s:.3f}s")
+    print(f"Resoconto in streaming:    primo byte dopo {first_byte_s:.3f}s (completo dopo {stream_s:.3f}s)")
+    words = len(FakeOpenAIServer.TEXT.split())
+    assert blocking_s >= args.latency + words * args.token_delay, "il resoconto non è arrivato dal server"
+    assert args.latency <= first_byte_s < blocking_s / 2, "lo streaming non anticipa il primo byte"
+    assert status["report_status"] == "ready" and status["final_report"] == FakeOpenAIServer.TEXT.strip()
+
+
+def bench_cache(args):
+    """Cache delle risposte OpenAI: miss (chiamata al server) vs hit in memoria vs hit da SQLite."""
+    from .llm_cache import LLMCache
+
+    rng = random.Random(19)
+    samples = []
+    for _ in range(args.size):
+        answers = _random_answers(rng)
+        answers["why_us"] = f"Risposta {len(samples)}"  # Prompt tutti diversi
+        samples.append((calculate_score(answers), answers))
+
+    def run(label: str) -> float:
+        start = time.perf_counter()
+        for result, answers in samples:
+            assert interpretation.generate_interpretation(result, answers) == FakeOpenAIServer.TEXT.strip()
+        elapsed_us = (time.perf_counter() - start) / len(samples) * 1e6
+        print(f"  {label:<22} {elapsed_us:10.1f} µs/chiamata")
+        return elapsed_us
+
+    interpretation.LLM_CACHE_ENABLED = True
+    original_path, original_cache = database.DB_PATH, interpretation.cache
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAIServer(latency=args.latency) as server:
+        database.DB_PATH = os.path.join(tmp, "cache.db")
+        database.init_db()
+        cache = interpretation.cache = LLMCache()
+        interpretation._client = server.client()
+
+        print(f"{args.size} interpretazioni diverse, latenza simulata {args.latency:.3f}s")
+        miss_us = run("miss (server)")
+        assert server.requests == args.size and cache.counters["misses"] == args.size
+        memory_us = run("hit in memoria")
+        cache.clear()
+        db_us = run("hit da SQLite")
+        memory_again_us = run("hit in memoria")
+        print(f"  contatori: {cache.stats()}")
+        assert server.requests == args.size, "una risposta in cache è arrivata di nuovo al server"
+        assert cache.counters["memory_hits"] == 2 * args.size and cache.counters["db_hits"] == args.size
+        # Un hit costa microsecondi (prompt, hash e lookup), non una chiamata
+        assert max(memory_us, memory_again_us) < 1000 and db_us < 5000 and db_us < miss_us / 10
+    database.close_connections()
+    database.DB_PATH, interpretation.cache = original_path, original_cache
+
+
+def _estimated_tokens(*texts: str) -> int:
+    """Stima grossolana dei token (circa 4 caratteri per token)."""
+    return sum(len(text) for text in texts) // 4
+
+
+def bench_combined(args):
+    """Chiamate separate vs chiamata combinata: token di input, round-trip e tempo."""
+    answers = _random_answers(random.Random(5))
+    result = calculate_score(answers)
+
+    separate_tokens = _estimated_tokens(
+        interpretation.SYSTEM_PROMPT, interpretation.build_interpretation_prompt(result, answers),
+        interpretation.RESOCONTO_SYSTEM_PROMPT, interpretation.build_final_report_prompt(result, answers),
+    )
+    combined_tokens = _estimated_tokens(
+        interpretation.COMBINED_SYSTEM_PROMPT, interpretation.build_combined_prompt(result, answers),
+    )
+
+    interpretation.LLM_CACHE_ENABLED = False
+    with FakeOpenAIServer(latency=args.latency) as server:
+        interpretation._client = server.client()
+        timings = {}
+        for mode in ("separate", "combined"):
+            interpretation.LLM_MODE = mode
+            before = server.requests
+            start = time.perf_counter()
+            texts = interpretation.generate_texts(result, answers)
+            timings[mode] = (time.perf_counter() - start, server.requests - before, all(texts[:2]))
+
+    print(f"{'modalità':<10} {'token input (stima)':>20} {'round-trip':>11} {'tempo':>8} {'testi ok':>9}")
+    for mode, tokens in (("separate", separate_tokens), ("combined", combined_tokens)):
+        elapsed, requests, ok = timings[mode]
+        print(f"{mode:<10} {tokens:>20} {requests:>11} {elapsed:>7.3f}s {str(ok):>9}")
+    print(f"Token di input risparmiati: {1 - combined_tokens / separate_tokens:.0%}")
+
+
+def bench_guard(args):
+    """Circuit breaker e gate di ammissione contro un server che rallenta e fallisce."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    answers = _random_answers(random.Random(6))
+    result = calculate_score(answers)
+    interpretation.LLM_CACHE_ENABLED = False
+    llm_guard.breaker = llm_guard.CircuitBreaker(failure_threshold=3, cooldown=args.cooldown)
+
+    with FakeOpenAIServer(latency=0.05, error_rate=1.0) as server:
+        interpretation._client = server.client()
+        print("Server in errore:")
+        for attempt in range(5):
+            start = time.perf_counter()
+            texts = interpretation.generate_texts(result, answers)
+            print(f"  tentativo {attempt + 1}: {(time.perf_counter() - start) * 1000:7.1f} ms, "
+                  f"breaker {llm_guard.breaker.state}, {texts[2].get('skipped', 'chiamate eseguite')}")
+        print(f"  richieste arrivate al server: {server.requests}")
+
+        time.sleep(args.cooldown)
+        server.error_rate = 0.0
+        interpretation.generate_interpretation(result, answers)
+        print(f"Dopo la pausa ({args.cooldown}s) e una chiamata di prova riuscita: breaker {llm_guard.breaker.state}")
+
+        llm_guard.gate = llm_guard.AdmissionGate(max_concurrency=2, queue_timeout=0.1)
+        server.latency = 0.5
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            start = time.perf_counter()
+            texts = list(pool.map(lambda _: interpretation.generate_interpretation(result, answers), range(10)))
+            elapsed = time.perf_counter() - start
+        print(f"10 chiamate concorrenti con gate da 2 (attesa max 0.1s): {sum(1 for t in texts if t)} eseguite "
+              f"in {elapsed:.2f}s, stato {llm_guard.stats()}")
+
+
+def bench_local(args):
+    """Costo del generatore locale di interpretazione e resoconto."""
+    from .local_report import build_local_final_report, build_local_interpretation
+
+    rng = random.Random(7)
+    samples = [(calculate_score(answers), answers) for answers in (_random_answers(rng) for _ in range(args.size))]
+
+    durations = []
+    for result, answers in samples:
+        start = time.perf_counter()
+        build_local_interpretation(result, answers)
+        build_local_final_report(result, answers)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+
+    result, answers = samples[0]
+    print(build_local_final_report(result, answers))
+    print()
+    print(f"Generatore locale su {args.size} valutazioni (entrambi i testi): "
+          f"media {sum(durations) / len(durations) * 1e6:.1f} µs, "
+          f"p99 {durations[int(len(durations) * 0.99)] * 1e6:.1f} µs, max {durations[-1] * 1e6:.1f} µs")
+
+
+@contextmanager
+def legacy_get_db():
+    """get_db originale: una nuova connessione (journal di rollback) per ogni chiamata."""
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def _db_load(threads: int, seconds: float) -> dict:
+    """Scritture (save_evaluation) e letture (get_statistics) in parallelo per `seconds` secondi."""
+    rng = random.Random(8)
+    samples = [_random_answers(rng) for _ in range(200)]
+    evaluations = [{"name": "benchmark", "answers": answers, **calculate_score(answers)} for answers in samples]
+    write_latencies, read_latencies, errors = [], [], []
+    stop = time.perf_counter() + seconds
+
+    def writer(offset):
+        position = offset
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                database.save_evaluation(evaluations[position % len(evaluations)], "interpretazione", "resoconto")
+                write_latencies.append(time.perf_counter() - start)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+            position += 1
+        database.close_connections()
+
+    def reader():
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                database.get_statistics()
+                read_latencies.append(time.perf_counter() - start)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+        database.close_connections()
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    workers += [threading.Thread(target=reader) for _ in range(max(1, threads // 2))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return {"writes": write_latencies, "reads": read_latencies, "errors": errors}
+
+
+def bench_db(args):
+    original_path, original_get_db, original_get_read_db = database.DB_PATH, database.get_db, database.get_read_db
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, legacy in (("connessione per chiamata, journal di rollback", True),
+                              ("connessioni per thread, WAL", False)):
+            database.DB_PATH = os.path.join(tmp, f"{'legacy' if legacy else 'pool'}.db")
+            if legacy:
+                database.get_db = database.get_read_db = legacy_get_db
+                with legacy_get_db() as conn:
+                    conn.execute("PRAGMA journal_mode = DELETE")
+            database.init_db()
+            database.close_connections()
+
+            stats = _db_load(args.threads, args.seconds)
+            database.get_db, database.get_read_db = original_get_db, original_get_read_db
+
+            writes, reads = stats["writes"], stats["reads"]
+            print(f"{label}:")
+            print(f"  save_evaluation: {len(writes) / args.seconds:8.0f} op/s, attesa p50 "
+                  f"{_percentile(writes, 0.5) * 1000:.2f} ms, p99 {_percentile(writes, 0.99) * 1000:.2f} ms")
+            print(f"  get_statistics:  {len(reads) / args.seconds:8.0f} op/s, attesa p50 "
+                  f"{_percentile(reads, 0.5) * 1000:.2f} ms, p99 {_percentile(reads, 0.99) * 1000:.2f} ms")
+            print(f"  errori 'database is locked': {len(stats['errors'])}")
+    database.DB_PATH = original_path
+
+
+def _timed_writes(save, evaluations: list, threads: int, writes: int) -> tuple:
+    """`writes` salvataggi divisi su `threads` thread: (secondi, latenze)."""
+    latencies = []
+
+    def writer(offset):
+        for position in range(offset, writes, threads):
+            start = time.perf_counter()
+            save(evaluations[position % len(evaluations)], "interpretazione", "resoconto")
+            latencies.append(time.perf_counter() - start)
+        database.close_connections()
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start, latencies
+
+
+def bench_group_commit(args):
+    """save_evaluation con un commit per richiesta vs commit di gruppo, a concorrenza crescente."""
+    rng = random.Random(21)
+    evaluations = [{"name": "benchmark", "answers": answers, **calculate_score(answers)}
+                   for answers in (_random_answers(rng) for _ in range(200))]
+    original_path, original_synchronous = database.DB_PATH, database.DB_SYNCHRONOUS
+    database.DB_SYNCHRONOUS = args.synchronous
+    print(f"{args.writes} valutazioni per livello di concorrenza, synchronous={args.synchronous}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in args.threads:
+            row = []
+            for label in ("commit per richiesta", "commit di gruppo"):
+                database.DB_PATH = os.path.join(tmp, f"{threads}-{len(row)}.db")
+                database.init_db()
+                database.close_connections()
+                writer = group_commit.GroupCommitWriter() if row else None
+                elapsed, latencies = _timed_writes(writer.save_evaluation if writer else database.save_evaluation,
+                                                   evaluations, threads, args.writes)
+                if writer:
+                    writer.close()
+                row.append(f"{label}: {args.writes / elapsed:7.0f} op/s "
+                           f"(p99 {_percentile(latencies, 0.99) * 1000:6.2f} ms)")
+            print(f"{threads:3d} thread  " + "   ".join(row))
+    database.DB_PATH, database.DB_SYNCHRONOUS = original_path, original_synchronous
+
+
+LEGACY_STATISTICS_SQL = """
+    SELECT
+        COUNT(*) as total,
+        AVG(final_score) as avg_score,
+        COUNT(CASE WHEN compatibility_level = 'wife material' THEN 1 END) as wife_material_count,
+        COUNT(CASE WHEN compatibility_level = 'compatibile' THEN 1 END) as compatible_count,
+        COUNT(CASE WHEN compatibility_level = 'potenziale' THEN 1 END) as potential_count,
+        COUNT(CASE WHEN compatibility_level = 'non compatibile' THEN 1 END) as incompatible_count
+    FROM evaluations
+"""
+
+
+def bench_stats(args):
+    """get_statistics originale (aggregazione su tutta la tabella) vs tabella materializzata."""
+    rng = random.Random(13)
+    original_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "stats.db")
+        database.init_db()
+        rows = []
+        for answers in (_random_answers(rng) for _ in range(args.rows)):
+            result = calculate_score(answers)
+            rows.append((result["final_score"], result["compatibility_level"], "{}", "[]", "[]", "[]", "[]"))
+        start = time.perf_counter()
+        with database.get_db() as conn:
+            conn.executemany("""
+                INSERT INTO evaluations (final_score, compatibility_level, answers_json,
+                    points_breakdown_json, strengths_json, concerns_json, red_flags_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+        insert_elapsed = time.perf_counter() - start
+
+        with database.get_read_db() as conn:
+            legacy = dict(conn.execute(LEGACY_STATISTICS_SQL).fetchone())
+            legacy_elapsed = _best_of(lambda: conn.execute(LEGACY_STATISTICS_SQL).fetchone(), repeat=5)
+        materialized = database.get_statistics()
+        materialized_elapsed = _best_of(database.get_statistics, repeat=5)
+        database.close_connections()
+    database.DB_PATH = original_path
+
+    same = legacy["total"] == materialized["total"] and abs(legacy["avg_score"] - materialized["avg_score"]) < 1e-9 \
+        and all(legacy[key] == materialized[key] for key in legacy if key.endswith("_count"))
+    print(f"{args.rows} valutazioni (inserimento con trigger: {args.rows / insert_elapsed:.0f} righe/s)")
+    print(f"aggregazione completa:     {legacy_elapsed * 1000:8.3f} ms")
+    print(f"statistiche materializzate: {materialized_elapsed * 1000:8.3f} ms "
+          f"({legacy_elapsed / materialized_elapsed:.0f}x)")
+    print(f"risultati identici: {same}")
+
+
+def _naive_option_frequencies() -> dict:
+    """Frequenze per opzione decodificando answers_json riga per riga (approccio senza tabelle)."""
+    counts = {}
+    with database.get_read_db() as conn:
+        for (answers_json,) in conn.execute("SELECT answers_json FROM evaluations"):
+            for question_id, option_key in json.loads(answers_json).items():
+                counts[(question_id, option_key)] = counts.get((question_id, option_key), 0) + 1
+    return counts
+
+
+def bench_analytics(args):
+    """Analisi per domanda: JSON riga per riga vs istantanea NumPy vs cache."""
+    rng = random.Random(16)
+    original_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "analytics.db")
+        database.init_db()
+        with database.get_db() as conn:
+            for start in range(0, args.rows, 10000):
+                answers_list = [_random_answers(rng) for _ in range(min(10000, args.rows - start))]
+                for answers, result in zip(answers_list, calculate_scores_batch(answers_list)):
+                    cursor = conn.execute("""
+                        INSERT INTO evaluations (final_score, compatibility_level, trust_index, vision_index,
+                            emotional_maturity_index, ambition_alignment_index, answers_json, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', ?))
+                    """, (result["final_score"], result["compatibility_level"], result["trust_index"],
+                          result["vision_index"], result["emotional_maturity_index"],
+                          result["ambition_alignment_index"], json.dumps(answers),
+                          f"-{rng.randint(0, 180)} days"))
+                    database._insert_answers(conn, cursor.lastrowid, answers)
+
+        naive_s = _best_of(_naive_option_frequencies, repeat=1)
+        compute_s = _best_of(analytics.compute_question_analytics, repeat=3)
+        analytics.get_question_analytics()
+        cached_s = _best_of(analytics.get_question_analytics, repeat=5)
+        database.close_connections()
+    database.DB_PATH = original_path
+
+    print(f"{args.rows} valutazioni")
+    print(f"solo frequenze, JSON riga per riga:        {naive_s * 1000:9.1f} ms")
+    print(f"frequenze + correlazioni + drift (NumPy):  {compute_s * 1000:9.1f} ms")
+    print(f"dalla cache (dati invariati):              {cached_s * 1000:9.3f} ms")
+
+
+def _legacy_export_ndjson():
+    """Esportazione con le funzioni esistenti: elenco degli ID, poi get_evaluation e json.dumps per ognuno."""
+    with database.get_read_db() as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM evaluations ORDER BY created_at, id")]
+    for eval_id in ids:
+        yield json.dumps(database.get_evaluation(eval_id), ensure_ascii=False) + "\n"
+
+
+def _measure_export(make_chunks) -> tuple:
+    """(secondi al primo pezzo, secondi totali, byte, picco di memoria in byte): il picco in un secondo giro."""
+    start = time.perf_counter()
+    first, size = None, 0
+    for chunk in make_chunks():
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    for _ in make_chunks():
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, elapsed, size, peak
+
+
+def bench_export(args):
+    """Esportazione NDJSON: get_evaluation per riga vs streaming a blocchi."""
+    rng = random.Random(22)
+    original_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "export.db")
+        database.init_db()
+        with database.get_db() as conn:
+            for _ in range(args.rows):
+                answers = _random_answers(rng)
+                database._insert_evaluation(conn, {"name": "benchmark", "answers": answers, **calculate_score(answers)},
+                                            "interpretazione", "resoconto")
+        database.close_connections()
+
+        results = {}
+        for label, chunks in (("get_evaluation per riga", _legacy_export_ndjson),
+                              ("streaming a blocchi", lambda: export.export_evaluations("ndjson"))):
+            results[label] = _measure_export(chunks)
+        database.close_connections()
+    database.DB_PATH = original_path
+
+    print(f"{args.rows} valutazioni")
+    for label, (first, elapsed, size, peak) in results.items():
+        print(f"  {label:24s} {args.rows / elapsed:8.0f} righe/s, primo pezzo {first * 1000:7.2f} ms, "
+              f"{size / 1e6:.1f} MB, picco memoria {peak / 1e6:.1f} MB")
+
+def bench_import(args):
+    """Importazione NDJSON: save_evaluation per riga vs blocchi con executemany."""
+    rng = random.Random(23)
+    original_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "valutazioni.ndjson")
+        with open(source, "w", encoding="utf-8") as f:
+            for position in range(args.rows):
+                f.write(json.dumps({"name": f"storico {position}", "answers": _random_answers(rng)}) + "\n")
+
+        database.DB_PATH = os.path.join(tmp, "per-riga.db")
+        database.init_db()
+        start = time.perf_counter()
+        with open(source, "rb") as f:
+            for line in f:
+                item = json.loads(line)
+                database.save_evaluation({"name": item["name"], "answers": item["answers"],
+                                          **calculate_score(item["answers"])})
+        per_row_s = time.perf_counter() - start
+        database.close_connections()
+
+        database.DB_PATH = os.path.join(tmp, "blocchi.db")
+        database.init_db()
+        result = importer.import_evaluations(source, batch_size=args.batch_size, skip_llm=True, report=lambda _: None)
+        database.close_connections()
+    database.DB_PATH = original_path
+
+    print(f"{args.rows} valutazioni (senza testi LLM)")
+    print(f"  save_evaluation per riga:  {args.rows / per_row_s:8.0f} righe/s")
+    print(f"  blocchi da {args.batch_size:<6d}         {result['imported'] / result['seconds']:8.0f} righe/s "
+          f"({per_row_s / result['seconds']:.1f}x)")
+
+def _naive_rescore() -> int:
+    """Rivalutazione riga per riga: lettura, calculate_score e UPDATE con commit per ogni valutazione."""
+    with database.get_read_db() as conn:
+        rows = conn.execute("SELECT id, answers_json FROM evaluations").fetchall()
+    for eval_id, answers_json in rows:
+        result = calculate_score(json.loads(answers_json))
+        with database.get_db() as conn:
+            conn.execute("""
+                UPDATE evaluations SET final_score = ?, compatibility_level = ?, verdict = ?,
+                    points_breakdown_json = ?, strengths_json = ?, concerns_json = ?, red_flags_json = ?
+                WHERE id = ?
+            """, (result["final_score"], result["compatibility_level"], result["verdict"],
+                  json.dumps(result["points_breakdown"], ensure_ascii=False),
+                  json.dumps(result["strengths"], ensure_ascii=False),
+                  json.dumps(result["concerns"], ensure_ascii=False),
+                  json.dumps(result["red_flags"], ensure_ascii=False), eval_id))
+    return len(rows)
+
+
+def bench_rescore(args):
+    """Rivalutazione di tutte le valutazioni: riga per riga vs blocchi nel processo vs pool di processi."""
+    rng = random.Random(24)
+    original_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "rescore.db")
+        database.init_db()
+        for start in range(0, args.rows, 10000):
+            database.insert_evaluations_batch([
+                ({"name": "benchmark", "answers": answers, "scoring_version": "precedente", **calculate_score(answers)},
+                 None, None, None)
+                for answers in (_random_answers(rng) for _ in range(min(10000, args.rows - start)))
+            ])
+
+        timings = {"riga per riga, commit per riga": _best_of(_naive_rescore, repeat=1)}
+        for label, workers in (("blocchi, nel processo", 0), (f"blocchi, {args.workers} processi", args.workers)):
+            timings[label] = _best_of(lambda: rescoring.rescore_evaluations(
+                workers=workers, force=True, report=lambda _: None), repeat=1)
+        database.close_connections()
+    database.DB_PATH = original_path
+
+    print(f"{args.rows} valutazioni")
+    baseline = timings["riga per riga, commit per riga"]
+    for label, seconds in timings.items():
+        print(f"  {label:32s} {args.rows / seconds:8.0f} righe/s ({baseline / seconds:.1f}x)")
+
+def bench_question_sets(args):
+    """Costo per richiesta e di ricarica degli insiemi di domande al crescere delle versioni salvate."""
+    rng = random.Random(25)
+    original_path, original_scorer = database.DB_PATH, scoring.SCORER
+    samples = [_random_answers(rng) for _ in range(200)]
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "question_sets.db")
+        database.init_db()
+        registry = question_sets.QuestionSetRegistry(path=None, reload_interval=0)
+        base = registry.current().definition()
+        stored = 0
+        print(f"{'versioni':>9} {'controllo':>11} {'ricarica':>10} {'calculate_score':>16}")
+        for target in args.versions:
+            # Nuove versioni: cambia solo il moltiplicatore della prima domanda
+            while stored < target:
+                stored += 1
+                definition = json.loads(json.dumps(base))
+                definition["questions"][0]["importance_multiplier"] = 1 + stored / 1000
+                question_set = question_sets.QuestionSet(definition)
+                database.store_question_set(question_set.version, f"v{stored}",
+                                            json.dumps(definition, ensure_ascii=False), activate=False)
+            database.store_question_set(question_set.version, f"v{stored}",
+                                        json.dumps(definition, ensure_ascii=False))
+            start = time.perf_counter()
+            registry.current()  # Nuova versione attiva: validazione, compilazione e sostituzione
+            reload_s = time.perf_counter() - start
+            check_s = _best_of(lambda: [registry.current() for _ in range(1000)], repeat=3) / 1000
+            score_us = _time_per_call(registry.current().scorer.score, samples, 20)
+            print(f"{stored:9d} {check_s * 1e6:9.1f}µs {reload_s * 1000:8.2f}ms {score_us:14.2f}µs")
+        database.close_connections()
+    scoring.set_scorer(original_scorer)
+    database.DB_PATH = original_path
+
+def legacy_open_answers(answers: dict) -> dict:
+    """Analisi originale delle risposte aperte (catena di if su sottostringhe)."""
+    strengths, concerns, red_flags = [], [], []
+    why_us = answers.get("why_us", "").strip()
+    non_negotiables = answers.get("non_negotiables", "").strip()
+    if why_us:
+        if len(why_us) < 20:
+            concerns.append("Risposta 'Perché funzioneremmo' troppo breve o superficiale")
+        elif "soldi" in why_us.lower() or "ricco" in why_us.lower() or "denaro" in why_us.lower():
+            red_flags.append("Possibile interesse strumentale rilevato nelle risposte aperte")
+        elif "futuro" in why_us.lower() or "crescita" in why_us.lower() or "costruire" in why_us.lower():
+            strengths.append("Visione costruttiva espressa nelle risposte")
+    if non_negotiables:
+        if "gelosia" in non_negotiables.lower() or "controllo" in non_negotiables.lower():
+            concerns.append("Possibili dinamiche di controllo")
+    return {"strengths": strengths, "concerns": concerns, "red_flags": red_flags}
+
+
+def _naive_keyword_rules(rules: list, answers: dict) -> dict:
+    """Le stesse regole valutate con un test di sottostringa per ogni parola chiave."""
+    found = {bucket: [] for bucket in text_rules.BUCKETS}
+    for rule in rules:
+        text = answers.get(rule["question"], "")
+        if any(keyword in text.lower() for keyword in rule["keywords"]):
+            found[rule["bucket"]].append(rule["message"])
+    return found
+
+
+def bench_open(args):
+    """Regole sulle risposte aperte su testi lunghi: catena di sottostringhe vs matcher compilato."""
+    rng = random.Random(18)
+    vocabulary = ["".join(rng.choices("abcdefghilmnoprstuvz", k=rng.randint(3, 10))) for _ in range(5000)]
+    iterations = 200
+
+    # Stesse regole sempre con la regex, per controllare la ricerca con str.find
+    regex_only = text_rules.OpenAnswerRules(scan_keyword_limit=0)
+    for words in (40, args.words):
+        for ending, label in ((" un futuro insieme", "con parola chiave"), ("", "senza parole chiave")):
+            text = " ".join(rng.choices(vocabulary, k=words)) + ending
+            answers = {"why_us": text, "non_negotiables": text}
+            expected = legacy_open_answers(answers)
+            assert expected == text_rules.OPEN_ANSWERS.analyse(answers) == regex_only.analyse(answers)
+            legacy_us = _time_per_call(legacy_open_answers, [answers], iterations)
+            compiled_us = _time_per_call(text_rules.OPEN_ANSWERS.analyse, [answers], iterations)
+            regex_us = _time_per_call(regex_only.analyse, [answers], iterations)
+            print(f"Testi di {words} parole {label}, regole attuali")
+            print(f"  catena di sottostringhe: {legacy_us:9.1f} µs")
+            print(f"  matcher compilato:       {compiled_us:9.1f} µs")
+            print(f"  solo regex:              {regex_us:9.1f} µs")
+
+    # Regole sintetiche con molte parole chiave (nessuna presente nel testo)
+    keywords = ["".join(rng.choices("bcdfgjkqwxy", k=8)) for _ in range(args.keywords)]
+    rules = [
+        {"id": f"r{i}", "question": "why_us", "bucket": "concerns", "message": f"Regola {i}",
+         "keywords": keywords[i::20]}
+        for i in range(20)
+    ]
+    compiled = text_rules.OpenAnswerRules(rules, min_length={})
+    naive_us = _time_per_call(lambda a: _naive_keyword_rules(rules, a), [answers], iterations // 10)
+    compiled_us = _time_per_call(compiled.analyse, [answers], iterations)
+    print(f"{args.keywords} parole chiave in 20 regole")
+    print(f"  sottostringa per parola: {naive_us:9.1f} µs")
+    print(f"  matcher compilato:       {compiled_us:9.1f} µs ({naive_us / compiled_us:.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Future Wife Quiz")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    score_parser = subparsers.add_parser("score", help="calculate_score originale vs compilato")
+    score_parser.add_argument("--samples", type=int, default=20000)
+    score_parser.add_argument("--iterations", type=int, default=20)
+    score_parser.set_defaults(func=bench_score)
+
+    batch_parser = subparsers.add_parser("batch", help="calculate_score in ciclo vs calculate_scores_batch")
+    batch_parser.add_argument("--size", type=int, default=50000)
+    batch_parser.set_defaults(func=bench_batch)
+
+    llm_parser = subparsers.add_parser("llm", help="generazioni OpenAI in serie vs in parallelo (server finto)")
+    llm_parser.add_argument("--latency", type=float, default=0.5)
+    llm_parser.set_defaults(func=bench_llm)
+
+    stream_parser = subparsers.add_parser("stream", help="tempo al primo byte del resoconto con e senza SSE")
+    stream_parser.add_argument("--latency", type=float, default=0.3)
+    stream_parser.add_argument("--token-delay", type=float, default=0.02)
+    stream_parser.set_defaults(func=bench_stream)
+
+    cache_parser = subparsers.add_parser("cache", help="cache delle risposte OpenAI: miss vs hit (server finto)")
+    cache_parser.add_argument("--size", type=int, default=50)
+    cache_parser.add_argument("--latency", type=float, default=0.05)
+    cache_parser.set_defaults(func=bench_cache)
+
+    combined_parser = subparsers.add_parser("combined", help="chiamate separate vs chiamata combinata")
+    combined_parser.add_argument("--latency", type=float, default=0.3)
+    combined_parser.set_defaults(func=bench_combined)
+
+    guard_parser = subparsers.add_parser("guard", help="circuit breaker e gate di ammissione (server finto)")
+    guard_parser.add_argument("--cooldown", type=float, default=1.0)
+    guard_parser.set_defaults(func=bench_guard)
+
+    local_parser = subparsers.add_parser("local", help="costo del generatore locale dei testi")
+    local_parser.add_argument("--size", type=int, default=10000)
+    local_parser.set_defaults(func=bench_local)
+
+    db_parser = subparsers.add_parser("db", help="save_evaluation e get_statistics sotto carico parallelo")
+    db_parser.add_argument("--threads", type=int, default=8)
+    db_parser.add_argument("--seconds", type=float, default=3.0)
+    db_parser.set_defaults(func=bench_db)
+
+    group_parser = subparsers.add_parser("groupcommit", help="save_evaluation: commit per richiesta vs commit di gruppo")
+    group_parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 64])
+    group_parser.add_argument("--writes", type=int, default=4000)
+    group_parser.add_argument("--synchronous", default="FULL", help="PRAGMA synchronous per il test")
+    group_parser.set_defaults(func=bench_group_commit)
+
+    stats_parser = subparsers.add_parser("stats", help="get_statistics: aggregazione completa vs tabella materializzata")
+    stats_parser.add_argument("--rows", type=int, default=200000)
+    stats_parser.set_defaults(func=bench_stats)
+
+    analytics_parser = subparsers.add_parser("analytics", help="analisi per domanda: JSON vs NumPy vs cache")
+    analytics_parser.add_argument("--rows", type=int, default=100000)
+    analytics_parser.set_defaults(func=bench_analytics)
+
+    export_parser = subparsers.add_parser("export", help="esportazione NDJSON: get_evaluation per riga vs streaming")
+    export_parser.add_argument("--rows", type=int, default=50000)
+    export_parser.set_defaults(func=bench_export)
+
+    import_parser = subparsers.add_parser("import", help="importazione NDJSON: save_evaluation per riga vs executemany")
+    import_parser.add_argument("--rows", type=int, default=50000)
+    import_parser.add_argument("--batch-size", type=int, default=5000)
+    import_parser.set_defaults(func=bench_import)
+
+    rescore_parser = subparsers.add_parser("rescore", help="rivalutazione: riga per riga vs blocchi vs pool di processi")
+    rescore_parser.add_argument("--rows", type=int, default=50000)
+    rescore_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    rescore_parser.set_defaults(func=bench_rescore)
+
+    question_sets_parser = subparsers.add_parser("questionsets", help="insiemi di domande: controllo e ricarica vs versioni salvate")
+    question_sets_parser.add_argument("--versions", type=int, nargs="+", default=[1, 10, 100, 1000])
+    question_sets_parser.set_defaults(func=bench_question_sets)
+
+    open_parser = subparsers.add_parser("open", help="regole sulle risposte aperte: sottostringhe vs matcher compilato")
+    open_parser.add_argument("--words", type=int, default=2000)
+    open_parser.add_argument("--keywords", type=int, default=400)
+    open_parser.set_defaults(func=bench_open)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
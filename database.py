@@ -1,54 +1,379 @@
 """
 Gestione database SQLite per salvare le valutazioni di compatibilità.
+
+Ogni thread riusa la propria connessione (una per scritture, una in sola
+lettura per dashboard e statistiche); il database è in modalità WAL, così le
+letture non bloccano le scritture.
 """
+import atexit
+import base64
+import html
+import os
+import re
 import sqlite3
 import json
+import threading
 from datetime import datetime
 from contextlib import contextmanager
 
-DB_PATH = "futurewife.db"
+from .scoring import answer_points, scoring_version
+
+DB_PATH = os.getenv("DB_PATH", "futurewife.db")
+
+# Configurazione delle connessioni
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))  # byte
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-16000"))  # negativo = KiB
+
+# Dopo quanto una presa in carico dei testi ("streaming") si considera abbandonata:
+# deve superare la durata massima di uno stream (circa 2 x LLM_DEADLINE)
+REPORT_CLAIM_TIMEOUT = int(os.getenv("REPORT_CLAIM_TIMEOUT", "120"))  # secondi
+
+_local = threading.local()
+
+def _connect(readonly: bool = False) -> sqlite3.Connection:
+    """Apre una nuova connessione configurata."""
+    if readonly:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    else:
+        conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = {DB_CACHE_SIZE}")
+    if not readonly:
+        conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+def _thread_connection(readonly: bool = False) -> sqlite3.Connection:
+    """Connessione del thread corrente (creata al primo uso, ricreata dopo un fork)."""
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+    key = (DB_PATH, readonly)
+    conn = _local.connections.get(key)
+    if conn is None:
+        conn = _connect(readonly)
+        _local.connections[key] = conn
+    return conn
+
+def close_connections():
+    """
+    Chiude le connessioni del thread corrente.
+
+    Le connessioni restano aperte tra una richiesta e l'altra (è il loro
+    scopo); quelle di un thread che termina vengono chiuse con il thread.
+    Quelle del thread principale si chiudono all'uscita del processo.
+    """
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+atexit.register(close_connections)
 
 @contextmanager
 def get_db():
-    """Context manager per gestire le connessioni al database."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Context manager per le scritture: commit alla fine, rollback in caso di errore."""
+    conn = _thread_connection()
     try:
         yield conn
         conn.commit()
     except Exception:
         conn.rollback()
         raise
+
+@contextmanager
+def get_read_db():
+    """Context manager per le sole letture (dashboard admin e statistiche)."""
+    conn = _thread_connection(readonly=True)
+    try:
+        yield conn
     finally:
-        conn.close()
+        # Chiude l'eventuale snapshot di lettura aperto
+        conn.rollback()
+
+def _add_column_if_missing(conn, table: str, column: str, definition: str):
+    """Aggiunge una colonna solo se la tabella non la ha già (DB creati da versioni vecchie)."""
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _migration_initial_schema(conn):
+    """Tabella evaluations (con final_report anche per i DB più vecchi)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS evaluations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            final_score INTEGER,
+            compatibility_level TEXT,
+            verdict TEXT,
+            trust_index REAL,
+            vision_index REAL,
+            emotional_maturity_index REAL,
+            ambition_alignment_index REAL,
+            answers_json TEXT,
+            points_breakdown_json TEXT,
+            strengths_json TEXT,
+            concerns_json TEXT,
+            red_flags_json TEXT,
+            interpretation TEXT,
+            final_message TEXT,
+            final_report TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    _add_column_if_missing(conn, "evaluations", "final_report", "TEXT")
+
+def _migration_report_status(conn):
+    """Stato di generazione dei testi (generazione asincrona e streaming)."""
+    _add_column_if_missing(conn, "evaluations", "report_status", "TEXT DEFAULT 'ready'")
+
+def _migration_llm_cache(conn):
+    """Cache persistente delle risposte OpenAI."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            kind TEXT,
+            response TEXT,
+            created_at REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache (created_at)")
+
+def _migration_evaluations_created_at_index(conn):
+    """Indice per la dashboard admin (valutazioni più recenti prima)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_evaluations_created_at ON evaluations (created_at, id)")
+
+def _migration_evaluations_level_index(conn):
+    """Indice per i filtri per livello di compatibilità."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_evaluations_level_created_at
+        ON evaluations (compatibility_level, created_at, id)
+    """)
+
+# Aggiornamento delle statistiche materializzate per una riga (NEW o OLD) di
+# evaluations: delta = 1 quando la riga entra, -1 quando esce
+_STATS_DELTA_SQL = """
+    INSERT OR IGNORE INTO evaluation_stats (compatibility_level, count, score_sum)
+    VALUES (COALESCE({row}.compatibility_level, ''), 0, 0);
+    UPDATE evaluation_stats
+    SET count = count + ({delta}), score_sum = score_sum + ({delta}) * COALESCE({row}.final_score, 0)
+    WHERE compatibility_level = COALESCE({row}.compatibility_level, '');
+    INSERT OR IGNORE INTO score_histogram (compatibility_level, score, count)
+    VALUES (COALESCE({row}.compatibility_level, ''), COALESCE({row}.final_score, 0), 0);
+    UPDATE score_histogram SET count = count + ({delta})
+    WHERE compatibility_level = COALESCE({row}.compatibility_level, '')
+      AND score = COALESCE({row}.final_score, 0);
+"""
+
+def _migration_materialized_statistics(conn):
+    """Statistiche e istogramma dei punteggi aggiornati da trigger."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS evaluation_stats (
+            compatibility_level TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            score_sum INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS score_histogram (
+            compatibility_level TEXT,
+            score INTEGER,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (compatibility_level, score)
+        )
+    """)
+    add_new = _STATS_DELTA_SQL.format(row="NEW", delta=1)
+    remove_old = _STATS_DELTA_SQL.format(row="OLD", delta=-1)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_evaluations_stats_insert AFTER INSERT ON evaluations
+        BEGIN {add_new} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_evaluations_stats_delete AFTER DELETE ON evaluations
+        BEGIN {remove_old} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_evaluations_stats_update
+        AFTER UPDATE OF final_score, compatibility_level ON evaluations
+        BEGIN {remove_old} {add_new} END
+    """)
+    _rebuild_statistics(conn)
+
+def _migration_evaluation_answers(conn):
+    """Risposte normalizzate (una riga per domanda) per le analisi per opzione."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS evaluation_answers (
+            evaluation_id INTEGER NOT NULL,
+            question_id TEXT NOT NULL,
+            option_key TEXT,
+            points REAL,
+            PRIMARY KEY (evaluation_id, question_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_evaluation_answers_option
+        ON evaluation_answers (question_id, option_key, evaluation_id)
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_evaluations_answers_delete AFTER DELETE ON evaluations
+        BEGIN DELETE FROM evaluation_answers WHERE evaluation_id = OLD.id; END
+    """)
+
+# Testo indicizzato per la ricerca: risposte aperte e testi generati di una riga
+_FTS_VALUES_SQL = """
+    {row}.id,
+    CASE WHEN json_valid({row}.answers_json) THEN json_extract({row}.answers_json, '$.why_us') END,
+    CASE WHEN json_valid({row}.answers_json) THEN json_extract({row}.answers_json, '$.non_negotiables') END,
+    {row}.interpretation,
+    {row}.final_report
+"""
+
+def _migration_full_text_search(conn):
+    """Indice FTS5 su risposte aperte, interpretazione e resoconto finale."""
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS evaluations_fts USING fts5(
+            why_us, non_negotiables, interpretation, final_report,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    # Ranking bm25 con più peso alle risposte aperte che ai testi generati
+    conn.execute("INSERT INTO evaluations_fts (evaluations_fts, rank) VALUES ('rank', 'bm25(2.0, 2.0, 1.0, 1.0)')")
+    columns = "rowid, why_us, non_negotiables, interpretation, final_report"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_evaluations_fts_insert AFTER INSERT ON evaluations
+        BEGIN
+            INSERT INTO evaluations_fts ({columns}) VALUES ({_FTS_VALUES_SQL.format(row="NEW")});
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_evaluations_fts_delete AFTER DELETE ON evaluations
+        BEGIN
+            DELETE FROM evaluations_fts WHERE rowid = OLD.id;
+        END
+    """)
+    # I testi generati in un secondo momento (job, streaming) arrivano con un UPDATE
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_evaluations_fts_update
+        AFTER UPDATE OF answers_json, interpretation, final_report ON evaluations
+        BEGIN
+            DELETE FROM evaluations_fts WHERE rowid = OLD.id;
+            INSERT INTO evaluations_fts ({columns}) VALUES ({_FTS_VALUES_SQL.format(row="NEW")});
+        END
+    """)
+    conn.execute("DELETE FROM evaluations_fts")
+    conn.execute(f"""
+        INSERT INTO evaluations_fts ({columns})
+        SELECT {_FTS_VALUES_SQL.format(row="evaluations")} FROM evaluations
+    """)
+
+def _migration_import_progress(conn):
+    """Avanzamento delle importazioni in blocco (ripresa dopo un'interruzione)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            imported INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _migration_scoring_version(conn):
+    """Versione di domande e regole con cui è stata calcolata ogni valutazione."""
+    _add_column_if_missing(conn, "evaluations", "scoring_version", "TEXT")
+
+def _migration_question_sets(conn):
+    """Insiemi di domande versionati (uno attivo alla volta)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS question_sets (
+            version TEXT PRIMARY KEY,
+            label TEXT,
+            definition TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_question_sets_active
+        ON question_sets (active) WHERE active = 1
+    """)
+
+def _migration_report_claims(conn):
+    """Presa in carico della generazione dei testi (recupero dei job interrotti)."""
+    _add_column_if_missing(conn, "evaluations", "report_claimed_at", "TIMESTAMP")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_evaluations_unfinished_reports
+        ON evaluations (id) WHERE report_status IN ('pending', 'streaming')
+    """)
+
+def _migration_data_changes(conn):
+    """Contatore delle modifiche a punteggi e indici (versione dei dati per la cache delle analisi)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_changes (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            counter INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO data_changes (id, counter) VALUES (1, 0)")
+    # Una rivalutazione può cambiare gli indici senza cambiare punteggi né conteggi
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_evaluations_data_changes
+        AFTER UPDATE OF final_score, trust_index, vision_index, emotional_maturity_index,
+                        ambition_alignment_index ON evaluations
+        WHEN OLD.final_score IS NOT NEW.final_score
+          OR OLD.trust_index IS NOT NEW.trust_index
+          OR OLD.vision_index IS NOT NEW.vision_index
+          OR OLD.emotional_maturity_index IS NOT NEW.emotional_maturity_index
+          OR OLD.ambition_alignment_index IS NOT NEW.ambition_alignment_index
+        BEGIN
+            UPDATE data_changes SET counter = counter + 1 WHERE id = 1;
+        END
+    """)
+
+# Migrazioni in ordine: la versione dello schema (PRAGMA user_version) è il
+# numero di migrazioni già applicate. Aggiungere sempre in fondo.
+MIGRATIONS = [
+    _migration_initial_schema,
+    _migration_report_status,
+    _migration_llm_cache,
+    _migration_evaluations_created_at_index,
+    _migration_evaluations_level_index,
+    _migration_materialized_statistics,
+    _migration_evaluation_answers,
+    _migration_full_text_search,
+    _migration_import_progress,
+    _migration_scoring_version,
+    _migration_question_sets,
+    _migration_report_claims,
+    _migration_data_changes,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
 
 def init_db():
-    """Inizializza il database creando le tabelle se non esistono."""
+    """Porta il database all'ultima versione dello schema applicando le migrazioni mancanti."""
     with get_db() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS evaluations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                final_score INTEGER,
-                compatibility_level TEXT,
-                verdict TEXT,
-                trust_index REAL,
-                vision_index REAL,
-                emotional_maturity_index REAL,
-                ambition_alignment_index REAL,
-                answers_json TEXT,
-                points_breakdown_json TEXT,
-                strengths_json TEXT,
-                concerns_json TEXT,
-                red_flags_json TEXT,
-                interpretation TEXT,
-                final_message TEXT,
-                final_report TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # Lock in scrittura prima di leggere la versione: più worker avviati
+        # insieme applicano le migrazioni una volta sola
+        conn.execute("BEGIN IMMEDIATE")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            print(f"Migrazione database {target}/{SCHEMA_VERSION}: {migration.__doc__}")
+
+_INSERT_EVALUATION_SQL = """
+    INSERT INTO evaluations (
+        name, final_score, compatibility_level, verdict,
+        trust_index, vision_index, emotional_maturity_index, ambition_alignment_index,
+        answers_json, points_breakdown_json, strengths_json, concerns_json, red_flags_json,
+        interpretation, final_message, final_report, report_status, scoring_version
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
 
-def save_evaluation(evaluation_data: dict, interpretation: str = None, final_report: str = None):
+def save_evaluation(evaluation_data: dict, interpretation: str = None, final_report: str = None,
+                    report_status: str = "ready"):
     """
     Salva una valutazione nel database.
     
@@ -56,47 +381,292 @@ def save_evaluation(evaluation_data: dict, interpretation: str = None, final_rep
         evaluation_data: Dizionario con i dati della valutazione
         interpretation: Testo dell'interpretazione avanzata (opzionale)
         final_report: Testo del resoconto finale (opzionale)
+        report_status: "ready", oppure "pending" se i testi arriveranno più tardi
     
     Returns:
         ID della valutazione salvata
     """
     with get_db() as conn:
-        # Controlla se la colonna final_report esiste, altrimenti la aggiunge
-        try:
-            conn.execute("ALTER TABLE evaluations ADD COLUMN final_report TEXT")
-        except sqlite3.OperationalError:
-            pass  # Colonna già esistente
-        
+        return _insert_evaluation(conn, evaluation_data, interpretation, final_report, report_status)
+
+def _insert_evaluation(conn, evaluation_data: dict, interpretation: str = None, final_report: str = None,
+                       report_status: str = "ready") -> int:
+    """Inserisce valutazione e risposte nella transazione di `conn` (senza commit)."""
+    cursor = conn.execute(_INSERT_EVALUATION_SQL,
+                          _evaluation_params(evaluation_data, interpretation, final_report, report_status))
+    _insert_answers(conn, cursor.lastrowid, evaluation_data.get("answers", {}))
+    return cursor.lastrowid
+
+def _evaluation_params(evaluation_data: dict, interpretation: str, final_report: str, report_status: str) -> tuple:
+    """Parametri di _INSERT_EVALUATION_SQL per una valutazione."""
+    return (
+        evaluation_data.get("name", ""),
+        evaluation_data.get("final_score", 0),
+        evaluation_data.get("compatibility_level", ""),
+        evaluation_data.get("verdict", ""),
+        evaluation_data.get("trust_index", 0),
+        evaluation_data.get("vision_index", 0),
+        evaluation_data.get("emotional_maturity_index", 0),
+        evaluation_data.get("ambition_alignment_index", 0),
+        json.dumps(evaluation_data.get("answers", {}), ensure_ascii=False),
+        json.dumps(evaluation_data.get("points_breakdown", []), ensure_ascii=False),
+        json.dumps(evaluation_data.get("strengths", []), ensure_ascii=False),
+        json.dumps(evaluation_data.get("concerns", []), ensure_ascii=False),
+        json.dumps(evaluation_data.get("red_flags", []), ensure_ascii=False),
+        interpretation,
+        evaluation_data.get("final_message", ""),
+        final_report,
+        report_status,
+        evaluation_data.get("scoring_version") or scoring_version()
+    )
+
+def _insert_answers(conn, eval_id: int, answers: dict):
+    conn.executemany("""
+        INSERT OR REPLACE INTO evaluation_answers (evaluation_id, question_id, option_key, points)
+        VALUES (?, ?, ?, ?)
+    """, [(eval_id, *row) for row in answer_points(answers)])
+
+_BULK_INSERT_EVALUATION_SQL = """
+    INSERT INTO evaluations (
+        id, created_at, name, final_score, compatibility_level, verdict,
+        trust_index, vision_index, emotional_maturity_index, ambition_alignment_index,
+        answers_json, points_breakdown_json, strengths_json, concerns_json, red_flags_json,
+        interpretation, final_message, final_report, report_status, scoring_version
+    ) VALUES (?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def get_import_progress(source: str):
+    """Posizione (byte) e righe già importate per una sorgente, oppure None."""
+    with get_read_db() as conn:
+        row = conn.execute("""
+            SELECT position, imported FROM import_progress WHERE source = ?
+        """, (source,)).fetchone()
+        return (row["position"], row["imported"]) if row else None
+
+def reset_import_progress(source: str):
+    """Dimentica l'avanzamento di una sorgente (la prossima importazione riparte da capo)."""
+    with get_db() as conn:
+        conn.execute("DELETE FROM import_progress WHERE source = ?", (source,))
+
+def insert_evaluations_batch(evaluations: list, source: str = None, position: int = None,
+                             imported: int = None) -> int:
+    """
+    Inserisce molte valutazioni in un'unica transazione con executemany.
+
+    Gli ID vengono assegnati qui, sotto il lock in scrittura, così anche
+    evaluation_answers si riempie con un solo executemany. Se `source` è
+    indicata, l'avanzamento viene salvato nella stessa transazione: dopo
+    un'interruzione il blocco risulta importato per intero o per niente.
+
+    Args:
+        evaluations: Tuple (evaluation_data, interpretation, final_report, created_at o None)
+        source, position, imported: Sorgente, posizione raggiunta e righe importate finora
+
+    Returns:
+        ID della prima valutazione inserita
+    """
+    with get_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        # Come AUTOINCREMENT: mai riusare un ID, nemmeno di righe cancellate
+        first_id = conn.execute("""
+            SELECT max(
+                COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'evaluations'), 0),
+                COALESCE((SELECT max(id) FROM evaluations), 0)
+            ) + 1
+        """).fetchone()[0]
+        conn.executemany(_BULK_INSERT_EVALUATION_SQL, [
+            (first_id + offset, created_at, *_evaluation_params(data, interpretation, final_report, "ready"))
+            for offset, (data, interpretation, final_report, created_at) in enumerate(evaluations)
+        ])
+        conn.executemany("""
+            INSERT INTO evaluation_answers (evaluation_id, question_id, option_key, points)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (first_id + offset, *row)
+            for offset, (data, _, _, _) in enumerate(evaluations)
+            for row in answer_points(data.get("answers", {}))
+        ])
+        if source is not None:
+            conn.execute("""
+                INSERT INTO import_progress (source, position, imported) VALUES (?, ?, ?)
+                ON CONFLICT(source) DO UPDATE SET
+                    position = excluded.position, imported = excluded.imported, updated_at = CURRENT_TIMESTAMP
+            """, (source, position, imported))
+        return first_id
+
+def backfill_answers(batch_size: int = 1000) -> int:
+    """
+    Popola evaluation_answers per le valutazioni salvate prima della tabella.
+    
+    Returns:
+        Numero di valutazioni elaborate
+    """
+    processed, last_id = 0, 0
+    while True:
+        with get_db() as conn:
+            rows = conn.execute("""
+                SELECT id, answers_json FROM evaluations e
+                WHERE id > ? AND NOT EXISTS (
+                    SELECT 1 FROM evaluation_answers a WHERE a.evaluation_id = e.id
+                )
+                ORDER BY id
+                LIMIT ?
+            """, (last_id, batch_size)).fetchall()
+            for row in rows:
+                _insert_answers(conn, row["id"], json.loads(row["answers_json"] or "{}"))
+        if not rows:
+            return processed
+        processed += len(rows)
+        last_id = rows[-1]["id"]
+
+def iter_stale_evaluations(version: str, chunk_size: int = 2000, force: bool = False):
+    """
+    Valutazioni calcolate con una versione di domande e regole diversa da `version`, a blocchi.
+
+    Ogni blocco è letto con una transazione breve (paginazione per ID), così le
+    scritture della rivalutazione possono procedere in parallelo.
+
+    Yields:
+        Liste di tuple (id, answers_json, final_score, compatibility_level)
+    """
+    last_id = 0
+    condition = "" if force else "AND scoring_version IS NOT ?"
+    while True:
+        with get_read_db() as conn:
+            rows = conn.execute(f"""
+                SELECT id, answers_json, final_score, compatibility_level FROM evaluations
+                WHERE id > ? {condition}
+                ORDER BY id
+                LIMIT ?
+            """, (last_id, chunk_size) if force else (last_id, version, chunk_size)).fetchall()
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+        last_id = rows[-1][0]
+
+_RESCORE_UPDATE_SQL = """
+    UPDATE evaluations SET
+        final_score = ?, compatibility_level = ?, verdict = ?,
+        trust_index = ?, vision_index = ?, emotional_maturity_index = ?, ambition_alignment_index = ?,
+        points_breakdown_json = ?, strengths_json = ?, concerns_json = ?, red_flags_json = ?,
+        final_message = ?, scoring_version = ?
+    WHERE id = ?
+"""
+
+def apply_rescored(updates: list):
+    """Scrive i risultati di una rivalutazione (parametri di _RESCORE_UPDATE_SQL) in un'unica transazione."""
+    with get_db() as conn:
+        conn.executemany(_RESCORE_UPDATE_SQL, updates)
+
+def refresh_answer_points(points: list) -> int:
+    """
+    Allinea i punti di evaluation_answers ai punti per opzione attuali.
+
+    I punti dipendono solo da domanda e opzione: basta un UPDATE per opzione
+    (sull'indice per domanda e opzione) invece di riscrivere le righe di ogni
+    valutazione. Le righe delle domande assenti dall'insieme attivo restano
+    come sono: tornando a un insieme precedente le analisi per domanda sono
+    ancora complete (le righe delle valutazioni cancellate le rimuove il
+    trigger trg_evaluations_answers_delete).
+
+    Args:
+        points: [(question_id, {opzione: punti}, punti per valori sconosciuti)]
+
+    Returns:
+        Righe modificate
+    """
+    changed = 0
+    with get_db() as conn:
+        for question_id, option_points, unknown_points in points:
+            for option_key, value in option_points.items():
+                changed += conn.execute("""
+                    UPDATE evaluation_answers SET points = ?
+                    WHERE question_id = ? AND option_key = ? AND points IS NOT ?
+                """, (value, question_id, option_key, value)).rowcount
+            placeholders = ", ".join("?" * len(option_points))
+            changed += conn.execute(f"""
+                UPDATE evaluation_answers SET points = ?
+                WHERE question_id = ? AND option_key NOT IN ({placeholders}) AND points IS NOT ?
+            """, (unknown_points, question_id, *option_points, unknown_points)).rowcount
+    return changed
+
+def update_evaluation_texts(eval_id: int, interpretation: str = None, final_report: str = None,
+                            report_status: str = "ready"):
+    """Completa una valutazione salvata con i testi generati in un secondo momento."""
+    with get_db() as conn:
+        conn.execute("""
+            UPDATE evaluations
+            SET interpretation = ?, final_report = ?, report_status = ?
+            WHERE id = ?
+        """, (interpretation, final_report, report_status, eval_id))
+
+def claim_evaluation_report(eval_id: int) -> bool:
+    """
+    Prende in carico la generazione dei testi di una valutazione "pending".
+    
+    Vale anche per una presa in carico più vecchia di REPORT_CLAIM_TIMEOUT
+    (processo riavviato o terminato a metà generazione).
+    
+    Returns:
+        True se la valutazione è stata presa in carico da questa chiamata
+    """
+    with get_db() as conn:
         cursor = conn.execute("""
-            INSERT INTO evaluations (
-                name, final_score, compatibility_level, verdict,
-                trust_index, vision_index, emotional_maturity_index, ambition_alignment_index,
-                answers_json, points_breakdown_json, strengths_json, concerns_json, red_flags_json,
-                interpretation, final_message, final_report
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            evaluation_data.get("name", ""),
-            evaluation_data.get("final_score", 0),
-            evaluation_data.get("compatibility_level", ""),
-            evaluation_data.get("verdict", ""),
-            evaluation_data.get("trust_index", 0),
-            evaluation_data.get("vision_index", 0),
-            evaluation_data.get("emotional_maturity_index", 0),
-            evaluation_data.get("ambition_alignment_index", 0),
-            json.dumps(evaluation_data.get("answers", {}), ensure_ascii=False),
-            json.dumps(evaluation_data.get("points_breakdown", []), ensure_ascii=False),
-            json.dumps(evaluation_data.get("strengths", []), ensure_ascii=False),
-            json.dumps(evaluation_data.get("concerns", []), ensure_ascii=False),
-            json.dumps(evaluation_data.get("red_flags", []), ensure_ascii=False),
-            interpretation,
-            evaluation_data.get("final_message", ""),
-            final_report
-        ))
-        return cursor.lastrowid
+            UPDATE evaluations SET report_status = 'streaming', report_claimed_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND (
+                report_status = 'pending'
+                OR (report_status = 'streaming'
+                    AND (report_claimed_at IS NULL OR report_claimed_at <= datetime('now', ?)))
+            )
+        """, (eval_id, f"-{REPORT_CLAIM_TIMEOUT} seconds"))
+        return cursor.rowcount == 1
+
+def release_evaluation_report(eval_id: int):
+    """Rimette "pending" una valutazione presa in carico e non completata (per un altro job)."""
+    with get_db() as conn:
+        conn.execute("""
+            UPDATE evaluations SET report_status = 'pending', report_claimed_at = NULL
+            WHERE id = ? AND report_status = 'streaming'
+        """, (eval_id,))
+
+def list_unfinished_reports(pending_age: float) -> list:
+    """
+    ID delle valutazioni con i testi mai completati: "pending" da più di
+    `pending_age` secondi, oppure con una presa in carico scaduta.
+    """
+    with get_read_db() as conn:
+        rows = conn.execute("""
+            SELECT id FROM evaluations
+            WHERE report_status IN ('pending', 'streaming') AND (
+                (report_status = 'pending' AND created_at <= datetime('now', ?))
+                OR (report_status = 'streaming'
+                    AND (report_claimed_at IS NULL OR report_claimed_at <= datetime('now', ?)))
+            )
+            ORDER BY id
+        """, (f"-{int(pending_age)} seconds", f"-{REPORT_CLAIM_TIMEOUT} seconds")).fetchall()
+        return [row["id"] for row in rows]
+
+def get_evaluation_status(eval_id: int):
+    """Recupera solo lo stato di generazione e i testi di una valutazione."""
+    with get_read_db() as conn:
+        row = conn.execute("""
+            SELECT id, report_status, interpretation, final_report
+            FROM evaluations WHERE id = ?
+        """, (eval_id,)).fetchone()
+        
+        if not row:
+            return None
+        
+        return {
+            "id": row["id"],
+            "report_status": row["report_status"] or "ready",
+            "interpretation": row["interpretation"],
+            "final_report": row["final_report"]
+        }
 
 def get_evaluation(eval_id: int):
     """Recupera una valutazione dal database per ID."""
-    with get_db() as conn:
+    with get_read_db() as conn:
         row = conn.execute("""
             SELECT * FROM evaluations WHERE id = ?
         """, (eval_id,)).fetchone()
@@ -121,34 +691,390 @@ def get_evaluation(eval_id: int):
             "red_flags": json.loads(row["red_flags_json"]),
             "interpretation": row["interpretation"],
             "final_message": row["final_message"],
-            "final_report": row["final_report"] if "final_report" in row.keys() else None,  # Compatibilità con DB vecchi
+            "final_report": row["final_report"],
+            "report_status": row["report_status"] or "ready",
+            "scoring_version": row["scoring_version"],
             "created_at": row["created_at"]
         }
 
-def get_all_evaluations(limit: int = 50):
-    """Recupera tutte le valutazioni (più recenti prima)."""
-    with get_db() as conn:
-        rows = conn.execute("""
+def encode_cursor(created_at: str, eval_id: int) -> str:
+    """Cursore opaco per la paginazione: posizione dell'ultima riga restituita."""
+    raw = json.dumps([created_at, eval_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Inverso di encode_cursor: (created_at, id). Solleva ValueError se non valido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, eval_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Cursore non valido")
+    if not isinstance(created_at, str) or not isinstance(eval_id, int):
+        raise ValueError("Cursore non valido")
+    return created_at, eval_id
+
+def _evaluation_filters(level: str = None, min_score: int = None, max_score: int = None,
+                        date_from: str = None, date_to: str = None) -> tuple:
+    """Condizioni SQL e parametri per i filtri su livello, punteggio e date."""
+    conditions, params = [], []
+    if level:
+        conditions.append("compatibility_level = ?")
+        params.append(level)
+    if min_score is not None:
+        conditions.append("final_score >= ?")
+        params.append(min_score)
+    if max_score is not None:
+        conditions.append("final_score <= ?")
+        params.append(max_score)
+    if date_from:
+        conditions.append("created_at >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("created_at < date(?, '+1 day')")
+        params.append(date_to)
+    return conditions, params
+
+def list_evaluations(limit: int = 50, cursor: str = None, level: str = None,
+                     min_score: int = None, max_score: int = None,
+                     date_from: str = None, date_to: str = None):
+    """
+    Una pagina di valutazioni (più recenti prima) con paginazione a cursore.
+    
+    Args:
+        limit: Righe per pagina
+        cursor: next_cursor della pagina precedente (None per la prima)
+        level: Livello di compatibilità
+        min_score, max_score: Intervallo di punteggio (estremi inclusi)
+        date_from, date_to: Intervallo di date "YYYY-MM-DD" (estremi inclusi)
+    
+    Returns:
+        {"evaluations": [...], "next_cursor": cursore della pagina successiva o None}
+    """
+    conditions, params = _evaluation_filters(level, min_score, max_score, date_from, date_to)
+    if cursor:
+        # Confronto per riga su (created_at, id): l'indice parte direttamente dalla posizione
+        conditions.insert(0, "(created_at, id) < (?, ?)")
+        params[:0] = decode_cursor(cursor)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with get_read_db() as conn:
+        rows = conn.execute(f"""
             SELECT id, name, final_score, compatibility_level, verdict, created_at
             FROM evaluations
-            ORDER BY created_at DESC
+            {where}
+            ORDER BY created_at DESC, id DESC
             LIMIT ?
-        """, (limit,)).fetchall()
-        
-        return [dict(row) for row in rows]
+        """, (*params, limit + 1)).fetchall()
+
+    evaluations = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = evaluations[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return {"evaluations": evaluations, "next_cursor": next_cursor}
+
+def get_all_evaluations(limit: int = 50):
+    """Recupera le valutazioni più recenti (prima pagina di list_evaluations)."""
+    return list_evaluations(limit=limit)["evaluations"]
+
+def iter_evaluation_rows(level: str = None, min_score: int = None, max_score: int = None,
+                        date_from: str = None, date_to: str = None, batch_size: int = 1000):
+    """
+    Tutte le righe di evaluations (dalla più vecchia) che rispettano i filtri, a blocchi.
+
+    Usa una connessione dedicata con un'unica lettura: l'esportazione vede uno
+    snapshot coerente, la memoria resta costante e le righe arrivano subito
+    (l'ordine segue l'indice su created_at, senza ordinamenti in memoria).
+
+    Yields:
+        Liste di al massimo `batch_size` righe sqlite3.Row
+    """
+    conditions, params = _evaluation_filters(level, min_score, max_score, date_from, date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    conn = _connect(readonly=True)
+    try:
+        cursor = conn.execute(f"""
+            SELECT * FROM evaluations
+            {where}
+            ORDER BY created_at, id
+        """, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        conn.close()
+
+# Chiave di get_statistics per ogni livello di compatibilità
+_LEVEL_COUNT_KEYS = {
+    "wife material": "wife_material_count",
+    "compatibile": "compatible_count",
+    "potenziale": "potential_count",
+    "non compatibile": "incompatible_count",
+}
+
+def _statistics_from_levels(rows) -> dict:
+    """Dizionario di get_statistics da righe (compatibility_level, count, score_sum)."""
+    stats = {"total": 0, "avg_score": None, **{key: 0 for key in _LEVEL_COUNT_KEYS.values()}}
+    score_sum = 0
+    for level, count, level_sum in rows:
+        stats["total"] += count
+        score_sum += level_sum
+        if level in _LEVEL_COUNT_KEYS:
+            stats[_LEVEL_COUNT_KEYS[level]] += count
+    if stats["total"]:
+        stats["avg_score"] = score_sum / stats["total"]
+    return stats
+
+# Delimitatori dei termini trovati negli snippet (sostituiti da <mark> dopo l'escape HTML)
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+def _fts_query(text: str) -> str:
+    """
+    Query FTS5 dal testo libero: ogni parola è un termine tra virgolette (tutte
+    devono comparire); una parola che termina con * cerca il prefisso.
+    """
+    terms = re.findall(r"\w+\*?", text)
+    return " ".join(f'"{term.rstrip("*")}"' + ("*" if term.endswith("*") else "") for term in terms)
+
+def _highlight(snippet: str) -> str:
+    """Snippet in HTML: testo con escape, termini trovati tra <mark>."""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+def search_evaluations(query: str, limit: int = 20, cursor: str = None):
+    """
+    Ricerca testuale su risposte aperte, interpretazione e resoconto finale.
+    
+    Args:
+        query: Parole da cercare (tutte devono comparire; "parola*" per prefisso)
+        limit: Risultati per pagina
+        cursor: next_cursor della pagina precedente (None per la prima)
+    
+    Returns:
+        {"evaluations": [...], "next_cursor": ...}: risultati ordinati per
+        rilevanza (bm25), ognuno con uno snippet HTML dei termini trovati
+    """
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        raise ValueError("Cursore non valido")
+    match = _fts_query(query)
+    if not match:
+        return {"evaluations": [], "next_cursor": None}
+
+    with get_read_db() as conn:
+        rows = conn.execute("""
+            SELECT e.id, e.name, e.final_score, e.compatibility_level, e.verdict, e.created_at,
+                   snippet(evaluations_fts, -1, ?, ?, '…', 16) AS snippet
+            FROM evaluations_fts
+            JOIN evaluations e ON e.id = evaluations_fts.rowid
+            WHERE evaluations_fts MATCH ?
+            ORDER BY evaluations_fts.rank
+            LIMIT ? OFFSET ?
+        """, (_MARK_START, _MARK_END, match, limit + 1, offset)).fetchall()
+
+    evaluations = []
+    for row in rows[:limit]:
+        evaluation = dict(row)
+        evaluation["snippet"] = _highlight(evaluation["snippet"])
+        evaluations.append(evaluation)
+    next_cursor = str(offset + limit) if len(rows) > limit else None
+    return {"evaluations": evaluations, "next_cursor": next_cursor}
 
 def get_statistics():
-    """Recupera statistiche aggregate sulle valutazioni."""
+    """Statistiche aggregate sulle valutazioni, lette dalla tabella materializzata (una riga per livello)."""
+    with get_read_db() as conn:
+        rows = conn.execute("SELECT compatibility_level, count, score_sum FROM evaluation_stats").fetchall()
+    return _statistics_from_levels(rows)
+
+def get_score_histogram():
+    """Istogramma dei punteggi: righe (compatibility_level, score, count) non vuote."""
+    with get_read_db() as conn:
+        return [tuple(row) for row in conn.execute("""
+            SELECT compatibility_level, score, count FROM score_histogram WHERE count > 0
+        """)]
+
+def _recompute_statistics(conn) -> dict:
+    """Statistiche ricalcolate dall'intera tabella evaluations."""
+    rows = conn.execute("""
+        SELECT COALESCE(compatibility_level, ''), COUNT(*), SUM(COALESCE(final_score, 0))
+        FROM evaluations GROUP BY 1
+    """).fetchall()
+    return _statistics_from_levels(rows)
+
+def _rebuild_statistics(conn):
+    conn.execute("DELETE FROM evaluation_stats")
+    conn.execute("DELETE FROM score_histogram")
+    conn.execute("""
+        INSERT INTO evaluation_stats (compatibility_level, count, score_sum)
+        SELECT COALESCE(compatibility_level, ''), COUNT(*), SUM(COALESCE(final_score, 0))
+        FROM evaluations GROUP BY 1
+    """)
+    conn.execute("""
+        INSERT INTO score_histogram (compatibility_level, score, count)
+        SELECT COALESCE(compatibility_level, ''), COALESCE(final_score, 0), COUNT(*)
+        FROM evaluations GROUP BY 1, 2
+    """)
+
+def rebuild_statistics():
+    """
+    Confronta le statistiche materializzate con l'intera tabella e le ricostruisce.
+    
+    Returns:
+        {"materialized": statistiche prima della ricostruzione,
+         "recomputed": statistiche ricalcolate,
+         "histogram_mismatches": bucket dell'istogramma che non tornavano}
+    """
     with get_db() as conn:
-        stats = conn.execute("""
-            SELECT 
-                COUNT(*) as total,
-                AVG(final_score) as avg_score,
-                COUNT(CASE WHEN compatibility_level = 'wife material' THEN 1 END) as wife_material_count,
-                COUNT(CASE WHEN compatibility_level = 'compatibile' THEN 1 END) as compatible_count,
-                COUNT(CASE WHEN compatibility_level = 'potenziale' THEN 1 END) as potential_count,
-                COUNT(CASE WHEN compatibility_level = 'non compatibile' THEN 1 END) as incompatible_count
-            FROM evaluations
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute("SELECT compatibility_level, count, score_sum FROM evaluation_stats").fetchall()
+        materialized = _statistics_from_levels(rows)
+        mismatches = conn.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT * FROM (
+                    SELECT compatibility_level, score, count FROM score_histogram WHERE count != 0
+                    EXCEPT
+                    SELECT COALESCE(compatibility_level, ''), COALESCE(final_score, 0), COUNT(*)
+                    FROM evaluations GROUP BY 1, 2
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT COALESCE(compatibility_level, ''), COALESCE(final_score, 0), COUNT(*)
+                    FROM evaluations GROUP BY 1, 2
+                    EXCEPT
+                    SELECT compatibility_level, score, count FROM score_histogram WHERE count != 0
+                )
+            )
+        """).fetchone()[0]
+        _rebuild_statistics(conn)
+        return {
+            "materialized": materialized,
+            "recomputed": _recompute_statistics(conn),
+            "histogram_mismatches": mismatches,
+        }
+
+def get_answer_distribution():
+    """
+    Distribuzione delle risposte per domanda e opzione.
+    
+    Returns:
+        {question_id: {option_key: {"count", "avg_score", "avg_points"}}}
+    """
+    with get_read_db() as conn:
+        rows = conn.execute("""
+            SELECT a.question_id, a.option_key, COUNT(*) AS count,
+                   AVG(e.final_score) AS avg_score, AVG(a.points) AS avg_points
+            FROM evaluation_answers a
+            JOIN evaluations e ON e.id = a.evaluation_id
+            GROUP BY a.question_id, a.option_key
+        """).fetchall()
+    distribution = {}
+    for row in rows:
+        distribution.setdefault(row["question_id"], {})[row["option_key"]] = {
+            "count": row["count"],
+            "avg_score": row["avg_score"],
+            "avg_points": row["avg_points"],
+        }
+    return distribution
+
+def get_data_version() -> tuple:
+    """Identifica lo stato dei dati: cambia a ogni inserimento, cancellazione o modifica di punteggio e indici."""
+    with get_read_db() as conn:
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM evaluations").fetchone()[0]
+        total, score_sum = conn.execute("""
+            SELECT COALESCE(SUM(count), 0), COALESCE(SUM(score_sum), 0) FROM evaluation_stats
         """).fetchone()
-        
-        return dict(stats)
+        changes = conn.execute("SELECT COALESCE(MAX(counter), 0) FROM data_changes").fetchone()[0]
+    return (max_id, total, score_sum, changes)
+
+def get_answers_snapshot(question_ids: list) -> dict:
+    """
+    Istantanea colonnare per le analisi (una sola transazione di lettura).
+    
+    Returns:
+        {"evaluations": righe (id, julianday(created_at), final_score, indici...) ordinate per id,
+         "answers": {question_id: righe (option_key, id delle valutazioni separati da virgola)}}
+    """
+    with get_read_db() as conn:
+        conn.execute("BEGIN")
+        # Tuple semplici invece di sqlite3.Row: sono centinaia di migliaia di righe
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        evaluations = cursor.execute("""
+            SELECT id, julianday(created_at), final_score,
+                   trust_index, vision_index, emotional_maturity_index, ambition_alignment_index
+            FROM evaluations ORDER BY id
+        """).fetchall()
+        # Una riga per opzione invece che per risposta: molti meno oggetti da creare
+        answers = {
+            question_id: cursor.execute("""
+                SELECT option_key, group_concat(evaluation_id) FROM evaluation_answers
+                WHERE question_id = ? GROUP BY option_key
+            """, (question_id,)).fetchall()
+            for question_id in question_ids
+        }
+    return {"evaluations": evaluations, "answers": answers}
+
+def get_active_question_set_version():
+    """Versione dell'insieme di domande attivo nella tabella question_sets, oppure None."""
+    with get_read_db() as conn:
+        row = conn.execute("SELECT version FROM question_sets WHERE active = 1").fetchone()
+        return row["version"] if row else None
+
+def get_question_set(version: str):
+    """Definizione (JSON) di un insieme di domande salvato, oppure None."""
+    with get_read_db() as conn:
+        row = conn.execute("SELECT definition FROM question_sets WHERE version = ?", (version,)).fetchone()
+        return row["definition"] if row else None
+
+def store_question_set(version: str, label: str, definition: str, activate: bool = True):
+    """Salva un insieme di domande (se nuovo) e, se richiesto, lo rende l'unico attivo."""
+    with get_db() as conn:
+        conn.execute("""
+            INSERT OR IGNORE INTO question_sets (version, label, definition) VALUES (?, ?, ?)
+        """, (version, label, definition))
+        if activate:
+            conn.execute("UPDATE question_sets SET active = 0 WHERE active = 1")
+            conn.execute("UPDATE question_sets SET active = 1 WHERE version = ?", (version,))
+
+def deactivate_question_sets():
+    """Nessun insieme attivo nella tabella: si torna alle domande di questions.py."""
+    with get_db() as conn:
+        conn.execute("UPDATE question_sets SET active = 0 WHERE active = 1")
+
+def list_question_sets():
+    """Insiemi di domande salvati, dal più recente."""
+    with get_read_db() as conn:
+        rows = conn.execute("""
+            SELECT version, label, active, created_at FROM question_sets ORDER BY created_at DESC, version
+        """).fetchall()
+        return [dict(row) for row in rows]
+
+def get_cached_response(key: str, min_created_at: float):
+    """Recupera una risposta LLM in cache non più vecchia di min_created_at: (testo, created_at)."""
+    with get_read_db() as conn:
+        row = conn.execute("""
+            SELECT response, created_at FROM llm_cache
+            WHERE key = ? AND created_at >= ?
+        """, (key, min_created_at)).fetchone()
+        return (row["response"], row["created_at"]) if row else None
+
+def store_cached_response(key: str, kind: str, response: str, created_at: float):
+    """Salva (o aggiorna) una risposta LLM in cache."""
+    with get_db() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO llm_cache (key, kind, response, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (key, kind, response, created_at))
+
+def prune_cached_responses(max_entries: int, min_created_at: float):
+    """Elimina le risposte scadute e le più vecchie oltre max_entries."""
+    with get_db() as conn:
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (min_created_at,))
+        conn.execute("""
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (max_entries,))
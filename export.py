@@ -0,0 +1,99 @@
+"""
+Esportazione in streaming delle valutazioni (NDJSON o CSV).
+
+Le righe arrivano a blocchi da `iter_evaluation_rows` e ogni blocco viene
+convertito in un pezzo di testo: la memoria non dipende dal numero di
+valutazioni e i primi byte partono subito. In NDJSON le colonne JSON salvate
+vengono copiate così come sono, senza decodificarle e ricodificarle.
+"""
+import csv
+import io
+import json
+
+from . import question_sets
+from .database import iter_evaluation_rows
+
+# Righe per blocco: ogni blocco diventa un pezzo della risposta
+EXPORT_BATCH_SIZE = 200
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Campi esportati, con le stesse chiavi di get_evaluation
+SCALAR_FIELDS = ("id", "name", "final_score", "compatibility_level", "verdict",
+                 "trust_index", "vision_index", "emotional_maturity_index", "ambition_alignment_index")
+JSON_FIELDS = {  # chiave esportata -> (colonna, valore se NULL)
+    "answers": ("answers_json", "{}"),
+    "points_breakdown": ("points_breakdown_json", "[]"),
+    "strengths": ("strengths_json", "[]"),
+    "concerns": ("concerns_json", "[]"),
+    "red_flags": ("red_flags_json", "[]"),
+}
+TEXT_FIELDS = ("interpretation", "final_message", "final_report", "report_status", "scoring_version", "created_at")
+
+def _raw_json(value: str, default: str) -> str:
+    """JSON salvato pronto per una riga NDJSON (ricodificato solo se va su più righe)."""
+    if value is None:
+        return default
+    if "\n" in value or "\r" in value:
+        return json.dumps(json.loads(value), ensure_ascii=False)
+    return value
+
+def _text(row, key: str):
+    """Valore di un campo testuale (report_status vuoto nei DB vecchi = "ready")."""
+    if key == "report_status":
+        return row[key] or "ready"
+    return row[key]
+
+def _ndjson_line(row) -> str:
+    parts = [f'"{key}":{json.dumps(row[key], ensure_ascii=False)}' for key in SCALAR_FIELDS]
+    parts += [f'"{key}":{_raw_json(row[column], default)}' for key, (column, default) in JSON_FIELDS.items()]
+    parts += [f'"{key}":{json.dumps(_text(row, key), ensure_ascii=False)}' for key in TEXT_FIELDS]
+    return "{" + ",".join(parts) + "}\n"
+
+def ndjson_chunks(batches):
+    """Un pezzo di testo NDJSON (una valutazione per riga) per ogni blocco di righe."""
+    for rows in batches:
+        yield "".join(_ndjson_line(row) for row in rows)
+
+def csv_chunks(batches):
+    """
+    Un pezzo di testo CSV per ogni blocco di righe, preceduto dall'intestazione.
+
+    Una colonna per ogni domanda dell'insieme attivo; punti, punti di forza, criticità e red flags
+    restano in JSON.
+    """
+    question_set = question_sets.current()
+    answer_columns = [question["id"] for question in question_set.questions + question_set.open_questions]
+    json_keys = [key for key in JSON_FIELDS if key != "answers"]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([*SCALAR_FIELDS, *answer_columns, *json_keys, *TEXT_FIELDS])
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            answers = json.loads(row["answers_json"] or "{}")
+            writer.writerow([
+                *(row[key] for key in SCALAR_FIELDS),
+                *(answers.get(question_id, "") for question_id in answer_columns),
+                *(_raw_json(row[JSON_FIELDS[key][0]], JSON_FIELDS[key][1]) for key in json_keys),
+                *(_text(row, key) for key in TEXT_FIELDS),
+            ])
+        yield buffer.getvalue()
+
+def export_evaluations(export_format: str = "ndjson", **filters):
+    """
+    Generatore di pezzi di testo con tutte le valutazioni che rispettano i filtri.
+
+    Args:
+        export_format: "ndjson" o "csv"
+        filters: level, min_score, max_score, date_from, date_to (come list_evaluations)
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato non supportato: {export_format}")
+    batches = iter_evaluation_rows(**filters, batch_size=EXPORT_BATCH_SIZE)
+    return ndjson_chunks(batches) if export_format == "ndjson" else csv_chunks(batches)
@@ -0,0 +1,161 @@
+"""
+Scrittura differita delle valutazioni con commit di gruppo.
+
+Con DB_GROUP_COMMIT=1 le richieste non fanno più ognuna il proprio commit:
+accodano la valutazione (coda limitata) e aspettano l'ID. Un unico thread
+scrittore prende tutte quelle arrivate durante il commit precedente (fino a
+DB_GROUP_COMMIT_MAX_BATCH) e le salva con un solo commit; durante i picchi
+può aspettarne altre per DB_GROUP_COMMIT_DELAY_MS (default 0: nessuna attesa).
+Ogni valutazione ha il suo savepoint: un errore su una non annulla le altre.
+Alla chiusura del processo la coda viene svuotata prima di uscire.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from . import database
+
+DB_GROUP_COMMIT = os.getenv("DB_GROUP_COMMIT", "0") == "1"
+DB_GROUP_COMMIT_MAX_BATCH = int(os.getenv("DB_GROUP_COMMIT_MAX_BATCH", "64"))
+DB_GROUP_COMMIT_DELAY_MS = float(os.getenv("DB_GROUP_COMMIT_DELAY_MS", "0"))
+DB_GROUP_COMMIT_QUEUE = int(os.getenv("DB_GROUP_COMMIT_QUEUE", "1024"))
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Thread scrittore che salva le valutazioni accodate a gruppi, un commit per gruppo."""
+
+    def __init__(self, max_batch: int = DB_GROUP_COMMIT_MAX_BATCH, delay_ms: float = DB_GROUP_COMMIT_DELAY_MS,
+                 queue_size: int = DB_GROUP_COMMIT_QUEUE):
+        self.max_batch = max_batch
+        self.delay = delay_ms / 1000
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._last_batch_size = 0
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, evaluation_data: dict, interpretation: str = None, final_report: str = None,
+               report_status: str = "ready") -> Future:
+        """Accoda una valutazione; il Future restituisce l'ID dopo il commit del gruppo."""
+        if self._closed:
+            raise RuntimeError("Scrittore delle valutazioni chiuso")
+        future = Future()
+        try:
+            # Coda piena: la richiesta aspetta al massimo quanto aspetterebbe il lock del database
+            self._queue.put((future, (evaluation_data, interpretation, final_report, report_status)),
+                            timeout=database.DB_BUSY_TIMEOUT_MS / 1000)
+        except queue.Full:
+            raise RuntimeError("Coda di scrittura delle valutazioni piena") from None
+        return future
+
+    def save_evaluation(self, evaluation_data: dict, interpretation: str = None, final_report: str = None,
+                        report_status: str = "ready") -> int:
+        """Come database.save_evaluation, ma con commit di gruppo."""
+        return self.submit(evaluation_data, interpretation, final_report, report_status).result()
+
+    def close(self):
+        """Salva quello che è ancora in coda e ferma il thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((None, _STOP))
+        self._thread.join()
+
+    def _next_batch(self) -> list:
+        """
+        Aspetta la prima valutazione, poi raccoglie le altre fino al limite o alla scadenza.
+
+        L'attesa scatta solo durante un picco (gruppo precedente con più di una
+        valutazione): con una richiesta alla volta il commit è immediato.
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + (self.delay if self._last_batch_size > 1 else 0)
+        while len(batch) < self.max_batch and batch[-1][1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._last_batch_size = len(batch)
+        return batch
+
+    def _run(self):
+        conn = database._connect()
+        conn.isolation_level = None  # Transazioni e savepoint gestiti qui
+        try:
+            while True:
+                batch = self._next_batch()
+                stop = batch[-1][1] is _STOP
+                items = [item for item in batch if item[1] is not _STOP]
+                if items:
+                    self._commit(conn, items)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _commit(self, conn, items: list):
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for future, args in items:
+                conn.execute("SAVEPOINT evaluation")
+                try:
+                    results.append((future, database._insert_evaluation(conn, *args), None))
+                    conn.execute("RELEASE evaluation")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO evaluation")
+                    conn.execute("RELEASE evaluation")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            print(f"Errore nel commit di gruppo ({len(items)} valutazioni): {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for future, _ in items:
+                future.set_exception(e)
+            return
+        for future, eval_id, error in results:
+            if error is None:
+                future.set_result(eval_id)
+            else:
+                future.set_exception(error)
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> GroupCommitWriter:
+    """Scrittore del processo corrente (creato al primo uso, ricreato dopo un fork)."""
+    global _writer, _writer_pid
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = GroupCommitWriter()
+            _writer_pid = os.getpid()
+        return _writer
+
+
+def close_writer():
+    """Svuota la coda e ferma lo scrittore (chiamata anche all'uscita del processo)."""
+    with _writer_lock:
+        writer = _writer if _writer_pid == os.getpid() else None
+    if writer is not None:
+        writer.close()
+
+
+atexit.register(close_writer)
+
+
+def save_evaluation(evaluation_data: dict, interpretation: str = None, final_report: str = None,
+                    report_status: str = "ready") -> int:
+    """database.save_evaluation, con commit di gruppo se DB_GROUP_COMMIT è attivo."""
+    if DB_GROUP_COMMIT:
+        return get_writer().save_evaluation(evaluation_data, interpretation, final_report, report_status)
+    return database.save_evaluation(evaluation_data, interpretation, final_report, report_status)
@@ -0,0 +1,117 @@
+"""
+Importazione in blocco di valutazioni storiche da file NDJSON.
+
+Ogni riga è un oggetto con almeno "answers" (lo stesso formato prodotto da
+`export-evaluations`; "name", "created_at", "interpretation" e
+"final_report" sono facoltativi). Le risposte vengono rivalutate con
+calculate_score e inserite a blocchi, un executemany e un commit per blocco.
+La posizione raggiunta nel file è salvata nella stessa transazione: dopo
+un'interruzione l'importazione riprende dal primo blocco non salvato.
+
+"created_at" è accettato in formato ISO 8601 ("T", "Z" e fusi orari
+compresi) e salvato in UTC come "YYYY-MM-DD HH:MM:SS", lo stesso formato di
+CURRENT_TIMESTAMP: ordinamenti, filtri per data e cursori confrontano le
+stringhe. Una data non valida scarta la riga.
+"""
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from . import question_sets
+from .database import get_import_progress, insert_evaluations_batch, reset_import_progress
+from .interpretation import generate_texts
+from .scoring import calculate_score
+
+IMPORT_BATCH_SIZE = 5000
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # Come CURRENT_TIMESTAMP di SQLite
+
+def _parse_created_at(value) -> str:
+    """created_at normalizzato in UTC (None se assente: vale la data di inserimento)."""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"\"created_at\" non valido: {value!r}")
+    value = value.strip()
+    try:
+        moment = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith(("Z", "z")) else value)
+    except ValueError:
+        raise ValueError(f"\"created_at\" non valido: {value!r}") from None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+def _parse_line(line: bytes, skip_llm: bool) -> tuple:
+    """Tupla per insert_evaluations_batch da una riga NDJSON (ValueError se non valida)."""
+    item = json.loads(line)
+    if not isinstance(item, dict) or not isinstance(item.get("answers"), dict):
+        raise ValueError("manca l'oggetto \"answers\"")
+    answers = item["answers"]
+    created_at = _parse_created_at(item.get("created_at"))
+    result = calculate_score(answers)
+    interpretation, final_report = item.get("interpretation"), item.get("final_report")
+    if not skip_llm and interpretation is None and final_report is None:
+        interpretation, final_report, _ = generate_texts(result, answers)
+    return (
+        {"name": item.get("name") or "", "answers": answers, **result},
+        interpretation,
+        final_report,
+        created_at,
+    )
+
+def import_evaluations(path: str, batch_size: int = IMPORT_BATCH_SIZE, skip_llm: bool = False,
+                       restart: bool = False, report=print) -> dict:
+    """
+    Importa le valutazioni di un file NDJSON, riprendendo da dove si era fermata.
+
+    Args:
+        path: File NDJSON
+        batch_size: Righe per transazione
+        skip_llm: Non generare interpretazione e resoconto per le righe che non li hanno
+        restart: Ignora l'avanzamento salvato e riparte dall'inizio del file
+        report: Funzione per i messaggi di avanzamento
+
+    Returns:
+        {"imported": righe importate in questa esecuzione, "total": righe importate
+         dal file in tutto, "errors": righe scartate, "seconds": durata}
+    """
+    question_sets.current()  # Rivaluta con l'insieme di domande attivo
+    source = os.path.realpath(path)
+    if restart:
+        reset_import_progress(source)
+    position, total = get_import_progress(source) or (0, 0)
+    if position > os.path.getsize(source):
+        raise ValueError(f"Il file è più corto della posizione salvata ({position} byte): usare --restart")
+    if position:
+        report(f"Ripresa da byte {position} ({total} righe già importate)")
+
+    imported, errors, batch = 0, 0, []
+    start = time.perf_counter()
+    with open(source, "rb") as f:
+        f.seek(position)
+        line_number = None if position else 0  # Numeri di riga noti solo partendo dall'inizio
+        for line in f:
+            position += len(line)
+            if line_number is not None:
+                line_number += 1
+            if not line.strip():
+                continue
+            try:
+                batch.append(_parse_line(line, skip_llm))
+            except Exception as e:
+                errors += 1
+                where = f"riga {line_number}" if line_number is not None else f"byte {position - len(line)}"
+                report(f"Scartata {where}: {e}")
+            if len(batch) >= batch_size:
+                imported += len(batch)
+                insert_evaluations_batch(batch, source, position, total + imported)
+                batch = []
+                report(f"{total + imported} righe importate ({imported / (time.perf_counter() - start):.0f} righe/s)")
+        # Ultimo blocco (anche vuoto: salva la posizione dopo eventuali righe scartate)
+        imported += len(batch)
+        insert_evaluations_batch(batch, source, position, total + imported)
+
+    seconds = time.perf_counter() - start
+    report(f"Importate {imported} valutazioni in {seconds:.1f} s "
+           f"({imported / seconds if seconds else 0:.0f} righe/s), {errors} righe scartate")
+    return {"imported": imported, "total": total + imported, "errors": errors, "seconds": seconds}
@@ -2,27 +2,79 @@
 Sistema di interpretazione avanzata usando OpenAI per analizzare le risposte.
 """
 import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 
+from . import llm_guard
+from .llm_cache import LLM_CACHE_ENABLED, cache, cache_key
+from .local_report import build_local_final_report, build_local_interpretation
+
 load_dotenv()
 
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+# Da incrementare quando cambiano i prompt: invalida le risposte in cache
+PROMPT_VERSION = 1
+
+# Parametri di generazione (fanno parte della chiave di cache)
+INTERPRETATION_PARAMS = {"model": OPENAI_MODEL, "temperature": 0.7, "max_tokens": 500}
+FINAL_REPORT_PARAMS = {"model": OPENAI_MODEL, "temperature": 0.8, "max_tokens": 400}
+COMBINED_PARAMS = {"model": OPENAI_MODEL, "temperature": 0.75, "max_tokens": 900}
+
+# "separate": due chiamate (interpretazione e resoconto); "combined": una sola chiamata;
+# "local": solo generatore locale, nessuna chiamata esterna
+LLM_MODE = os.getenv("LLM_MODE", "separate")
+
+# Testi del generatore locale quando OpenAI non è disponibile o non risponde
+LLM_LOCAL_FALLBACK = os.getenv("LLM_LOCAL_FALLBACK", "1") != "0"
+
+# Scadenza complessiva (secondi) per generare interpretazione e resoconto
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "30"))
+
+# Timeout di ogni singola chiamata e tentativi automatici del client OpenAI
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "25"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "0"))
+
+# Pool condiviso per lanciare le due generazioni in parallelo
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_WORKERS", "8")), thread_name_prefix="llm")
+
 # Client OpenAI inizializzato lazy (solo quando necessario)
 _client = None
 
 def get_client():
     """Ottiene il client OpenAI, inizializzandolo solo se necessario."""
     global _client
+    if LLM_MODE == "local":
+        return None  # Modalità locale: nessuna chiamata esterna
     if _client is None:
         api_key = os.getenv("OPENAI_API_KEY")
         if api_key:
             try:
                 from openai import OpenAI
-                _client = OpenAI(api_key=api_key)
+                _client = OpenAI(
+                    api_key=api_key,
+                    base_url=os.getenv("OPENAI_BASE_URL") or None,
+                    timeout=LLM_CALL_TIMEOUT,
+                    max_retries=LLM_MAX_RETRIES
+                )
             except Exception as e:
                 print(f"Errore nell'inizializzazione del client OpenAI: {e}")
                 _client = False  # Marca come non disponibile
     return _client if _client else None
 
+def _cache_key(kind: str, system_prompt: str, user_prompt: str, params: dict) -> str:
+    """Chiave di cache per una generazione (prompt, parametri e versione del prompt)."""
+    return cache_key(kind, prompt_version=PROMPT_VERSION, system=system_prompt, user=user_prompt, **params)
+
+def _cache_get(key: str):
+    return cache.get(key) if LLM_CACHE_ENABLED else None
+
+def _cache_put(key: str, kind: str, text: str):
+    if LLM_CACHE_ENABLED:
+        cache.put(key, kind, text)
+
 SYSTEM_PROMPT = """
 Sei un valutatore di compatibilità sentimentale ironico ma serio.
 Il test misura allineamento mentale, visione, fiducia e maturità.
@@ -43,21 +95,8 @@ TONO: ironico ma intelligente, diretto, mai offensivo, mai compiacente.
 Stile: "lucido, adulto, selettivo".
 """
 
-def generate_interpretation(evaluation_data: dict, answers: dict) -> str:
-    """
-    Genera un'interpretazione avanzata delle risposte usando OpenAI.
-    
-    Args:
-        evaluation_data: Dati della valutazione (score, indici, etc.)
-        answers: Dizionario con tutte le risposte (incluse quelle aperte)
-    
-    Returns:
-        Testo dell'interpretazione avanzata
-    """
-    client = get_client()
-    if not client:
-        return None
-    
+def build_interpretation_prompt(evaluation_data: dict, answers: dict) -> str:
+    """Prompt utente per l'interpretazione avanzata."""
     why_us = answers.get("why_us", "").strip()
     non_negotiables = answers.get("non_negotiables", "").strip()
     
@@ -91,19 +130,44 @@ Genera un'interpretazione avanzata (max 300 parole) che:
 
 Scrivi in italiano, stile lucido e adulto.
 """
+    return user_prompt
+
+def generate_interpretation(evaluation_data: dict, answers: dict, timeout: float = None) -> str:
+    """
+    Genera un'interpretazione avanzata delle risposte usando OpenAI.
+    
+    Args:
+        evaluation_data: Dati della valutazione (score, indici, etc.)
+        answers: Dizionario con tutte le risposte (incluse quelle aperte)
+        timeout: Timeout della chiamata in secondi (opzionale)
+    
+    Returns:
+        Testo dell'interpretazione avanzata
+    """
+    client = get_client()
+    if not client:
+        return None
+    
+    user_prompt = build_interpretation_prompt(evaluation_data, answers)
+    key = _cache_key("interpretation", SYSTEM_PROMPT, user_prompt, INTERPRETATION_PARAMS)
+    cached = _cache_get(key)
+    if cached:
+        return cached
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.7,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=500
-        )
+        with llm_guard.guarded_call():
+            response = client.chat.completions.create(
+                **INTERPRETATION_PARAMS,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                timeout=timeout
+            )
         
-        return response.choices[0].message.content.strip()
+        text = response.choices[0].message.content.strip()
+        _cache_put(key, "interpretation", text)
+        return text
     except Exception as e:
         print(f"Errore nella generazione dell'interpretazione: {e}")
         return None
@@ -138,21 +202,8 @@ OUTPUT:
 - La valutazione deve sembrare scritta da una persona reale, non da un algoritmo
 """
 
-def generate_final_report(evaluation_data: dict, answers: dict) -> str:
-    """
-    Genera il resoconto finale testuale secondo le specifiche.
-    
-    Args:
-        evaluation_data: Dati della valutazione (score, indici, etc.)
-        answers: Dizionario con tutte le risposte
-    
-    Returns:
-        Testo del resoconto finale
-    """
-    client = get_client()
-    if not client:
-        return None
-    
+def build_final_report_prompt(evaluation_data: dict, answers: dict) -> str:
+    """Prompt utente per il resoconto finale."""
     why_us = answers.get("why_us", "").strip()
     non_negotiables = answers.get("non_negotiables", "").strip()
     
@@ -207,19 +258,360 @@ Scrivi tutto in un unico testo fluido, senza sezioni separate, senza elenchi pun
 Il testo deve essere naturale, come se fosse scritto da una persona reale che valuta con lucidità.
 Lunghezza: 120-200 parole.
 """
+    return user_prompt
+
+def generate_final_report(evaluation_data: dict, answers: dict, timeout: float = None) -> str:
+    """
+    Genera il resoconto finale testuale secondo le specifiche.
+    
+    Args:
+        evaluation_data: Dati della valutazione (score, indici, etc.)
+        answers: Dizionario con tutte le risposte
+        timeout: Timeout della chiamata in secondi (opzionale)
+    
+    Returns:
+        Testo del resoconto finale
+    """
+    client = get_client()
+    if not client:
+        return None
+    
+    user_prompt = build_final_report_prompt(evaluation_data, answers)
+    key = _cache_key("final_report", RESOCONTO_SYSTEM_PROMPT, user_prompt, FINAL_REPORT_PARAMS)
+    cached = _cache_get(key)
+    if cached:
+        return cached
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.8,
-            messages=[
-                {"role": "system", "content": RESOCONTO_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=400
-        )
+        with llm_guard.guarded_call():
+            response = client.chat.completions.create(
+                **FINAL_REPORT_PARAMS,
+                messages=[
+                    {"role": "system", "content": RESOCONTO_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                timeout=timeout
+            )
         
-        return response.choices[0].message.content.strip()
+        text = response.choices[0].message.content.strip()
+        _cache_put(key, "final_report", text)
+        return text
     except Exception as e:
         print(f"Errore nella generazione del resoconto finale: {e}")
         return None
+
+def stream_final_report(evaluation_data: dict, answers: dict, timeout: float = None):
+    """
+    Genera il resoconto finale in streaming.
+    
+    Args:
+        evaluation_data: Dati della valutazione (score, indici, etc.)
+        answers: Dizionario con tutte le risposte
+        timeout: Timeout della chiamata in secondi (opzionale)
+    
+    Yields:
+        Frammenti di testo man mano che arrivano da OpenAI
+    
+    Raises:
+        L'errore della chiamata se lo stream si interrompe: i frammenti già
+        ricevuti non formano un resoconto completo
+    """
+    client = get_client()
+    if not client:
+        return
+    
+    user_prompt = build_final_report_prompt(evaluation_data, answers)
+    key = _cache_key("final_report", RESOCONTO_SYSTEM_PROMPT, user_prompt, FINAL_REPORT_PARAMS)
+    cached = _cache_get(key)
+    if cached:
+        yield cached
+        return
+
+    try:
+        # Negli stream la durata dipende dalla lunghezza del testo: contano solo gli errori
+        with llm_guard.guarded_call(slow_threshold=None):
+            stream = client.chat.completions.create(
+                **FINAL_REPORT_PARAMS,
+                messages=[
+                    {"role": "system", "content": RESOCONTO_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                timeout=timeout,
+                stream=True
+            )
+            
+            parts = []
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        _cache_put(key, "final_report", "".join(parts).strip())
+    except Exception as e:
+        print(f"Errore nello streaming del resoconto finale: {e}")
+        raise
+
+COMBINED_SYSTEM_PROMPT = """
+Sei un valutatore di compatibilità sentimentale.
+Il contesto è un questionario ironico ma serio chiamato "Come diventare la mia futura moglie".
+Il test misura allineamento mentale, visione, fiducia e maturità.
+
+NON ricalcolare punteggi. NON giudicare moralmente.
+NON usare criteri discriminatori. NON fare diagnosi psicologiche.
+Valuta solo COMPATIBILITÀ con il soggetto.
+
+Il soggetto ha:
+- forte ambizione
+- mentalità costruttiva
+- bisogno di autonomia + rispetto
+- visione a lungo termine
+- intolleranza per superficialità, caos emotivo, interesse strumentale
+
+TONO: ironico ma intelligente, diretto, mai offensivo, mai compiacente, mai volgare.
+Stile: "lucido, adulto, selettivo". Non romantico, non crudele.
+
+OUTPUT: esclusivamente un oggetto JSON con due campi stringa:
+{"interpretation": "...", "final_report": "..."}
+"""
+
+def build_combined_prompt(evaluation_data: dict, answers: dict) -> str:
+    """Prompt utente unico per interpretazione e resoconto finale (contesto inviato una volta)."""
+    why_us = answers.get("why_us", "").strip()
+    non_negotiables = answers.get("non_negotiables", "").strip()
+    
+    breakdown_text = "\n".join([
+        f"- {item['question']}: {item['answer']} ({item['points']:+} punti)"
+        for item in evaluation_data.get("points_breakdown", [])
+    ])
+    
+    user_prompt = f"""
+Analizza questa valutazione di compatibilità sentimentale.
+
+PUNTEGGIO FINALE: {evaluation_data.get("final_score")}/100
+LIVELLO: {evaluation_data.get("compatibility_level")}
+VERDETTO: {evaluation_data.get("verdict")}
+
+INDICI:
+- Fiducia: {evaluation_data.get("trust_index")}/10
+- Visione: {evaluation_data.get("vision_index")}/10
+- Maturità emotiva: {evaluation_data.get("emotional_maturity_index")}/10
+- Allineamento ambizione: {evaluation_data.get("ambition_alignment_index")}/10
+
+BREAKDOWN PUNTI:
+{breakdown_text}
+
+PUNTI DI FORZA: {', '.join(evaluation_data.get("strengths", []))}
+CRITICITÀ: {', '.join(evaluation_data.get("concerns", []))}
+RED FLAGS: {', '.join(evaluation_data.get("red_flags", []))}
+
+RISPOSTE APERTE:
+"Perché funzioneremmo": {why_us if why_us else "Non fornita"}
+"Non negoziabili": {non_negotiables if non_negotiables else "Non forniti"}
+
+---
+
+"interpretation" (max 300 parole): analizza la compatibilità reale oltre i numeri, evidenzia
+pattern psicologici rilevanti, indica se l'allineamento è profondo o solo superficiale e
+suggerisci cosa potrebbe funzionare o non funzionare nella relazione.
+
+"final_report" (120-200 parole, testo fluido senza sezioni, elenchi o emoji): lettura generale
+del profilo, UNA categoria tra Non compatibile / Potenziale, ma fragile / Compatibile / Wife material,
+2-4 aspetti che funzionano, 1-3 punti critici senza giudizio morale e un verdetto finale
+elegante, netto, memorabile. Deve sembrare scritto da una persona reale.
+
+Scrivi in italiano.
+"""
+    return user_prompt
+
+def parse_combined_response(content: str):
+    """
+    Estrae e valida i due testi dalla risposta JSON della chiamata combinata.
+    
+    Returns:
+        (interpretation, final_report), oppure None se la risposta non è valida
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    
+    texts = []
+    for field in ("interpretation", "final_report"):
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return None
+        texts.append(value.strip())
+    return tuple(texts)
+
+def generate_combined(evaluation_data: dict, answers: dict, timeout: float = None):
+    """
+    Genera interpretazione e resoconto finale con una sola chiamata OpenAI.
+    
+    Args:
+        evaluation_data: Dati della valutazione (score, indici, etc.)
+        answers: Dizionario con tutte le risposte
+        timeout: Timeout della chiamata in secondi (opzionale)
+    
+    Returns:
+        (interpretation, final_report), oppure None se la chiamata o il parsing falliscono
+    """
+    client = get_client()
+    if not client:
+        return None
+    
+    user_prompt = build_combined_prompt(evaluation_data, answers)
+    key = _cache_key("combined", COMBINED_SYSTEM_PROMPT, user_prompt, COMBINED_PARAMS)
+    cached = _cache_get(key)
+    if cached:
+        return parse_combined_response(cached)
+
+    try:
+        with llm_guard.guarded_call():
+            response = client.chat.completions.create(
+                **COMBINED_PARAMS,
+                messages=[
+                    {"role": "system", "content": COMBINED_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                response_format={"type": "json_object"},
+                timeout=timeout
+            )
+        
+        content = response.choices[0].message.content
+        texts = parse_combined_response(content)
+        if texts is None:
+            print("Risposta combinata non valida: uso delle due chiamate separate")
+            return None
+        _cache_put(key, "combined", content)
+        return texts
+    except Exception as e:
+        print(f"Errore nella generazione combinata: {e}")
+        return None
+
+def _call_before(func, evaluation_data: dict, answers: dict, expires_at: float):
+    """
+    Esegue una generazione solo se la scadenza (time.monotonic()) non è passata.
+
+    Il timeout della chiamata è il tempo rimasto: un task rimasto in coda nel
+    pool non fa una chiamata completa quando il chiamante ha già rinunciato.
+    """
+    remaining = expires_at - time.monotonic()
+    if remaining <= 0:
+        return None
+    return func(evaluation_data, answers, timeout=min(remaining, LLM_CALL_TIMEOUT))
+
+def submit_interpretation(evaluation_data: dict, answers: dict, timeout: float = None):
+    """Avvia la generazione dell'interpretazione sul pool condiviso e ne restituisce il future."""
+    if timeout is None:
+        timeout = LLM_DEADLINE
+    return _executor.submit(_call_before, generate_interpretation, evaluation_data, answers,
+                            time.monotonic() + timeout)
+
+
+def _timed(func, evaluation_data: dict, answers: dict, expires_at: float) -> tuple:
+    """Esegue una generazione entro la scadenza, misurandone la durata in millisecondi."""
+    start = time.perf_counter()
+    text = _call_before(func, evaluation_data, answers, expires_at)
+    return text, round((time.perf_counter() - start) * 1000, 1)
+
+def fill_missing_texts(evaluation_data: dict, answers: dict, interpretation: str, final_report: str) -> tuple:
+    """
+    Sostituisce i testi mancanti con quelli del generatore locale (se LLM_LOCAL_FALLBACK).
+    
+    Returns:
+        (interpretation, final_report, nomi dei testi generati localmente)
+    """
+    filled = []
+    if LLM_LOCAL_FALLBACK or LLM_MODE == "local":
+        if not interpretation:
+            interpretation = build_local_interpretation(evaluation_data, answers)
+            filled.append("interpretation")
+        if not final_report:
+            final_report = build_local_final_report(evaluation_data, answers)
+            filled.append("final_report")
+    return interpretation, final_report, filled
+
+def generate_texts(evaluation_data: dict, answers: dict, deadline: float = None) -> tuple:
+    """
+    Genera interpretazione e resoconto finale, con una scadenza comune.
+    
+    Con LLM_MODE="local" usa solo il generatore locale; negli altri casi i testi
+    mancanti (OpenAI assente, circuito aperto, errori, scadenza) vengono
+    completati dal generatore locale se LLM_LOCAL_FALLBACK è attivo.
+    
+    Args:
+        evaluation_data: Dati della valutazione (score, indici, etc.)
+        answers: Dizionario con tutte le risposte
+        deadline: Tempo massimo complessivo in secondi (default LLM_DEADLINE)
+    
+    Returns:
+        (interpretation, final_report, timings)
+    """
+    if LLM_MODE == "local":
+        start = time.perf_counter()
+        interpretation = build_local_interpretation(evaluation_data, answers)
+        final_report = build_local_final_report(evaluation_data, answers)
+        return interpretation, final_report, {"local": {"ms": round((time.perf_counter() - start) * 1000, 3)}}
+    
+    interpretation, final_report, timings = _generate_llm_texts(evaluation_data, answers, deadline)
+    interpretation, final_report, filled = fill_missing_texts(evaluation_data, answers, interpretation, final_report)
+    if filled:
+        timings["local_fallback"] = filled
+    return interpretation, final_report, timings
+
+def _generate_llm_texts(evaluation_data: dict, answers: dict, deadline: float = None) -> tuple:
+    """
+    Genera interpretazione e resoconto finale con OpenAI, in parallelo e con una scadenza comune.
+    
+    Con LLM_MODE="combined" prova prima una sola chiamata per entrambi i testi e
+    ricade sulle due chiamate parallele se la risposta non è valida.
+    
+    Args:
+        evaluation_data: Dati della valutazione (score, indici, etc.)
+        answers: Dizionario con tutte le risposte
+        deadline: Tempo massimo complessivo in secondi (default LLM_DEADLINE)
+    
+    Returns:
+        (interpretation, final_report, timings): i testi (None se non disponibili
+        o scaduti) e, per ciascuna chiamata, durata in ms ed eventuale timeout
+    """
+    if deadline is None:
+        deadline = LLM_DEADLINE
+    if not get_client():
+        return None, None, {}
+    if llm_guard.breaker.is_open():
+        # Servizio degradato: nessuna chiamata fino alla fine della pausa
+        return None, None, {"skipped": "circuito aperto"}
+    
+    start = time.perf_counter()
+    expires_at = time.monotonic() + deadline
+    timings = {}
+    if LLM_MODE == "combined":
+        texts, elapsed_ms = _timed(generate_combined, evaluation_data, answers, expires_at)
+        timings["combined"] = {"ms": elapsed_ms, "timed_out": elapsed_ms >= deadline * 1000}
+        if texts is not None:
+            timings["total_ms"] = elapsed_ms
+            return texts[0], texts[1], timings
+        # Fallback sulle due chiamate separate con il tempo rimasto
+        deadline = max(expires_at - time.monotonic(), 0)
+    
+    futures = {
+        "interpretation": _executor.submit(_timed, generate_interpretation, evaluation_data, answers, expires_at),
+        "final_report": _executor.submit(_timed, generate_final_report, evaluation_data, answers, expires_at),
+    }
+    wait(futures.values(), timeout=deadline)
+    
+    texts = {}
+    for name, future in futures.items():
+        if future.done():
+            texts[name], elapsed_ms = future.result()
+            timings[name] = {"ms": elapsed_ms, "timed_out": False}
+        else:
+            # La chiamata termina comunque alla scadenza (o non parte, se è ancora in coda)
+            texts[name] = None
+            timings[name] = {"ms": round((time.perf_counter() - start) * 1000, 1), "timed_out": True}
+            print(f"Generazione '{name}' oltre la scadenza di {deadline}s")
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    
+    return texts["interpretation"], texts["final_report"], timings
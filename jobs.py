@@ -0,0 +1,150 @@
+"""
+Generazione asincrona dei testi: la valutazione viene salvata subito con i
+testi "pending" e un pool di worker in background la completa più tardi.
+
+Ogni job prende in carico la valutazione (claim_evaluation_report) prima di
+generare: job, streaming e recupero non la completano due volte. La coda è
+limitata a REPORT_JOB_QUEUE job; quando è piena i testi vengono prodotti
+subito dal generatore locale. Le valutazioni rimaste "pending" o con una
+presa in carico scaduta (riavvio, deploy, worker terminato) vengono
+riaccodate all'avvio del worker e poi ogni REPORT_RECOVERY_INTERVAL secondi.
+Le valutazioni in modalità streaming hanno un job di riserva che parte dopo
+REPORT_PENDING_TIMEOUT secondi, se nel frattempo lo stream non è stato aperto.
+"""
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .database import claim_evaluation_report, get_evaluation, list_unfinished_reports, update_evaluation_texts
+from .interpretation import generate_texts
+from .local_report import build_local_final_report, build_local_interpretation
+
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "4"))
+REPORT_JOB_QUEUE = int(os.getenv("REPORT_JOB_QUEUE", "256"))  # job in attesa o in corso
+REPORT_RECOVERY_INTERVAL = float(os.getenv("REPORT_RECOVERY_INTERVAL", "60"))  # secondi
+# Una valutazione "pending" più vecchia di così non ha più un job vivo che la completi
+REPORT_PENDING_TIMEOUT = float(os.getenv("REPORT_PENDING_TIMEOUT", "15"))  # secondi
+
+# Worker in background per completare le valutazioni
+_executor = ThreadPoolExecutor(max_workers=REPORT_JOB_WORKERS, thread_name_prefix="report-job")
+_slots = threading.BoundedSemaphore(REPORT_JOB_QUEUE)
+_queued = set()  # Valutazioni in coda in questo processo (il recupero non le riaccoda)
+_queued_lock = threading.Lock()
+
+def _fill_texts(eval_id: int, evaluation_data: dict = None, answers: dict = None):
+    """Genera interpretazione e resoconto finale e li salva sulla valutazione."""
+    try:
+        if not claim_evaluation_report(eval_id):
+            return  # Già completata, o in carico a uno stream o a un altro job
+        if evaluation_data is None:
+            evaluation_data = get_evaluation(eval_id)
+            if evaluation_data is None:
+                return
+            answers = evaluation_data["answers"]
+        interpretation, final_report, timings = generate_texts(evaluation_data, answers)
+        update_evaluation_texts(eval_id, interpretation, final_report, "ready")
+        if timings:
+            print(f"Valutazione #{eval_id} completata: {timings}")
+    except Exception as e:
+        print(f"Errore nel completamento della valutazione #{eval_id}: {e}")
+        update_evaluation_texts(eval_id, None, None, "failed")
+    finally:
+        with _queued_lock:
+            _queued.discard(eval_id)
+        _slots.release()
+
+def _fill_local_texts(eval_id: int, evaluation_data: dict = None, answers: dict = None):
+    """Coda piena: completa subito la valutazione con il generatore locale."""
+    try:
+        if not claim_evaluation_report(eval_id):
+            return
+        if evaluation_data is None:
+            evaluation_data = get_evaluation(eval_id)
+            answers = evaluation_data["answers"]
+        print(f"Coda dei job piena: valutazione #{eval_id} completata con il generatore locale")
+        update_evaluation_texts(eval_id, build_local_interpretation(evaluation_data, answers),
+                                build_local_final_report(evaluation_data, answers), "ready")
+    except Exception as e:
+        print(f"Errore nel completamento della valutazione #{eval_id}: {e}")
+        update_evaluation_texts(eval_id, None, None, "failed")
+
+def submit_report_job(eval_id: int, evaluation_data: dict = None, answers: dict = None, block: bool = False):
+    """
+    Accoda la generazione dei testi per una valutazione salvata come "pending".
+
+    Args:
+        eval_id: ID della valutazione
+        evaluation_data, answers: Dati già in memoria (altrimenti letti dal database)
+        block: Con la coda piena aspetta un posto invece di usare il generatore locale
+
+    Returns:
+        Il future del job, oppure None se non è stato accodato
+    """
+    with _queued_lock:
+        if eval_id in _queued:
+            return None
+        _queued.add(eval_id)
+    if not _slots.acquire(blocking=block):
+        with _queued_lock:
+            _queued.discard(eval_id)
+        _fill_local_texts(eval_id, evaluation_data, answers)
+        return None
+    return _executor.submit(_fill_texts, eval_id, evaluation_data, answers)
+
+_delayed = []  # Heap di (scadenza, eval_id, evaluation_data, answers)
+_delayed_cond = threading.Condition()
+
+def schedule_report_job(eval_id: int, evaluation_data: dict, answers: dict, delay: float = REPORT_PENDING_TIMEOUT):
+    """
+    Accoda la generazione dei testi dopo `delay` secondi.
+
+    Job di riserva per lo streaming: se il browser apre lo stream prima, il job
+    trova la valutazione già presa in carico e non fa niente.
+    """
+    _start_thread("report-delayed", _run_delayed)
+    with _delayed_cond:
+        heapq.heappush(_delayed, (time.monotonic() + delay, eval_id, evaluation_data, answers))
+        _delayed_cond.notify()
+
+def _run_delayed():
+    """Passa ai worker i job di riserva arrivati a scadenza."""
+    while True:
+        with _delayed_cond:
+            while not _delayed or _delayed[0][0] > time.monotonic():
+                _delayed_cond.wait(_delayed[0][0] - time.monotonic() if _delayed else None)
+            _, eval_id, evaluation_data, answers = heapq.heappop(_delayed)
+        try:
+            submit_report_job(eval_id, evaluation_data, answers)
+        except Exception as e:
+            print(f"Errore nell'accodamento della valutazione #{eval_id}: {e}")
+
+def _recover_reports():
+    """Riaccoda periodicamente le valutazioni con i testi mai completati."""
+    while True:
+        try:
+            eval_ids = list_unfinished_reports(REPORT_PENDING_TIMEOUT)
+            if eval_ids:
+                print(f"Recupero di {len(eval_ids)} valutazioni con i testi non completati")
+            for eval_id in eval_ids:
+                submit_report_job(eval_id, block=True)
+        except Exception as e:
+            print(f"Errore nel recupero delle valutazioni non completate: {e}")
+        time.sleep(REPORT_RECOVERY_INTERVAL)
+
+_threads = {}  # Nome del thread in background -> PID del processo che l'ha avviato
+_threads_lock = threading.Lock()
+
+def _start_thread(name: str, target):
+    """Avvia un thread in background una volta per processo (anche dopo un fork)."""
+    if _threads.get(name) == os.getpid():
+        return
+    with _threads_lock:
+        if _threads.get(name) != os.getpid():
+            _threads[name] = os.getpid()
+            threading.Thread(target=target, name=name, daemon=True).start()
+
+def start_recovery():
+    """Avvia il recupero delle valutazioni non completate (una volta per processo)."""
+    _start_thread("report-recovery", _recover_reports)
@@ -0,0 +1,115 @@
+"""
+Cache delle risposte OpenAI.
+
+La chiave è l'hash canonico degli input del prompt (più modello, temperatura e
+versione del prompt): valutazioni con gli stessi input riusano lo stesso testo.
+Le voci stanno in un LRU in memoria e nella tabella SQLite `llm_cache`, così
+sopravvivono ai riavvii.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .database import get_cached_response, store_cached_response, prune_cached_responses
+
+# Configurazione (disattivabile con LLM_CACHE_ENABLED=0)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1000"))  # voci in memoria
+LLM_CACHE_DB_SIZE = int(os.getenv("LLM_CACHE_DB_SIZE", "100000"))  # voci su SQLite
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # secondi
+
+# Ogni quante scritture ripulire la tabella (scadenze e limite di dimensione)
+_PRUNE_EVERY = 100
+
+def cache_key(kind: str, **inputs) -> str:
+    """Hash canonico degli input di una generazione."""
+    canonical = json.dumps({"kind": kind, **inputs}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """LRU in memoria con TTL, appoggiato a SQLite."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL,
+                 max_db_entries: int = LLM_CACHE_DB_SIZE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_db_entries = max_db_entries
+        self._entries = OrderedDict()  # chiave -> (testo, created_at)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def get(self, key: str):
+        """Testo in cache per la chiave, oppure None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return entry[0]
+                del self._entries[key]
+                self.counters["evictions"] += 1
+
+        try:
+            row = get_cached_response(key, now - self.ttl)
+        except Exception as e:
+            print(f"Errore nella lettura della cache LLM: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["db_hits"] += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key: str, kind: str, text: str):
+        """Memorizza un testo generato (i testi vuoti non vengono salvati)."""
+        if not text:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, text, now)
+            self.counters["stores"] += 1
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+
+        try:
+            store_cached_response(key, kind, text, now)
+            if prune:
+                prune_cached_responses(self.max_db_entries, now - self.ttl)
+        except Exception as e:
+            print(f"Errore nella scrittura della cache LLM: {e}")
+
+    def _remember(self, key: str, text: str, created_at: float):
+        self._entries[key] = (text, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        """Svuota la cache in memoria (la tabella SQLite resta)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.counters["memory_hits"] + self.counters["db_hits"]
+            lookups = hits + self.counters["misses"]
+            return {
+                "enabled": LLM_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                **self.counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+cache = LLMCache()
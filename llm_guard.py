@@ -0,0 +1,165 @@
+"""
+Protezioni attorno alle chiamate OpenAI.
+
+- Gate di ammissione: al massimo LLM_MAX_CONCURRENCY chiamate in corso; chi
+  attende più di LLM_QUEUE_TIMEOUT secondi rinuncia.
+- Circuit breaker: dopo LLM_BREAKER_FAILURES errori (o risposte più lente di
+  LLM_SLOW_CALL secondi) consecutivi, la generazione viene saltata per
+  LLM_BREAKER_COOLDOWN secondi; poi una chiamata di prova decide se richiudere.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "2"))
+LLM_SLOW_CALL = float(os.getenv("LLM_SLOW_CALL", "20"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+class LLMUnavailable(Exception):
+    """La chiamata non è stata eseguita (circuito aperto o coda piena)."""
+
+class CircuitBreaker:
+    """Circuit breaker con stati closed / open / half_open."""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.opened_count = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True se una chiamata può partire (in half_open passa una sola prova)."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def is_open(self) -> bool:
+        """True se il circuito è aperto e la pausa non è ancora finita."""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened_count += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            remaining = 0.0
+            if self.state == "open":
+                remaining = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "cooldown_seconds": self.cooldown,
+                "cooldown_remaining": round(remaining, 1),
+                "opened_count": self.opened_count,
+            }
+
+class AdmissionGate:
+    """Limita le chiamate concorrenti, con attesa massima in coda."""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, queue_timeout: float = LLM_QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def acquire(self) -> bool:
+        with self._lock:
+            self.waiting += 1
+        acquired = self._semaphore.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+            else:
+                self.rejected += 1
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "queue_timeout_seconds": self.queue_timeout,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "rejected": self.rejected,
+            }
+
+breaker = CircuitBreaker()
+gate = AdmissionGate()
+
+@contextmanager
+def guarded_call(slow_threshold: float = LLM_SLOW_CALL):
+    """
+    Esegue una chiamata OpenAI attraverso gate e circuit breaker.
+
+    Solleva LLMUnavailable se il circuito è aperto o la coda è piena; registra
+    come fallimento ogni eccezione e ogni chiamata più lenta di slow_threshold
+    (None per non considerare la durata, es. negli stream).
+    """
+    if breaker.is_open():
+        raise LLMUnavailable("circuito aperto")
+    if not gate.acquire():
+        raise LLMUnavailable("coda delle chiamate piena")
+    if not breaker.allow():
+        gate.release()
+        raise LLMUnavailable("circuito aperto")
+
+    start = time.monotonic()
+    try:
+        yield
+    except GeneratorExit:
+        # Stream interrotto dal client: non è un errore del servizio
+        breaker.record_success()
+        raise
+    except BaseException:
+        breaker.record_failure()
+        raise
+    else:
+        if slow_threshold is not None and time.monotonic() - start > slow_threshold:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    finally:
+        gate.release()
+
+def stats() -> dict:
+    """Stato di breaker e gate per il monitoraggio."""
+    return {"breaker": breaker.stats(), "gate": gate.stats()}
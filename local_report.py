@@ -0,0 +1,118 @@
+"""
+Generatore locale (deterministico) di interpretazione e resoconto finale.
+
+Costruisce i testi dal risultato di calculate_score con regole e template,
+senza chiamate esterne: si usa come modalità (LLM_MODE=local) o come
+fallback quando OpenAI non è configurato o non risponde.
+"""
+
+INDEX_LABELS = {
+    "trust_index": "la fiducia nel futuro",
+    "vision_index": "la visione a lungo termine",
+    "emotional_maturity_index": "la maturità emotiva",
+    "ambition_alignment_index": "l'allineamento sull'ambizione",
+}
+
+# Categoria del resoconto per livello di compatibilità
+CATEGORIES = {
+    "wife material": "Wife material",
+    "compatibile": "Compatibile",
+    "potenziale": "Potenziale, ma fragile",
+    "non compatibile": "Non compatibile",
+}
+
+OPENINGS = {
+    "wife material": "Il profilo che emerge è quello di una persona che gioca la stessa partita, con le stesse regole.",
+    "compatibile": "Il profilo che emerge è solido: la testa c'è, il ritmo va ancora verificato sul campo.",
+    "potenziale": "Il profilo che emerge ha del materiale interessante, ma ancora da sgrezzare.",
+    "non compatibile": "Il profilo che emerge va in un'altra direzione, con un altro passo.",
+}
+
+CLOSINGS = {
+    "wife material": "Qui non serve convincere nessuno: basta non rovinare quello che già funziona.",
+    "compatibile": "Le basi ci sono; il resto lo dirà la costanza, non le promesse.",
+    "potenziale": "Può funzionare solo se le differenze diventano una conversazione, non un'abitudine.",
+    "non compatibile": "Nessun dramma: semplicemente, strade diverse.",
+}
+
+# Frasi segnaposto di calculate_score quando le liste sono vuote
+_EMPTY_MARKERS = ("Nessun punto di forza", "Nessuna criticità")
+
+def _items(values: list) -> list:
+    return [v for v in values or [] if not v.startswith(_EMPTY_MARKERS)]
+
+def _lower_first(text: str) -> str:
+    return text[:1].lower() + text[1:] if text else text
+
+def _join(values: list) -> str:
+    values = [_lower_first(v) for v in values]
+    if len(values) <= 1:
+        return "".join(values)
+    return ", ".join(values[:-1]) + " e " + values[-1]
+
+def _indices(evaluation_data: dict) -> list:
+    """Indici ordinati dal più alto al più basso: [(label, valore)]."""
+    values = [(label, evaluation_data.get(name) or 0) for name, label in INDEX_LABELS.items()]
+    return sorted(values, key=lambda item: item[1], reverse=True)
+
+def _alignment_depth(evaluation_data: dict) -> str:
+    """Quanto è profondo l'allineamento, dalla quota di risposte premiate."""
+    breakdown = evaluation_data.get("points_breakdown") or []
+    if not breakdown:
+        return "impossibile da giudicare: le risposte sono troppo poche"
+    positive = sum(1 for item in breakdown if item.get("points", 0) > 0) / len(breakdown)
+    if positive >= 0.7:
+        return "profondo: le risposte giuste non sono episodi isolati"
+    if positive >= 0.4:
+        return "parziale: alcune risposte centrano il punto, altre lo mancano di poco"
+    return "superficiale: le coincidenze sono poche e non sui temi che contano"
+
+def build_local_interpretation(evaluation_data: dict, answers: dict) -> str:
+    """Interpretazione avanzata generata localmente."""
+    level = evaluation_data.get("compatibility_level", "non compatibile")
+    indices = _indices(evaluation_data)
+    (best_label, best_value), (worst_label, worst_value) = indices[0], indices[-1]
+    red_flags = _items(evaluation_data.get("red_flags"))
+    why_us = (answers.get("why_us") or "").strip()
+
+    sentences = [
+        OPENINGS.get(level, OPENINGS["non compatibile"]),
+        f"Con {evaluation_data.get('final_score', 0)}/100 il numero dice molto, ma non tutto.",
+    ]
+    if best_value == worst_value:
+        sentences.append(f"Gli indici sono tutti allo stesso livello ({best_value}/10): nessun punto spicca, nel bene o nel male.")
+    else:
+        sentences.append(
+            f"Il punto più solido è {best_label} ({best_value}/10), quello più fragile {worst_label} ({worst_value}/10)."
+        )
+    sentences.append(f"L'allineamento è {_alignment_depth(evaluation_data)}.")
+    if red_flags:
+        sentences.append(f"Da non ignorare: {_join(red_flags)}.")
+    if len(why_us) >= 20:
+        sentences.append("La risposta aperta aggiunge sostanza: c'è stato almeno lo sforzo di spiegarsi.")
+    elif why_us:
+        sentences.append("La risposta aperta è sbrigativa, e anche questo è un'informazione.")
+    sentences.append(CLOSINGS.get(level, CLOSINGS["non compatibile"]))
+    return " ".join(sentences)
+
+def build_local_final_report(evaluation_data: dict, answers: dict) -> str:
+    """Resoconto finale generato localmente."""
+    level = evaluation_data.get("compatibility_level", "non compatibile")
+    strengths = _items(evaluation_data.get("strengths"))[:3]
+    risks = (_items(evaluation_data.get("red_flags")) + _items(evaluation_data.get("concerns")))[:2]
+    best_label = _indices(evaluation_data)[0][0]
+
+    sentences = [
+        OPENINGS.get(level, OPENINGS["non compatibile"]),
+        f"Tipo di compatibilità: {CATEGORIES.get(level, level)}.",
+    ]
+    if strengths:
+        sentences.append(f"Cosa funziona: {_join(strengths)}.")
+    else:
+        sentences.append(f"Di allineamenti veri se ne vedono pochi; il migliore resta {best_label}.")
+    if risks:
+        sentences.append(f"Rischia di non funzionare: {_join(risks)}.")
+    else:
+        sentences.append("Punti critici evidenti non ce ne sono, il che è già raro.")
+    sentences.append(evaluation_data.get("final_message") or CLOSINGS.get(level, ""))
+    return " ".join(s for s in sentences if s)
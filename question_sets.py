@@ -0,0 +1,218 @@
+"""
+Insiemi di domande versionati, ricaricati a caldo.
+
+Un insieme di domande è un documento JSON con "questions" e "open_questions"
+(stesso formato di QUESTIONS e OPEN_QUESTIONS in questions.py) e una
+"label" facoltativa. Viene letto dal file QUESTION_SET_PATH, se impostato,
+altrimenti dalla tabella question_sets (l'insieme attivo); senza nessuno dei
+due valgono le domande di questions.py.
+
+Le regole (INDEX_RULES, ANSWER_RULES, OPEN_ANSWER_RULES e
+OPEN_ANSWER_MIN_LENGTH) restano in questions.py e valgono per ogni insieme,
+e fanno parte della versione: un insieme viene rifiutato se non contiene le
+domande, le opzioni e le domande aperte a cui le regole si riferiscono.
+
+Ogni insieme viene validato e compilato una volta sola (tabelle di punteggio
+e payload pubblico di /api/questions); la versione è l'impronta del
+contenuto. Ogni worker controlla la sorgente al massimo ogni
+QUESTION_SET_RELOAD secondi (uno stat del file o una lettura sull'indice
+dell'insieme attivo) e, se è cambiata, compila il nuovo insieme e lo
+sostituisce a quello attivo con un solo assegnamento: le richieste in corso
+finiscono con l'insieme con cui sono partite, nessuna viene rifiutata.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .database import get_active_question_set_version, get_question_set
+from .questions import ANSWER_RULES, OPEN_ANSWER_MIN_LENGTH, OPEN_ANSWER_RULES, OPEN_QUESTIONS, QUESTIONS
+from .scoring import INDEX_GROUPS, CompiledScorer, set_scorer
+
+QUESTION_SET_PATH = os.getenv("QUESTION_SET_PATH")
+QUESTION_SET_RELOAD = float(os.getenv("QUESTION_SET_RELOAD", "5"))  # secondi
+
+QUESTION_TYPES = ("correct_answer", "interpretive")
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def validate_definition(definition) -> list:
+    """Errori di un insieme di domande (lista vuota se valido)."""
+    if not isinstance(definition, dict):
+        return ["L'insieme di domande deve essere un oggetto JSON"]
+    errors = []
+    questions = definition.get("questions")
+    if not isinstance(questions, list) or not questions:
+        return ["\"questions\" deve essere una lista non vuota"]
+    seen = set()
+    options_by_question = {}
+    for position, question in enumerate(questions, start=1):
+        if not isinstance(question, dict):
+            errors.append(f"Domanda {position}: deve essere un oggetto")
+            continue
+        where = f"Domanda {position} ({question.get('id', '?')})"
+        if not isinstance(question.get("id"), str) or not question["id"]:
+            errors.append(f"{where}: \"id\" mancante")
+        elif question["id"] in seen:
+            errors.append(f"{where}: \"id\" duplicato")
+        seen.add(question.get("id"))
+        if not isinstance(question.get("text"), str) or not question["text"]:
+            errors.append(f"{where}: \"text\" mancante")
+        if question.get("type") not in QUESTION_TYPES:
+            errors.append(f"{where}: \"type\" deve essere uno tra {', '.join(QUESTION_TYPES)}")
+        if not _is_number(question.get("importance_multiplier", 1.0)):
+            errors.append(f"{where}: \"importance_multiplier\" deve essere un numero")
+        options = question.get("options")
+        if not isinstance(options, dict) or not options:
+            errors.append(f"{where}: \"options\" deve essere un oggetto non vuoto")
+            continue
+        options_by_question[question.get("id")] = options
+        for key, option in options.items():
+            if not isinstance(option, dict) or not _is_number(option.get("points")) \
+                    or not isinstance(option.get("label"), str):
+                errors.append(f"{where}: l'opzione \"{key}\" deve avere \"points\" (numero) e \"label\"")
+        if question.get("type") == "correct_answer" and question.get("correct_answer") not in options:
+            errors.append(f"{where}: \"correct_answer\" deve essere una delle opzioni")
+    # Gli indici sintetici senza le loro domande varrebbero 0 per tutti
+    for index_name, question_ids in INDEX_GROUPS.items():
+        missing = [question_id for question_id in question_ids if question_id not in seen]
+        if missing:
+            errors.append(f"Domande mancanti per {index_name}: {', '.join(missing)}")
+    # Regole sulle risposte: (domanda, opzione) che non esistono non scatterebbero mai
+    for rule in ANSWER_RULES:
+        question_id, option = rule["question"], rule["option"]
+        if question_id not in seen:
+            errors.append(f"Domanda mancante per la regola \"{rule['message']}\": {question_id}")
+        elif question_id in options_by_question and option not in options_by_question[question_id]:
+            errors.append(f"Opzione mancante per la regola \"{rule['message']}\": {question_id}.{option}")
+
+    open_questions = definition.get("open_questions", [])
+    if not isinstance(open_questions, list):
+        errors.append("\"open_questions\" deve essere una lista")
+    else:
+        for position, question in enumerate(open_questions, start=1):
+            if not isinstance(question, dict) or not isinstance(question.get("id"), str) \
+                    or not isinstance(question.get("text"), str):
+                errors.append(f"Domanda aperta {position}: servono \"id\" e \"text\"")
+        open_ids = {question.get("id") for question in open_questions if isinstance(question, dict)}
+        rule_questions = [*(rule["question"] for rule in OPEN_ANSWER_RULES), *OPEN_ANSWER_MIN_LENGTH]
+        missing = [question_id for question_id in dict.fromkeys(rule_questions) if question_id not in open_ids]
+        if missing:
+            errors.append(f"Domande aperte mancanti per le regole sulle risposte aperte: {', '.join(missing)}")
+    return errors
+
+def build_public_payload(questions: list, open_questions: list) -> dict:
+    """
+    Payload pubblico delle domande, serializzato e compresso una volta sola.
+
+    Contiene solo quello che serve al frontend (testi ed etichette): punti e
+    risposte corrette restano sul server.
+    """
+    public = {
+        "questions": [
+            {
+                "id": question["id"],
+                "text": question["text"],
+                "options": {key: {"label": option["label"]} for key, option in question["options"].items()},
+            }
+            for question in questions
+        ],
+        "open_questions": [
+            {"id": question["id"], "text": question["text"], "required": question.get("required", False)}
+            for question in open_questions
+        ],
+    }
+    # Chiavi ordinate come jsonify: l'ordine delle opzioni nella pagina non cambia
+    body = json.dumps(public, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    return {
+        "identity": (body, etag),
+        "gzip": (gzip.compress(body, compresslevel=9, mtime=0), etag + "-gzip"),
+    }
+
+class QuestionSet:
+    """Insieme di domande validato e compilato: scorer, payload pubblico e versione."""
+
+    def __init__(self, definition: dict):
+        errors = validate_definition(definition)
+        if errors:
+            raise ValueError("Insieme di domande non valido:\n" + "\n".join(errors))
+        self.label = definition.get("label")
+        self.questions = definition["questions"]
+        self.open_questions = definition.get("open_questions", [])
+        self.scorer = CompiledScorer(self.questions, open_questions=self.open_questions)
+        self.version = self.scorer.version
+        self.payload = build_public_payload(self.questions, self.open_questions)
+
+    def definition(self) -> dict:
+        return {"label": self.label, "questions": self.questions, "open_questions": self.open_questions}
+
+BUILTIN = {"label": "questions.py", "questions": QUESTIONS, "open_questions": OPEN_QUESTIONS}
+
+class QuestionSetRegistry:
+    """Insieme di domande attivo nel processo, con controllo periodico della sorgente."""
+
+    def __init__(self, path: str = QUESTION_SET_PATH, reload_interval: float = QUESTION_SET_RELOAD):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._active = QuestionSet(BUILTIN)
+        self._source_key = None  # Stato della sorgente già caricato (None = questions.py)
+        self._checked_at = None
+
+    def current(self) -> QuestionSet:
+        """Insieme attivo; se è ora, controlla la sorgente (un solo thread, gli altri non aspettano)."""
+        checked_at = self._checked_at
+        if (checked_at is None or time.monotonic() - checked_at >= self.reload_interval) \
+                and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = time.monotonic()
+                self._reload_if_changed()
+            finally:
+                self._lock.release()
+        return self._active
+
+    def _source_state(self):
+        """Chiave che cambia quando cambia la sorgente, e funzione che ne legge la definizione."""
+        if self.path:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size), self._read_file
+        version = get_active_question_set_version()
+        return version, lambda: json.loads(get_question_set(version))
+
+    def _read_file(self) -> dict:
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _reload_if_changed(self):
+        try:
+            key, load = self._source_state()
+        except Exception as e:
+            print(f"Errore nel controllo dell'insieme di domande: {e}")
+            return
+        if key == self._source_key:
+            return
+        # Segna comunque la sorgente come vista: un insieme non valido non viene riprovato a ogni controllo
+        self._source_key = key
+        try:
+            question_set = QuestionSet(load() if key is not None else BUILTIN)
+        except Exception as e:
+            print(f"Insieme di domande non caricato, resta attivo {self._active.version}: {e}")
+            return
+        if question_set.version != self._active.version:
+            self.activate(question_set)
+
+    def activate(self, question_set: QuestionSet):
+        """Rende attivo un insieme già compilato (anche per calculate_score)."""
+        self._active = question_set
+        set_scorer(question_set.scorer)
+        print(f"Insieme di domande attivo: {question_set.version} ({question_set.label or 'senza nome'})")
+
+registry = QuestionSetRegistry()
+
+def current() -> QuestionSet:
+    """Insieme di domande attivo (vedi QuestionSetRegistry.current)."""
+    return registry.current()
@@ -185,3 +185,76 @@ OPEN_QUESTIONS = [
         "required": False
     }
 ]
+
+# Punti di forza, criticità e red flags dagli indici (0-10): "min" scatta con
+# indice >= min, "below" con indice < below. L'ordine dell'elenco è l'ordine
+# in cui compaiono nel risultato, prima delle regole sulle risposte.
+INDEX_RULES = [
+    {"index": "trust_index", "min": 8, "bucket": "strengths", "message": "Fiducia solida nel futuro e nelle capacità"},
+    {"index": "trust_index", "below": 5, "bucket": "concerns", "message": "Fiducia limitata o assente"},
+    {"index": "trust_index", "below": 3, "bucket": "red_flags", "message": "Mancanza di fiducia nel futuro"},
+    {"index": "vision_index", "min": 8, "bucket": "strengths", "message": "Visione chiara e a lungo termine"},
+    {"index": "vision_index", "below": 5, "bucket": "concerns", "message": "Visione a lungo termine poco chiara"},
+    {"index": "emotional_maturity_index", "min": 8, "bucket": "strengths", "message": "Maturità emotiva e gestione costruttiva dei conflitti"},
+    {"index": "emotional_maturity_index", "below": 5, "bucket": "concerns", "message": "Maturità emotiva da sviluppare"},
+    {"index": "emotional_maturity_index", "below": 3, "bucket": "red_flags", "message": "Gestione emotiva problematica"},
+    {"index": "ambition_alignment_index", "min": 8, "bucket": "strengths", "message": "Allineamento su ambizione e progetti futuri"},
+    {"index": "ambition_alignment_index", "below": 5, "bucket": "concerns", "message": "Differenze significative su ambizione e progetti"},
+    {"index": "ambition_alignment_index", "below": 3, "bucket": "red_flags", "message": "Incompatibilità su ambizione e visione futura"},
+]
+
+# Punti di forza, criticità e red flags da singole risposte (domanda, opzione),
+# nell'ordine in cui compaiono nel risultato
+ANSWER_RULES = [
+    {"question": "trust_future", "option": "1_2_anni", "bucket": "strengths", "message": "Fiducia totale nel futuro: valore fondamentale"},
+    {"question": "trust_future", "option": "ci_sono_nato", "bucket": "red_flags", "message": "Possibile interesse strumentale: risposta 'ci sono nato/a'"},
+    {"question": "attractive_woman", "option": "intelligente_carattere", "bucket": "strengths", "message": "Valorizza intelligenza e carattere: allineamento sui valori"},
+    {"question": "wife_job", "option": "direttrice", "bucket": "strengths", "message": "Visione ambiziosa per la coppia: direttrice"},
+    {"question": "money_relationship", "option": "investo", "bucket": "strengths", "message": "Approccio costruttivo al denaro: investe"},
+    {"question": "money_relationship", "option": "mignotte_cocaina", "bucket": "red_flags", "message": "Rapporto problematico con il denaro"},
+    {"question": "rich_priority", "option": "aumentare_livello", "bucket": "strengths", "message": "Priorità su crescita e livello, non su apparenza"},
+    {"question": "representative_phrase", "option": "costruisco_fatica", "bucket": "strengths", "message": "Mentalità costruttiva: 'costruisco anche se costa fatica'"},
+]
+
+# Regole sulle risposte aperte.
+# Le parole chiave vengono confrontate senza accenti e maiuscole, a parola
+# intera; "parola*" vale anche per le parole che iniziano così e le frasi
+# ("voglio figli") devono comparire con le parole in sequenza. "keywords" è un
+# elenco oppure un dizionario parola -> peso (default 1): la regola scatta
+# quando la somma dei pesi delle parole trovate raggiunge "threshold"
+# (default 1). Nello stesso "group" scatta solo la prima regola dell'elenco.
+OPEN_ANSWER_RULES = [
+    {
+        "id": "interesse_strumentale",
+        "question": "why_us",
+        "bucket": "red_flags",
+        "message": "Possibile interesse strumentale rilevato nelle risposte aperte",
+        "keywords": ["soldi", "ricco", "denaro"],
+        "group": "why_us_tono",
+    },
+    {
+        "id": "visione_costruttiva",
+        "question": "why_us",
+        "bucket": "strengths",
+        "message": "Visione costruttiva espressa nelle risposte",
+        "keywords": ["futuro", "crescita", "costruire"],
+        "group": "why_us_tono",
+    },
+    {
+        "id": "dinamiche_controllo",
+        "question": "non_negotiables",
+        "bucket": "concerns",
+        "message": "Possibili dinamiche di controllo",
+        "keywords": ["gelosia", "controllo"],
+    },
+]
+
+# Lunghezza minima delle risposte aperte: sotto la soglia si segnala la
+# risposta e le regole sulle parole chiave non vengono applicate
+OPEN_ANSWER_MIN_LENGTH = {
+    "why_us": {
+        "min_length": 20,
+        "bucket": "concerns",
+        "message": "Risposta 'Perché funzioneremmo' troppo breve o superficiale",
+    },
+}
@@ -0,0 +1,128 @@
+"""
+Rivalutazione in blocco delle valutazioni salvate.
+
+Quando cambiano domande, punti, moltiplicatori o regole, punteggi, indici e
+livelli salvati non corrispondono più all'insieme di domande attivo. Ogni valutazione porta la
+versione (impronta) con cui è stata calcolata: le righe con una versione
+diversa vengono lette a blocchi, rivalutate e riscritte un blocco per
+transazione; i punti di evaluation_answers, che dipendono solo da domanda e
+opzione, si aggiornano con un UPDATE per opzione. Interpretazione e
+resoconto finale (testi generati) non vengono toccati.
+
+Il calcolo avviene nel processo corrente: la scrittura (un solo writer
+SQLite) pesa quanto il calcolo e un pool di processi aggiunge la
+serializzazione dei blocchi, per cui con le regole attuali è più lento
+(benchmark `rescore`). Con `workers` > 0 si usa comunque un pool, per
+insiemi di domande con regole molto più costose.
+"""
+import json
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import question_sets
+from .database import apply_rescored, iter_stale_evaluations, refresh_answer_points
+from .scoring import INDEX_NAMES, calculate_score, option_points, scoring_version, set_scorer
+
+RESCORE_CHUNK_SIZE = 2000
+
+def _init_worker(definition: dict):
+    """Processo di calcolo: usa lo stesso insieme di domande del processo principale."""
+    set_scorer(question_sets.QuestionSet(definition).scorer)
+
+def _rescore_chunk(rows: list) -> tuple:
+    """
+    Rivaluta un blocco di (id, answers_json) nel processo corrente.
+
+    Returns:
+        (versione dello scorer, parametri per apply_rescored)
+    """
+    version = scoring_version()
+    updates = []
+    for eval_id, answers_json in rows:
+        answers = json.loads(answers_json or "{}")
+        result = calculate_score(answers)
+        updates.append((
+            result["final_score"], result["compatibility_level"], result["verdict"],
+            *(result[name] for name in INDEX_NAMES),
+            json.dumps(result["points_breakdown"], ensure_ascii=False),
+            json.dumps(result["strengths"], ensure_ascii=False),
+            json.dumps(result["concerns"], ensure_ascii=False),
+            json.dumps(result["red_flags"], ensure_ascii=False),
+            result["final_message"], version, eval_id,
+        ))
+    return version, updates
+
+def rescore_evaluations(workers: int = 0, chunk_size: int = RESCORE_CHUNK_SIZE, force: bool = False,
+                        report=print) -> dict:
+    """
+    Rivaluta le valutazioni calcolate con una versione diversa da quella dell'insieme di domande attivo.
+
+    Args:
+        workers: Processi di calcolo (0 = nel processo corrente)
+        chunk_size: Valutazioni per blocco (e per transazione)
+        force: Rivaluta anche le righe già alla versione attuale
+        report: Funzione per i messaggi di avanzamento
+
+    Returns:
+        {"version", "processed", "score_changed", "level_changed", "answers_changed",
+         "transitions": {(livello prima, livello dopo): righe}, "seconds"}
+    """
+    question_set = question_sets.current()
+    version = question_set.version
+    processed, score_changed = 0, 0
+    transitions = Counter()
+    start = time.perf_counter()
+
+    def write(chunk: list, outcome: tuple):
+        nonlocal processed, score_changed
+        chunk_version, updates = outcome
+        if chunk_version != version:
+            raise RuntimeError(f"Versione delle domande diversa nei processi di calcolo "
+                               f"({chunk_version} invece di {version})")
+        apply_rescored(updates)
+        for (_, _, old_score, old_level), update in zip(chunk, updates):
+            score_changed += update[0] != old_score
+            if update[1] != old_level:
+                transitions[(old_level, update[1])] += 1
+        processed += len(chunk)
+        report(f"{processed} valutazioni rivalutate ({processed / (time.perf_counter() - start):.0f} righe/s)")
+
+    chunks = iter_stale_evaluations(version, chunk_size, force)
+    if workers == 0:
+        for chunk in chunks:
+            write(chunk, _rescore_chunk([row[:2] for row in chunk]))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(question_set.definition(),)) as pool:
+            # Al massimo due blocchi in calcolo per processo: memoria limitata, processi sempre occupati
+            pending = deque()
+            for chunk in chunks:
+                pending.append((chunk, pool.submit(_rescore_chunk, [row[:2] for row in chunk])))
+                if len(pending) >= 2 * workers:
+                    chunk, future = pending.popleft()
+                    write(chunk, future.result())
+            while pending:
+                chunk, future = pending.popleft()
+                write(chunk, future.result())
+
+    # Punti per opzione in evaluation_answers: dipendono solo dalla domanda e dall'opzione
+    answers_changed = refresh_answer_points(option_points())
+
+    seconds = time.perf_counter() - start
+    level_changed = sum(transitions.values())
+    report(f"Rivalutate {processed} valutazioni in {seconds:.1f} s "
+           f"({processed / seconds if seconds else 0:.0f} righe/s), versione {version}")
+    report(f"Punteggio cambiato: {score_changed}, livello cambiato: {level_changed}, "
+           f"punti per risposta aggiornati: {answers_changed}")
+    for (old_level, new_level), count in transitions.most_common():
+        report(f"  {old_level or '-'} -> {new_level}: {count}")
+    return {
+        "version": version,
+        "processed": processed,
+        "score_changed": score_changed,
+        "level_changed": level_changed,
+        "answers_changed": answers_changed,
+        "transitions": dict(transitions),
+        "seconds": seconds,
+    }
@@ -0,0 +1,102 @@
+"""
+Posizione di un punteggio rispetto a tutte le valutazioni salvate.
+
+Ogni worker tiene in memoria l'istogramma dei punteggi (0-100, per livello di
+compatibilità) letto dalla tabella `score_histogram` e lo rilegge ogni
+SCORE_RANKING_REFRESH secondi; tra una lettura e l'altra conta anche i
+punteggi che calcola lui. Percentile e posizione nel livello costano quindi
+una lettura di array, indipendentemente dal numero di valutazioni.
+"""
+import os
+import threading
+import time
+
+from .database import get_score_histogram
+
+SCORE_RANKING_REFRESH = float(os.getenv("SCORE_RANKING_REFRESH", "60"))  # secondi
+
+MAX_SCORE = 100
+
+def _cumulative(counts: list) -> list:
+    """below[s] = quanti punteggi sono minori di s (s da 0 a MAX_SCORE + 1)."""
+    below = [0] * (MAX_SCORE + 2)
+    for score in range(MAX_SCORE + 1):
+        below[score + 1] = below[score] + counts[score]
+    return below
+
+class ScoreDistribution:
+    """Istogramma dei punteggi in memoria, totale e per livello."""
+
+    def __init__(self, refresh_interval: float = SCORE_RANKING_REFRESH):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._counts = {}  # livello -> conteggi per punteggio
+        self._below = {}  # livello (None = tutti) -> cumulati di _cumulative
+        self._loaded_at = None
+
+    def refresh(self):
+        """Rilegge l'istogramma dal database."""
+        counts = {}
+        for level, score, count in get_score_histogram():
+            level_counts = counts.setdefault(level, [0] * (MAX_SCORE + 1))
+            level_counts[min(max(score, 0), MAX_SCORE)] += count
+        with self._lock:
+            self._counts = counts
+            self._below = {level: _cumulative(level_counts) for level, level_counts in counts.items()}
+            self._below[None] = _cumulative(self._total_counts())
+            self._loaded_at = time.monotonic()
+
+    def _total_counts(self) -> list:
+        return [sum(level_counts[score] for level_counts in self._counts.values())
+                for score in range(MAX_SCORE + 1)]
+
+    def _ensure_fresh(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Errore nella lettura dell'istogramma dei punteggi: {e}")
+                self._loaded_at = time.monotonic()
+
+    def rank(self, final_score: int, compatibility_level: str) -> dict:
+        """
+        Posizione di un punteggio rispetto alle valutazioni già presenti.
+
+        Returns:
+            percentile: % di partecipanti con punteggio più basso
+            level_percentile: la stessa percentuale tra chi ha lo stesso livello
+            level_rank: posizione nel livello (1 = punteggio più alto)
+            level_total: valutazioni con lo stesso livello, compreso questo punteggio
+        """
+        self._ensure_fresh()
+        score = min(max(int(final_score), 0), MAX_SCORE)
+        with self._lock:
+            below_all = self._below.get(None)
+            below_level = self._below.get(compatibility_level)
+        total, lower = (below_all[-1], below_all[score]) if below_all else (0, 0)
+        level_others, level_lower, level_higher = 0, 0, 0
+        if below_level:
+            level_others = below_level[-1]
+            level_lower = below_level[score]
+            level_higher = level_others - below_level[score + 1]
+        return {
+            "percentile": round(lower / total * 100, 1) if total else None,
+            "level_percentile": round(level_lower / level_others * 100, 1) if level_others else None,
+            "level_rank": level_higher + 1,
+            "level_total": level_others + 1,  # Il punteggio appena calcolato non è ancora nell'istogramma
+        }
+
+    def observe(self, final_score: int, compatibility_level: str):
+        """Conta un nuovo punteggio fino alla prossima rilettura."""
+        score = min(max(int(final_score), 0), MAX_SCORE)
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            level_counts = self._counts.setdefault(compatibility_level, [0] * (MAX_SCORE + 1))
+            level_counts[score] += 1
+            self._below[compatibility_level] = _cumulative(level_counts)
+            self._below[None] = [value + (1 if index > score else 0)
+                                 for index, value in enumerate(self._below[None])]
+
+distribution = ScoreDistribution()
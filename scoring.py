@@ -0,0 +1,420 @@
+"""
+Motore di calcolo del punteggio compilato a partire da QUESTIONS.
+
+Le tabelle (punti per opzione, massimo per domanda, appartenenza agli indici)
+vengono costruite una sola volta: ogni valutazione si riduce a semplici lookup.
+Per i grandi volumi `calculate_scores_batch` valuta molte risposte insieme
+con operazioni vettoriali NumPy.
+"""
+import hashlib
+import json
+from bisect import bisect_right
+
+import numpy as np
+
+from .questions import ANSWER_RULES, INDEX_RULES, OPEN_ANSWER_MIN_LENGTH, OPEN_ANSWER_RULES, OPEN_QUESTIONS, QUESTIONS
+from .text_rules import OPEN_ANSWERS
+
+# Domande che concorrono a ciascun indice sintetico
+INDEX_GROUPS = {
+    "trust_index": ["trust_future"],  # La più importante, interpretativa
+    "vision_index": ["mare_montagna", "where_live", "vacation_type"],  # Stile di vita e visione
+    "emotional_maturity_index": ["attractive_woman", "wife_job", "how_die"],  # Maturità e valori
+    "ambition_alignment_index": ["rich_priority", "representative_phrase", "money_relationship"],  # Ambizione e costruzione
+}
+
+INDEX_NAMES = tuple(INDEX_GROUPS)
+
+# Livelli di compatibilità per numero di soglie (40, 60, 80) superate
+COMPATIBILITY_LEVELS = np.array(["non compatibile", "potenziale", "compatibile", "wife material"], dtype=object)
+
+
+def questions_version(questions: list, index_groups: dict = INDEX_GROUPS, open_questions: list = ()) -> str:
+    """
+    Impronta di domande, pesi e regole: cambia quando cambia il modo di valutare.
+
+    Viene salvata con ogni valutazione (colonna scoring_version) per sapere
+    quali righe vanno rivalutate, e identifica gli insiemi di domande.
+    """
+    definition = [questions, index_groups, INDEX_RULES, ANSWER_RULES, OPEN_ANSWER_RULES, OPEN_ANSWER_MIN_LENGTH,
+                  list(open_questions)]
+    encoded = json.dumps(definition, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def _question_outcome(question: dict, answer_value) -> tuple:
+    """Punti (già moltiplicati) e motivazione per una risposta a una domanda."""
+    multiplier = question.get("importance_multiplier", 1.0)
+    question_points = 0
+    reason = ""
+
+    if question["type"] == "correct_answer":
+        if answer_value == question["correct_answer"]:
+            question_points = 8
+            reason = "Risposta corretta"
+        else:
+            # Controlla se indica incompatibilità forte
+            base_points = question["options"].get(answer_value, {}).get("points", 0)
+            if base_points < 0:
+                question_points = -4
+                reason = "Incompatibilità forte rilevata"
+            else:
+                question_points = 0
+                reason = "Risposta non corretta"
+
+    elif question["type"] == "interpretive":
+        question_points = question["options"].get(answer_value, {}).get("points", 0)
+        if question_points > 0:
+            reason = "Valutazione psicologica positiva"
+        elif question_points < 0:
+            reason = "Valutazione psicologica negativa"
+        else:
+            reason = "Valutazione neutra"
+
+    return question_points * multiplier, reason
+
+
+class CompiledQuestion:
+    """Tabelle precalcolate per una singola domanda."""
+
+    __slots__ = ("id", "text", "max_points", "outcomes", "unknown", "groups")
+
+    def __init__(self, question: dict, group_index: dict):
+        multiplier = question.get("importance_multiplier", 1.0)
+        self.id = question["id"]
+        self.text = question["text"]
+        self.max_points = max([opt.get("points", 0) * multiplier for opt in question["options"].values()])
+        # opzione -> (punti, motivazione, label)
+        self.outcomes = {
+            key: (*_question_outcome(question, key), option.get("label", key))
+            for key, option in question["options"].items()
+        }
+        # Esito per valori non presenti tra le opzioni (la label è il valore stesso)
+        self.unknown = _question_outcome(question, None)
+        self.groups = tuple(group_index.get(self.id, ()))
+
+
+class CompiledScorer:
+    """Valutatore costruito una volta da un insieme di domande."""
+
+    def __init__(self, questions: list, index_groups: dict = INDEX_GROUPS, open_questions: list = ()):
+        group_index = {}
+        for position, q_ids in enumerate(index_groups.values()):
+            for q_id in q_ids:
+                group_index.setdefault(q_id, []).append(position)
+        self.index_names = tuple(index_groups)
+        self.questions = tuple(CompiledQuestion(q, group_index) for q in questions)
+        self.version = questions_version(questions, index_groups, open_questions)
+        self._build_batch_tables()
+
+    def _build_batch_tables(self):
+        """
+        Tabelle per la valutazione vettoriale.
+
+        Ogni risposta è codificata come indice di opzione; dopo le opzioni di
+        ciascuna domanda seguono il codice "valore sconosciuto" e "risposta assente".
+        """
+        width = max((len(q.outcomes) for q in self.questions), default=0) + 2
+        self._codes = []
+        self._unknown_codes = []
+        self._missing_codes = []
+        self._batch_points = np.zeros((len(self.questions), width))
+        self._batch_max = np.zeros((len(self.questions), width))
+        self._group_mask = np.zeros((len(self.questions), len(self.index_names)))
+
+        for row, question in enumerate(self.questions):
+            codes = {key: code for code, key in enumerate(question.outcomes)}
+            unknown = len(codes)
+            self._codes.append(codes)
+            self._unknown_codes.append(unknown)
+            self._missing_codes.append(unknown + 1)
+            for key, code in codes.items():
+                self._batch_points[row, code] = question.outcomes[key][0]
+            self._batch_points[row, unknown] = question.unknown[0]
+            # Il massimo conta solo per le domande a cui si è risposto
+            self._batch_max[row, :unknown + 1] = question.max_points
+            for position in question.groups:
+                self._group_mask[row, position] = 1
+
+    def encode(self, answers_list: list) -> np.ndarray:
+        """Codifica una lista di risposte in una matrice (n_risposte, n_domande) di indici di opzione."""
+        matrix = np.empty((len(answers_list), len(self.questions)), dtype=np.intp)
+        for column, question in enumerate(self.questions):
+            codes = self._codes[column]
+            unknown = self._unknown_codes[column]
+            missing = self._missing_codes[column]
+            q_id = question.id
+            matrix[:, column] = [
+                codes.get(value, unknown) if value else missing
+                for value in (answers.get(q_id) for answers in answers_list)
+            ]
+        return matrix
+
+    def score_matrix(self, matrix: np.ndarray) -> dict:
+        """
+        Calcola punteggio finale, indici e livello per una matrice di risposte codificate.
+
+        Ritorna un dizionario di array colonnari (una riga per risposta).
+        """
+        rows = np.arange(len(self.questions))
+        points = self._batch_points[rows, matrix]
+        maxima = self._batch_max[rows, matrix]
+
+        total_points = points.sum(axis=1)
+        max_possible_points = maxima.sum(axis=1)
+        ratio = np.divide(total_points, max_possible_points, out=np.zeros_like(total_points), where=max_possible_points > 0)
+        final_score = np.clip(np.trunc(ratio * 100), 0, 100).astype(np.int64)
+
+        group_points = points @ self._group_mask
+        group_max = maxima @ self._group_mask
+        group_ratio = np.divide(group_points, group_max, out=np.zeros_like(group_points), where=group_max > 0)
+        indices = np.round(group_ratio * 10, 1)
+
+        level_rank = (final_score >= 40).astype(np.intp) + (final_score >= 60) + (final_score >= 80)
+        columns = {
+            "final_score": final_score,
+            "compatibility_level": COMPATIBILITY_LEVELS[level_rank],
+        }
+        for position, name in enumerate(self.index_names):
+            columns[name] = indices[:, position]
+        return columns
+
+    def score_batch(self, answers_list: list) -> list:
+        """Valuta molte risposte insieme: punteggio finale, indici e livello per ciascuna."""
+        columns = self.score_matrix(self.encode(answers_list))
+        names = list(columns)
+        values = [column.tolist() for column in columns.values()]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def answer_points(self, answers: dict) -> list:
+        """Punti di ogni domanda con risposta: [(question_id, opzione, punti)]."""
+        rows = []
+        for question in self.questions:
+            answer_value = answers.get(question.id)
+            if not answer_value:
+                continue
+            outcome = question.outcomes.get(answer_value, question.unknown)
+            rows.append((question.id, str(answer_value), round(outcome[0], 1)))
+        return rows
+
+    def option_points(self) -> list:
+        """Punti per opzione come in answer_points: [(question_id, {opzione: punti}, punti per valori sconosciuti)]."""
+        return [
+            (question.id, {key: round(outcome[0], 1) for key, outcome in question.outcomes.items()},
+             round(question.unknown[0], 1))
+            for question in self.questions
+        ]
+
+    def score(self, answers: dict) -> dict:
+        """
+        Calcola il punteggio totale e la valutazione completa secondo le regole specificate.
+        """
+        points_breakdown = []
+        total_points = 0
+        max_possible_points = 0
+        group_points = [0] * len(self.index_names)
+        group_max = [0] * len(self.index_names)
+
+        # Valuta ogni domanda
+        for question in self.questions:
+            answer_value = answers.get(question.id)
+            if not answer_value:
+                continue
+
+            outcome = question.outcomes.get(answer_value)
+            if outcome is None:
+                final_points, reason = question.unknown
+                answer_label = answer_value
+            else:
+                final_points, reason, answer_label = outcome
+
+            total_points += final_points
+            max_possible_points += question.max_points
+            for position in question.groups:
+                group_points[position] += final_points
+                group_max[position] += question.max_points
+
+            points_breakdown.append({
+                "question": question.text,
+                "answer": answer_label,
+                "points": round(final_points, 1),
+                "reason": reason
+            })
+
+        # Calcola final_score (0-100)
+        if max_possible_points > 0:
+            final_score = max(0, min(100, int((total_points / max_possible_points) * 100)))
+        else:
+            final_score = 0
+
+        # Calcola indici (0-10)
+        indices = {
+            name: round((points / maximum * 10) if maximum > 0 else 0, 1)
+            for name, points, maximum in zip(self.index_names, group_points, group_max)
+        }
+
+        result = {
+            "final_score": final_score,
+            "verdict": verdict_for(final_score),
+            "compatibility_level": compatibility_level_for(final_score),
+            "points_breakdown": points_breakdown,
+        }
+        result.update(analyse_answers(answers, indices))
+        result.update(indices)
+        result["final_message"] = final_message_for(final_score)
+        return result
+
+
+def compatibility_level_for(final_score: int) -> str:
+    """Livello di compatibilità corrispondente al punteggio finale."""
+    if final_score >= 80:
+        return "wife material"
+    elif final_score >= 60:
+        return "compatibile"
+    elif final_score >= 40:
+        return "potenziale"
+    return "non compatibile"
+
+
+def verdict_for(final_score: int) -> str:
+    """Verdetto (ironico ma intelligente) per il punteggio finale."""
+    if final_score >= 85:
+        return "Wife material. Allineamento solido, costruire insieme è possibile."
+    elif final_score >= 70:
+        return "Compatibile sul piano mentale, ma non ancora pronta per reggere il ritmo."
+    elif final_score >= 55:
+        return "Potenziale presente, ma serve chiarimento su alcuni punti critici."
+    elif final_score >= 40:
+        return "Compatibilità limitata. Differenze significative su valori chiave."
+    return "Incompatibilità strutturale. Visioni troppo distanti per costruire insieme."
+
+
+def final_message_for(final_score: int) -> str:
+    """Messaggio finale (elegante e tagliente) per il punteggio finale."""
+    if final_score >= 85:
+        return "Allineamento solido. La costruzione insieme è possibile."
+    elif final_score >= 70:
+        return "Buona base mentale. Serve maturità e rispetto reciproco per reggere il ritmo."
+    elif final_score >= 55:
+        return "Potenziale presente, ma le differenze richiedono chiarimento e crescita."
+    elif final_score >= 40:
+        return "Compatibilità limitata. Le visioni divergono su punti fondamentali."
+    return "Incompatibilità strutturale. Visioni troppo distanti per costruire insieme."
+
+
+class CompiledRules:
+    """
+    Regole di punti di forza, criticità e red flags compilate in tabelle.
+
+    Le regole sulle risposte diventano un dizionario (domanda, opzione) -> esiti;
+    quelle sugli indici, per ogni indice, una tabella di soglie ordinate in cui
+    ogni intervallo ha già l'elenco degli esiti: il costo non dipende dal
+    numero di regole.
+    """
+
+    def __init__(self, index_rules: list = INDEX_RULES, answer_rules: list = ANSWER_RULES):
+        # Esito = (posizione nell'ordine del risultato, bucket, messaggio)
+        self.thresholds = {}  # indice -> (soglie ordinate, esiti per intervallo)
+        by_index = {}
+        for position, rule in enumerate(index_rules):
+            by_index.setdefault(rule["index"], []).append((position, rule))
+        for index_name, rules in by_index.items():
+            cuts = sorted({rule["min"] if "min" in rule else rule["below"] for _, rule in rules})
+            intervals = []
+            # Intervallo i: cuts[i-1] <= valore < cuts[i]
+            for interval in range(len(cuts) + 1):
+                intervals.append(tuple(
+                    (position, rule["bucket"], rule["message"])
+                    for position, rule in rules
+                    if ("min" in rule and cuts.index(rule["min"]) < interval)
+                    or ("below" in rule and cuts.index(rule["below"]) >= interval)
+                ))
+            self.thresholds[index_name] = (cuts, intervals)
+
+        self.answers = {}  # (domanda, opzione) -> esiti
+        offset = len(index_rules)
+        for position, rule in enumerate(answer_rules, start=offset):
+            self.answers.setdefault((rule["question"], rule["option"]), []).append(
+                (position, rule["bucket"], rule["message"])
+            )
+        self.answer_questions = tuple(dict.fromkeys(rule["question"] for rule in answer_rules))
+
+    def analyse(self, answers: dict, indices: dict) -> dict:
+        """Esiti di indici e risposte: {"strengths": [...], "concerns": [...], "red_flags": [...]}."""
+        outcomes = []
+        for index_name, (cuts, intervals) in self.thresholds.items():
+            outcomes.extend(intervals[bisect_right(cuts, indices[index_name])])
+        for question_id in self.answer_questions:
+            value = answers.get(question_id)
+            try:
+                outcomes.extend(self.answers.get((question_id, value), ()))
+            except TypeError:
+                pass  # Valore non confrontabile con le opzioni (es. lista)
+        outcomes.sort()
+
+        found = {"strengths": [], "concerns": [], "red_flags": []}
+        for _, bucket, message in outcomes:
+            found[bucket].append(message)
+        return found
+
+
+def analyse_answers(answers: dict, indices: dict) -> dict:
+    """Individua punti di forza, criticità e red flags da indici e risposte."""
+    found = RULES.analyse(answers, indices)
+    # Risposte aperte (se presenti)
+    open_answers = OPEN_ANSWERS.analyse(answers)
+    strengths = found["strengths"] + open_answers["strengths"]
+    concerns = found["concerns"] + open_answers["concerns"]
+    red_flags = found["red_flags"] + open_answers["red_flags"]
+
+    return {
+        "strengths": strengths if strengths else ["Nessun punto di forza significativo rilevato"],
+        "concerns": concerns if concerns else ["Nessuna criticità significativa rilevata"],
+        "red_flags": red_flags if red_flags else [],
+    }
+
+
+# Regole compilate all'import
+RULES = CompiledRules()
+
+
+# Scorer attivo, compilato all'import
+SCORER = CompiledScorer(QUESTIONS, open_questions=OPEN_QUESTIONS)
+
+
+def set_scorer(scorer: CompiledScorer) -> CompiledScorer:
+    """Rende attivo uno scorer già compilato (sostituzione atomica del riferimento)."""
+    global SCORER
+    SCORER = scorer
+    return SCORER
+
+
+def calculate_score(answers: dict) -> dict:
+    """
+    Calcola il punteggio totale e la valutazione completa secondo le regole specificate.
+    """
+    return SCORER.score(answers)
+
+
+def calculate_scores_batch(answers_list: list) -> list:
+    """
+    Calcola final_score, i quattro indici e compatibility_level per molte risposte.
+
+    Non produce breakdown, punti di forza e criticità: per quelli serve calculate_score.
+    """
+    return SCORER.score_batch(answers_list)
+
+
+def answer_points(answers: dict) -> list:
+    """Punti di ogni domanda con risposta, per la tabella evaluation_answers."""
+    return SCORER.answer_points(answers)
+
+
+def option_points() -> list:
+    """Punti per opzione di ogni domanda (vedi CompiledScorer.option_points)."""
+    return SCORER.option_points()
+
+
+def scoring_version() -> str:
+    """Versione (impronta) di domande e regole con cui calcola lo scorer attivo."""
+    return SCORER.version
@@ -228,7 +228,10 @@ async function submitQuiz() {
   // Prepara payload
   const payload = {
     name: answers.name || "",
-    answers: {}
+    answers: {},
+    // I testi arrivano dopo: il punteggio si mostra subito
+    async: true,
+    stream: !!window.EventSource
   };
   
   // Aggiungi tutte le risposte alle domande
@@ -260,6 +263,13 @@ async function submitQuiz() {
   }
 
     renderResult(data);
+    if (data.report_status === "pending" && data.evaluation_id) {
+      if (payload.stream) {
+        streamReport(data.evaluation_id);
+      } else {
+        pollReport(data.evaluation_id);
+      }
+    }
   } catch (error) {
     document.getElementById("result-content").innerHTML = `<p class="err">Errore di connessione: ${error.message}</p>`;
   }
@@ -303,22 +313,11 @@ function renderResult(obj) {
       <div class="final-score">${obj.final_score}/100</div>
       <div class="compatibility-level">${levelLabel}</div>
       <div class="verdict">${obj.verdict}</div>
+      ${obj.ranking && obj.ranking.percentile !== null ? `<div class="ranking">Punteggio più alto del ${obj.ranking.percentile}% dei partecipanti · ${obj.ranking.level_rank}° su ${obj.ranking.level_total} nel livello</div>` : ''}
       ${obj.evaluation_id ? `<div class="eval-id">ID valutazione: #${obj.evaluation_id}</div>` : ''}
     </div>
 
-    ${obj.final_report ? `
-    <div class="final-report">
-      <h3>📋 Resoconto finale</h3>
-      <div class="final-report-text">${obj.final_report}</div>
-    </div>
-    ` : ''}
-
-    ${obj.interpretation ? `
-    <div class="interpretation">
-      <h3>🧠 Interpretazione avanzata</h3>
-      <div class="interpretation-text">${obj.interpretation}</div>
-    </div>
-    ` : ''}
+    <div id="report-sections">${renderReportSections(obj)}</div>
 
     <div class="indices">
       <h3>Indici di compatibilità</h3>
@@ -372,6 +371,92 @@ function renderResult(obj) {
   `;
 }
 
+function renderReportSections(obj) {
+  const pending = obj.report_status === "pending";
+  const loading = "<div class='loading'>Generazione in corso…</div>";
+
+  return `
+    ${obj.final_report || pending ? `
+    <div class="final-report">
+      <h3>📋 Resoconto finale</h3>
+      <div class="final-report-text">${obj.final_report || loading}</div>
+    </div>
+    ` : ''}
+
+    ${obj.interpretation || pending ? `
+    <div class="interpretation">
+      <h3>🧠 Interpretazione avanzata</h3>
+      <div class="interpretation-text">${obj.interpretation || loading}</div>
+    </div>
+    ` : ''}
+  `;
+}
+
+// Interroga lo stato della valutazione finché i testi non sono pronti
+async function pollReport(evaluationId, attempt = 0) {
+  const maxAttempts = 60;
+  const container = document.getElementById("report-sections");
+  if (!container) return;
+
+  try {
+    const res = await fetch(`/api/evaluations/${evaluationId}/status`);
+    const status = await res.json();
+    if (res.ok && status.report_status !== "pending" && status.report_status !== "streaming") {
+      container.innerHTML = renderReportSections(status);
+      return;
+    }
+  } catch (error) {
+    console.error("Errore nel recupero dello stato:", error);
+  }
+
+  if (attempt + 1 >= maxAttempts) {
+    container.innerHTML = "";
+    return;
+  }
+  setTimeout(() => pollReport(evaluationId, attempt + 1), 1500);
+}
+
+// Riceve il resoconto finale in streaming e lo mostra man mano che arriva
+function streamReport(evaluationId) {
+  const source = new EventSource(`/api/evaluations/${evaluationId}/report/stream`);
+  let text = "";
+
+  source.addEventListener("delta", event => {
+    text += JSON.parse(event.data).text;
+    const reportText = document.querySelector("#report-sections .final-report-text");
+    if (reportText) reportText.textContent = text;
+  });
+
+  // Stream interrotto: il testo parziale viene sostituito dal resoconto completo
+  source.addEventListener("reset", () => {
+    text = "";
+    const reportText = document.querySelector("#report-sections .final-report-text");
+    if (reportText) reportText.textContent = "";
+  });
+
+  source.addEventListener("interpretation", event => {
+    const interpretation = JSON.parse(event.data).text;
+    const interpretationText = document.querySelector("#report-sections .interpretation-text");
+    if (interpretationText) interpretationText.textContent = interpretation || "";
+  });
+
+  source.addEventListener("done", () => {
+    source.close();
+    // Sincronizza con i testi salvati (es. sezioni vuote)
+    pollReport(evaluationId);
+  });
+
+  source.addEventListener("busy", () => {
+    source.close();
+    pollReport(evaluationId);
+  });
+
+  source.onerror = () => {
+    source.close();
+    pollReport(evaluationId);
+  };
+}
+
 function restartQuiz() {
   // Reset tutto
   currentPage = 0;
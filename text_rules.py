@@ -0,0 +1,170 @@
+"""
+Motore di regole per le risposte aperte.
+
+Le regole (OPEN_ANSWER_RULES in questions.py) vengono compilate una volta in
+un'unica espressione regolare per domanda, costruita come trie delle parole
+chiave: ogni testo viene normalizzato (senza accenti, minuscolo) e scandito
+una sola volta, qualunque sia il numero di parole chiave.
+
+Con poche parole chiave (le regole attuali) la scansione con la regex costa
+più della catena di sottostringhe che sostituisce: fino a SCAN_KEYWORD_LIMIT
+parole semplici (solo lettere, cifre e "_") ogni parola si cerca con str.find
+e i confini di parola si controllano sulle occorrenze, con gli stessi risultati.
+"""
+import re
+import unicodedata
+
+from .questions import OPEN_ANSWER_MIN_LENGTH, OPEN_ANSWER_RULES
+
+BUCKETS = ("strengths", "concerns", "red_flags")
+
+# Oltre questo numero di parole chiave per domanda si scandisce il testo con la regex
+SCAN_KEYWORD_LIMIT = 32
+
+_SIMPLE_KEYWORD = re.compile(r"\w+")
+
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+
+def normalize(text: str) -> str:
+    """Testo senza accenti e in minuscolo, per il confronto con le parole chiave."""
+    if text.isascii():
+        return text.lower()
+    return _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text)).casefold()
+
+def _trie_pattern(words: list) -> str:
+    """
+    Regex equivalente all'alternanza delle parole, fattorizzata sui prefissi comuni.
+
+    Una parola che termina con "*" accetta qualunque continuazione alfanumerica.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        end = node.get("")
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not end:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if end else pattern
+
+    return build(trie).replace(re.escape("*"), r"\w*")
+
+def _is_word_char(char: str) -> bool:
+    """Come \\w nelle regex: lettere, cifre e "_"."""
+    return char.isalnum() or char == "_"
+
+def _count_words(text: str, words: list, table: dict, scores: list):
+    """Aggiunge ai punteggi le occorrenze di parole intere, cercate con str.find."""
+    length = len(text)
+    for word in words:
+        position = text.find(word)
+        while position != -1:
+            end = position + len(word)
+            if (not position or not _is_word_char(text[position - 1])) \
+                    and (end == length or not _is_word_char(text[end])):
+                for index, weight in table[word]:
+                    scores[index] += weight
+            position = text.find(word, end)
+
+class OpenAnswerRules:
+    """Regole compilate: per ogni domanda aperta una regex e la tabella parola chiave -> regole."""
+
+    def __init__(self, rules: list = OPEN_ANSWER_RULES, min_length: dict = OPEN_ANSWER_MIN_LENGTH,
+                 scan_keyword_limit: int = SCAN_KEYWORD_LIMIT):
+        self.rules = rules
+        self.min_length = min_length
+        # question_id -> (regex, {parola: [(indice regola, peso)]}, prefissi, parole semplici o None)
+        self.questions = {}
+        # Domande da analizzare, nell'ordine in cui compaiono
+        self.question_ids = list(dict.fromkeys([*min_length, *(rule["question"] for rule in rules)]))
+        # Esito di ogni regola: (soglia, gruppo, categoria, messaggio)
+        self._outcomes = [(rule.get("threshold", 1), rule.get("group"), rule["bucket"], rule["message"])
+                          for rule in rules]
+        # Nessuna regola scatta senza parole chiave trovate (soglie positive)
+        self._needs_matches = all(threshold > 0 for threshold, _, _, _ in self._outcomes)
+        by_question = {}
+        for index, rule in enumerate(rules):
+            keywords = rule["keywords"]
+            if not isinstance(keywords, dict):
+                keywords = {keyword: 1 for keyword in keywords}
+            table = by_question.setdefault(rule["question"], {})
+            for keyword, weight in keywords.items():
+                table.setdefault(normalize(keyword), []).append((index, weight))
+
+        for question_id, table in by_question.items():
+            # Il confine di parola a sinistra si controlla sulle (poche) occorrenze:
+            # una regex che inizia con un'asserzione non può saltare ai caratteri iniziali utili
+            pattern = _trie_pattern(list(table)) + r"(?!\w)"
+            prefixes = sorted((word[:-1] for word in table if word.endswith("*")), key=len, reverse=True)
+            # Poche parole semplici: cercate una per una con str.find (None: scansione con la regex).
+            # Senza "*" né spazi a una posizione corrisponde al più una parola, e nessuna
+            # occorrenza valida inizia dentro un'altra: il risultato è quello della regex
+            words = list(table)
+            if len(words) > scan_keyword_limit or not all(_SIMPLE_KEYWORD.fullmatch(word) for word in words):
+                words = None
+            self.questions[question_id] = (re.compile(pattern), table, prefixes, words)
+        # Per ogni domanda, nell'ordine: (id, regola sulla lunghezza, regole compilate)
+        self._plan = [(question_id, min_length.get(question_id), self.questions.get(question_id))
+                      for question_id in self.question_ids]
+
+    def _keyword_for(self, match: str, table: dict, prefixes: list) -> str:
+        if match in table:
+            return match
+        for prefix in prefixes:
+            if match.startswith(prefix):
+                return prefix + "*"
+        return None
+
+    def analyse(self, answers: dict) -> dict:
+        """
+        Applica le regole alle risposte aperte.
+
+        Returns:
+            {"strengths": [...], "concerns": [...], "red_flags": [...]}: prima le
+            risposte troppo brevi, poi le regole nell'ordine dell'elenco
+        """
+        found = {"strengths": [], "concerns": [], "red_flags": []}
+        scores = [0] * len(self.rules)
+        for question_id, length_rule, compiled in self._plan:
+            text = answers.get(question_id)
+            if not text or not (text := text.strip()):
+                continue
+            if length_rule and len(text) < length_rule["min_length"]:
+                found[length_rule["bucket"]].append(length_rule["message"])
+                continue
+            if compiled is None:
+                continue
+            regex, table, prefixes, words = compiled
+            normalized = text.lower() if text.isascii() else normalize(text)
+            if words is not None:
+                _count_words(normalized, words, table, scores)
+                continue
+            for match in regex.finditer(normalized):
+                start = match.start()
+                if start and _is_word_char(normalized[start - 1]):
+                    continue
+                keyword = self._keyword_for(match.group(), table, prefixes)
+                for index, weight in table.get(keyword, ()):
+                    scores[index] += weight
+
+        if self._needs_matches and not any(scores):
+            return found
+        fired_groups = set()
+        for score, (threshold, group, bucket, message) in zip(scores, self._outcomes):
+            if score < threshold:
+                continue
+            if group is not None:
+                if group in fired_groups:
+                    continue
+                fired_groups.add(group)
+            found[bucket].append(message)
+        return found
+
+OPEN_ANSWERS = OpenAnswerRules()